@@ -7,20 +7,21 @@ import io
 import requests
 import httpx
 from urllib.parse import urlparse
-from urllib.robotparser import RobotFileParser
 from streamlit_lottie import st_lottie
 from streamlit_extras.colored_header import colored_header
 from streamlit_extras.metric_cards import style_metric_cards
 from streamlit_extras.add_vertical_space import add_vertical_space
 from streamlit_extras.badges import badge
 from web_scraper import get_website_text_content
-from database import ScrapingDatabase
+from url_canonical import get_canonicalizer
+from politeness import get_politeness
+from robots import get_robots
+from database import get_database
 from scheduler import get_scheduler
 from reportlab.lib.pagesizes import letter
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
 from reportlab.lib.styles import getSampleStyleSheet
-import openpyxl
-from openpyxl import Workbook
+from exports import write_xlsx
 import time
 from datetime import datetime
 from apscheduler.schedulers.background import BackgroundScheduler
@@ -29,10 +30,12 @@ import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 import threading
-import lxml.html
-import pdfplumber
-from bs4 import BeautifulSoup
-import magic
+from extraction import (
+    content_type_from_header,
+    extract_content,
+    fetch_document,
+    sniff_content_type,
+)
 
 # Admin credentials from environment variables
 import os
@@ -40,6 +43,9 @@ import os
 ADMIN_USERNAME = os.getenv("ADMIN_USERNAME", "your_username")
 ADMIN_PASSWORD = os.getenv("ADMIN_PASSWORD", "your_secure_password")
 
+# Items per page in the session history
+HISTORY_PAGE_SIZE = 200
+
 def is_valid_url(url):
     """Validate URL format"""
     try:
@@ -70,30 +76,17 @@ def create_download_link(data, filename, file_type="text"):
         b64 = base64.b64encode(json_string.encode()).decode()
         href = f'<a href="data:file/json;base64,{b64}" download="{filename}.json">Download as JSON</a>'
     elif file_type == "excel":
-        # Create Excel file
-        output = io.BytesIO()
-        wb = Workbook()
-        ws = wb.active
-        
-        if ws is not None:
-            if isinstance(data, list):  # Multiple URLs data
-                headers = list(data[0].keys()) if data else []
-                if headers:
-                    # Write headers
-                    for col_num, header in enumerate(headers, 1):
-                        ws[f'{chr(64+col_num)}{1}'].value = header
-                    # Write data rows
-                    for row_num, row in enumerate(data, 2):
-                        for col_num, col in enumerate(headers, 1):
-                            cell_addr = f'{chr(64+col_num)}{row_num}'
-                            ws[cell_addr].value = str(row.get(col, ''))
-            else:
-                ws['A1'].value = "Content"
-                content_str = str(data) if not isinstance(data, dict) else json.dumps(data, indent=2)
-                ws['A2'].value = content_str[:32000]  # Limit content size
-            
-        wb.save(output)
-        b64 = base64.b64encode(output.getvalue()).decode()
+        # Create Excel file (write-only workbook, see exports.write_xlsx)
+        if isinstance(data, list):  # Multiple URLs data
+            headers = list(data[0].keys()) if data else []
+            rows = ([str(row.get(col, '')) for col in headers] for row in data)
+        else:
+            headers = ["Content"]
+            content_str = str(data) if not isinstance(data, dict) else json.dumps(data, indent=2, default=str)
+            rows = [[content_str[:32000]]]  # Limit content size
+        
+        with write_xlsx(rows, headers) as output:
+            b64 = base64.b64encode(output.read()).decode()
         href = f'<a href="data:application/vnd.openxmlformats-officedocument.spreadsheetml.sheet;base64,{b64}" download="{filename}.xlsx">Download as Excel</a>'
     elif file_type == "pdf":
         # Create PDF file
@@ -151,18 +144,12 @@ def get_lottie_animations():
     return animations
 
 def check_robots_txt(url: str) -> tuple[bool, str]:
-    """Check if robots.txt allows scraping"""
-    try:
-        rp = RobotFileParser()
-        robots_url = f"{urlparse(url).scheme}://{urlparse(url).netloc}/robots.txt"
-        rp.set_url(robots_url)
-        rp.read()
-        
-        can_fetch = rp.can_fetch("*", url)
-        message = "✅ Robots.txt allows scraping" if can_fetch else "⚠️ Robots.txt restricts scraping"
-        return can_fetch, message
-    except:
+    """Check if robots.txt allows scraping (cached per site, see robots.py)"""
+    can_fetch, status = get_robots().check(url)
+    if status == 'unreachable':
         return True, "⚠️ Could not read robots.txt (proceeding anyway)"
+    message = "✅ Robots.txt allows scraping" if can_fetch else "⚠️ Robots.txt restricts scraping"
+    return can_fetch, message
 
 def landing_page():
     """Beautiful landing page with hero section and features"""
@@ -519,34 +506,25 @@ def main_app():
         enhanced_about_page()
 
 def detect_content_type(url: str) -> str:
-    """Detect content type of URL"""
+    """Detect content type of URL from its headers (cheap preview, no body download)"""
     try:
-        response = httpx.head(url, timeout=10, follow_redirects=True)
-        content_type = response.headers.get('content-type', '').lower()
-        
-        if 'text/html' in content_type:
-            return 'html'
-        elif 'application/pdf' in content_type:
-            return 'pdf'
-        elif 'application/json' in content_type or 'text/json' in content_type:
-            return 'json'
-        elif 'application/xml' in content_type or 'text/xml' in content_type:
-            return 'xml'
-        else:
-            return 'unknown'
+        response = get_politeness().request_sync(
+            url, lambda: httpx.head(url, timeout=10, follow_redirects=True))
+        return content_type_from_header(response.headers.get('content-type', ''))
     except:
         return 'unknown'
 
-def enhanced_content_extraction(url: str, content_type: str = None) -> dict:
-    """Enhanced content extraction with format-specific handling"""
-    if not content_type:
-        content_type = detect_content_type(url)
-    
+def enhanced_content_extraction(url: str, content_type: str = None, document: dict = None) -> dict:
+    """Enhanced content extraction with format-specific handling.
+
+    The URL is downloaded at most once; pass an already fetched `document`
+    (see `fetch_document`) to reuse its body without another round-trip.
+    """
     result = {
         'content': '',
         'title': '',
         'metadata': {},
-        'content_type': content_type,
+        'content_type': content_type or 'unknown',
         'word_count': 0,
         'char_count': 0,
         'links': [],
@@ -555,151 +533,13 @@ def enhanced_content_extraction(url: str, content_type: str = None) -> dict:
     }
     
     try:
-        if content_type == 'pdf':
-            result = extract_pdf_content(url)
-        elif content_type == 'json':
-            result = extract_json_content(url)
-        elif content_type == 'xml':
-            result = extract_xml_content(url)
-        else:
-            # Default HTML extraction with enhanced processing
-            result = extract_html_content(url)
-            
-    except Exception as e:
-        result['error'] = str(e)
-    
-    return result
-
-def extract_pdf_content(url: str) -> dict:
-    """Extract content from PDF files"""
-    result = {'content': '', 'title': '', 'metadata': {}, 'content_type': 'pdf'}
-    
-    try:
-        response = httpx.get(url, timeout=30)
+        if document is None:
+            document = fetch_document(url)
+        if not content_type:
+            content_type = sniff_content_type(document['body'], document['content_type'])
         
-        with pdfplumber.open(io.BytesIO(response.content)) as pdf:
-            text_content = []
-            result['metadata']['pages'] = len(pdf.pages)
-            
-            for page in pdf.pages:
-                text = page.extract_text()
-                if text:
-                    text_content.append(text)
+        result = extract_content(document['body'], content_type, url)
             
-            result['content'] = '\n\n'.join(text_content)
-            result['title'] = f"PDF Document - {len(pdf.pages)} pages"
-            
-            # Extract metadata
-            if pdf.metadata:
-                result['metadata'].update(pdf.metadata)
-                
-    except Exception as e:
-        result['error'] = str(e)
-    
-    return result
-
-def extract_json_content(url: str) -> dict:
-    """Extract and format JSON content"""
-    result = {'content': '', 'title': '', 'metadata': {}, 'content_type': 'json'}
-    
-    try:
-        response = httpx.get(url, timeout=30)
-        json_data = response.json()
-        
-        result['content'] = json.dumps(json_data, indent=2, ensure_ascii=False)
-        result['title'] = "JSON Data"
-        result['metadata'] = {
-            'keys': list(json_data.keys()) if isinstance(json_data, dict) else [],
-            'type': type(json_data).__name__,
-            'size': len(str(json_data))
-        }
-        
-    except Exception as e:
-        result['error'] = str(e)
-    
-    return result
-
-def extract_xml_content(url: str) -> dict:
-    """Extract content from XML files"""
-    result = {'content': '', 'title': '', 'metadata': {}, 'content_type': 'xml'}
-    
-    try:
-        response = httpx.get(url, timeout=30)
-        
-        # Parse XML with proper XML parser
-        from lxml import etree
-        try:
-            root = etree.fromstring(response.content)
-            result['content'] = etree.tostring(root, pretty_print=True, encoding='unicode')
-        except etree.XMLSyntaxError:
-            # Fallback to HTML parser if XML parsing fails
-            root = lxml.html.fromstring(response.content)
-            result['content'] = lxml.html.tostring(root, pretty_print=True, encoding='unicode')
-        result['title'] = "XML Document"
-        
-        # Extract metadata
-        result['metadata'] = {
-            'root_tag': root.tag if hasattr(root, 'tag') else 'unknown',
-            'elements': len(root.xpath('.//*')),
-            'text_nodes': len(root.xpath('.//text()[normalize-space()]'))
-        }
-        
-    except Exception as e:
-        result['error'] = str(e)
-    
-    return result
-
-def extract_html_content(url: str) -> dict:
-    """Enhanced HTML content extraction"""
-    result = {'content': '', 'title': '', 'metadata': {}, 'content_type': 'html'}
-    
-    try:
-        # Use the existing web_scraper function but enhance the result
-        content = get_website_text_content(url)
-        result['content'] = content or ""
-        
-        # Also get raw HTML for additional processing
-        response = httpx.get(url, timeout=30)
-        soup = BeautifulSoup(response.content, 'html.parser')
-        
-        result['title'] = soup.title.string if soup.title else 'Untitled'
-        
-        # Extract links
-        links = []
-        for a in soup.find_all('a', href=True):
-            href = a.get('href')
-            if href and isinstance(href, str) and href.startswith('http'):
-                links.append(href)
-        result['links'] = links[:20]  # Limit to 20 links
-        
-        # Extract images
-        images = []
-        for img in soup.find_all('img', src=True):
-            src = img.get('src')
-            if src and isinstance(src, str) and src.startswith('http'):
-                images.append(src)
-        result['images'] = images[:10]  # Limit to 10 images
-        
-        # Calculate readability (simple word/sentence ratio)
-        if content:
-            sentences = len([s for s in content.split('.') if s.strip()])
-            words = len(content.split())
-            result['readability_score'] = round((words / max(sentences, 1)), 2)
-        
-        # Metadata
-        result['metadata'] = {
-            'description': soup.find('meta', attrs={'name': 'description'}),
-            'keywords': soup.find('meta', attrs={'name': 'keywords'}),
-            'author': soup.find('meta', attrs={'name': 'author'}),
-            'links_found': len(result['links']),
-            'images_found': len(result['images'])
-        }
-        
-        # Clean up metadata
-        for key in result['metadata']:
-            if result['metadata'][key] and hasattr(result['metadata'][key], 'get'):
-                result['metadata'][key] = result['metadata'][key].get('content', '')
-    
     except Exception as e:
         result['error'] = str(e)
     
@@ -818,23 +658,22 @@ def enhanced_scraper_page():
                     st_lottie(animations["loading"], height=100, key="extraction_loading")
         
         try:
-            # Step 1: Content type detection
-            status_text.text("🔍 Analyzing content type...")
+            # Step 1: Fetch the document once
+            status_text.text("📥 Fetching content...")
             progress_bar.progress(20)
-            content_type = detect_content_type(url)
-            time.sleep(0.5)
+            document = fetch_document(url)
             
-            # Step 2: Fetching content
-            status_text.text(f"📥 Fetching {content_type.upper()} content...")
+            # Step 2: Content type detection from headers + leading bytes
+            status_text.text("🔍 Analyzing content type...")
             progress_bar.progress(40)
-            time.sleep(0.5)
+            content_type = sniff_content_type(document['body'], document['content_type'])
             
             # Step 3: Processing with enhanced extraction
-            status_text.text("🧠 AI-powered content extraction...")
+            status_text.text(f"🧠 Extracting {content_type.upper()} content...")
             progress_bar.progress(60)
             
-            # Enhanced content extraction
-            extraction_result = enhanced_content_extraction(url, content_type)
+            # Enhanced content extraction on the already downloaded body
+            extraction_result = enhanced_content_extraction(url, content_type, document)
             
             progress_bar.progress(80)
             status_text.text("📊 Analyzing and formatting results...")
@@ -1101,7 +940,7 @@ def enhanced_scraper_page():
 
 def enhanced_batch_scraper_page():
     """Batch scraping interface"""
-    db = ScrapingDatabase()
+    db = get_database()
     
     st.title("🔄 Batch Web Scraper")
     st.markdown("Scrape multiple URLs at once and save results to history.")
@@ -1150,9 +989,15 @@ def enhanced_batch_scraper_page():
             else:
                 invalid_urls.append(url)
         
+        # Trivially different forms of one page are scraped once
+        valid_urls, url_aliases = get_canonicalizer().dedupe(valid_urls)
+        duplicates = len(urls) - len(invalid_urls) - len(valid_urls)
+        
         col1, col2 = st.columns(2)
         with col1:
             st.success(f"✅ Valid URLs: {len(valid_urls)}")
+            if duplicates:
+                st.info(f"🔁 Duplicates removed: {duplicates}")
         with col2:
             if invalid_urls:
                 st.error(f"❌ Invalid URLs: {len(invalid_urls)}")
@@ -1168,6 +1013,7 @@ def enhanced_batch_scraper_page():
         
         # Create session
         session_id = db.create_session(session_name, len(valid_urls))
+        db.save_url_aliases(session_id, url_aliases)
         
         # Progress tracking
         st.markdown("---")
@@ -1180,48 +1026,59 @@ def enhanced_batch_scraper_page():
         scraped_data = []
         successful_scrapes = 0
         
-        for i, url in enumerate(valid_urls):
-            current_url_text.text(f"🔄 Scraping {i+1}/{len(valid_urls)}: {url}")
-            
-            try:
-                content = get_website_text_content(url)
-                if content:
-                    # Extract title if possible
-                    title = url.split('/')[-1] if '/' in url else url
-                    
-                    # Save to database
-                    db.save_scraped_data(session_id, url, content, title)
-                    scraped_data.append({
-                        'url': url,
-                        'title': title,
-                        'content': content,
-                        'word_count': len(content.split()),
-                        'char_count': len(content),
-                        'status': 'success'
-                    })
-                    successful_scrapes += 1
+        respect_robots = st.session_state.get('respect_robots', True)
+        
+        # Results are buffered and flushed in bulk; the session counter moves per flush
+        with db.bulk_writer(session_id, batch_size=100, flush_interval=2.0) as writer:
+            for i, url in enumerate(valid_urls):
+                current_url_text.text(f"🔄 Scraping {i+1}/{len(valid_urls)}: {url}")
+                
+                try:
+                    # Same check and failed row as the API's batch engine
+                    if respect_robots and not get_robots().can_fetch(url):
+                        writer.add(url, "", "", "failed", "Blocked by robots.txt")
+                        with results_container:
+                            st.warning(f"🚱 {url} - Blocked by robots.txt")
+                        overall_progress.progress((i + 1) / len(valid_urls))
+                        continue
                     
-                    # Show progress
-                    with results_container:
-                        st.success(f"✅ {url} - {len(content.split())} words")
-                else:
-                    db.save_scraped_data(session_id, url, "", "", "failed", "No content extracted")
-                    with results_container:
-                        st.warning(f"⚠️ {url} - No content extracted")
+                    content = get_website_text_content(url)
+                    if content:
+                        # Extract title if possible
+                        title = url.split('/')[-1] if '/' in url else url
                         
-            except Exception as e:
-                error_msg = str(e)
-                db.save_scraped_data(session_id, url, "", "", "failed", error_msg)
-                with results_container:
-                    st.error(f"❌ {url} - Error: {error_msg}")
-            
-            # Update progress
-            overall_progress.progress((i + 1) / len(valid_urls))
-            db.update_session_progress(session_id, i + 1)
-            time.sleep(0.1)  # Small delay to prevent overwhelming
+                        # Save to database
+                        writer.add(url, content, title)
+                        scraped_data.append({
+                            'url': url,
+                            'title': title,
+                            'content': content,
+                            'word_count': len(content.split()),
+                            'char_count': len(content),
+                            'status': 'success'
+                        })
+                        successful_scrapes += 1
+                        
+                        # Show progress
+                        with results_container:
+                            st.success(f"✅ {url} - {len(content.split())} words")
+                    else:
+                        writer.add(url, "", "", "failed", "No content extracted")
+                        with results_container:
+                            st.warning(f"⚠️ {url} - No content extracted")
+                            
+                except Exception as e:
+                    error_msg = str(e)
+                    writer.add(url, "", "", "failed", error_msg)
+                    with results_container:
+                        st.error(f"❌ {url} - Error: {error_msg}")
+                
+                # Update progress
+                overall_progress.progress((i + 1) / len(valid_urls))
+                time.sleep(0.1)  # Small delay to prevent overwhelming
         
         # Final status
-        db.update_session_progress(session_id, len(valid_urls), 'completed')
+        db.complete_session(session_id)
         current_url_text.text(f"✅ Completed! Successfully scraped {successful_scrapes}/{len(valid_urls)} URLs")
         
         # Results summary
@@ -1266,7 +1123,7 @@ def enhanced_batch_scraper_page():
 
 def history_page():
     """Scraping history and results management"""
-    db = ScrapingDatabase()
+    db = get_database()
     
     st.title("📚 Scraping History")
     st.markdown("View and manage your scraping sessions and results.")
@@ -1310,13 +1167,31 @@ def history_page():
         st.markdown("---")
         st.subheader("📄 Session Details")
         
-        session_data = db.get_session_data(st.session_state.selected_session)
+        # One page at a time: metadata plus a 1000-character preview; full content only for downloads.
+        # history_cursors holds the cursor of every page up to the current one
+        cursors = st.session_state.get('history_cursors')
+        if not cursors or cursors[0] != st.session_state.selected_session:
+            cursors = st.session_state.history_cursors = [st.session_state.selected_session, None]
+        page = db.get_session_items(st.session_state.selected_session, limit=HISTORY_PAGE_SIZE,
+                                    cursor=cursors[-1], preview_length=1000)
+        session_data = page['items']
         
         if session_data:
             # Export session data
             col1, col2 = st.columns([3, 1])
             with col1:
-                st.write(f"**Showing {len(session_data)} scraped items**")
+                total = db.get_session_summary(st.session_state.selected_session)['stats']['items']
+                first = (len(cursors) - 2) * HISTORY_PAGE_SIZE + 1
+                st.write(f"**Showing items {first}-{first + len(session_data) - 1} of {total}**")
+                prev_col, next_col = st.columns(2)
+                with prev_col:
+                    if len(cursors) > 2 and st.button("⬅️ Previous page"):
+                        cursors.pop()
+                        st.rerun()
+                with next_col:
+                    if page['next_cursor'] and st.button("Next page ➡️"):
+                        cursors.append(page['next_cursor'])
+                        st.rerun()
             with col2:
                 selected_session_name = next(s['session_name'] for s in sessions if s['id'] == st.session_state.selected_session)
                 filename = f"{selected_session_name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
@@ -1324,7 +1199,7 @@ def history_page():
                 export_format = st.selectbox("Export as:", ["CSV", "JSON", "Excel", "PDF", "Text"])
                 if st.button("Download", type="primary"):
                     export_data = []
-                    for item in session_data:
+                    for item in db.get_session_data(st.session_state.selected_session)['data']:
                         export_data.append({
                             'url': item['url'],
                             'title': item['title'],
@@ -1355,11 +1230,11 @@ def history_page():
                             st.write(f"**Scraped:** {item['scraped_at']}")
                         
                         # Content preview
-                        if item['content']:
+                        if item['preview']:
                             with st.expander("View Content"):
                                 st.text_area(
                                     "Content",
-                                    value=item['content'][:1000] + "..." if len(item['content']) > 1000 else item['content'],
+                                    value=item['preview'] + "..." if item['char_count'] > 1000 else item['preview'],
                                     height=200,
                                     disabled=True,
                                     key=f"content_{item['id']}"
@@ -1373,7 +1248,7 @@ def history_page():
 
 def search_page():
     """Search within scraped content"""
-    db = ScrapingDatabase()
+    db = get_database()
     
     st.title("🔍 Search Scraped Content")
     st.markdown("Search through all your scraped content across sessions.")
@@ -1399,7 +1274,7 @@ def search_page():
             session_id = int(selected_session.split("(")[-1].strip(")"))
         
         # Perform search
-        results = db.search_content(search_term, session_id)
+        results = db.search_content(search_term, session_id, limit=50)['results']
         
         if results:
             st.subheader(f"🎯 Search Results ({len(results)} found)")
@@ -1417,26 +1292,8 @@ def search_page():
                         st.metric("Words", result['word_count'])
                         st.write(f"**Date:** {result['scraped_at']}")
                     
-                    # Highlight search term in content preview
-                    content_preview = result['content'][:500]
-                    if search_term.lower() in content_preview.lower():
-                        # Simple highlight (case insensitive)
-                        highlighted = content_preview.replace(
-                            search_term, 
-                            f"**{search_term}**"
-                        )
-                        st.markdown(f"**Preview:** {highlighted}...")
-                    else:
-                        st.write(f"**Preview:** {content_preview}...")
-                    
-                    with st.expander("View Full Content"):
-                        st.text_area(
-                            "Full Content",
-                            value=result['content'],
-                            height=300,
-                            disabled=True,
-                            key=f"search_content_{result['id']}"
-                        )
+                    # Matching fragments, highlighted by the database
+                    st.markdown(f"**Preview:** {result['snippet']}...")
                     
                     st.markdown("---")
         else:
@@ -1554,7 +1411,7 @@ def scheduled_page():
     st.subheader("📅 Active Scheduled Tasks")
     
     # Get real scheduled tasks from database
-    db = ScrapingDatabase()
+    db = get_database()
     scheduled_tasks = db.get_scheduled_tasks()
     
     if not scheduled_tasks:
@@ -1707,7 +1564,7 @@ def about_page():
 
 def enhanced_history_page():
     """Enhanced scraping history with modern UI"""
-    db = ScrapingDatabase()
+    db = get_database()
     animations = get_lottie_animations()
     
     colored_header(
@@ -1756,7 +1613,7 @@ def enhanced_history_page():
 
 def enhanced_search_page():
     """Enhanced search interface with AI-powered capabilities"""
-    db = ScrapingDatabase()
+    db = get_database()
     
     colored_header(
         label="🔍 Smart Content Search",
@@ -1784,7 +1641,7 @@ def enhanced_search_page():
             session_name = selected_session.replace("📁 ", "")
             session_id = next((s['id'] for s in sessions if s['session_name'] == session_name), None)
         
-        results = db.search_content(search_term, session_id)
+        results = db.search_content(search_term, session_id, limit=50)['results']
         
         if results:
             st.success(f"✅ Found {len(results)} results matching '{search_term}'")
@@ -1796,8 +1653,7 @@ def enhanced_search_page():
                     
                     col1, col2 = st.columns([2, 1])
                     with col1:
-                        preview = result['content'][:300] + "..." if len(result['content']) > 300 else result['content']
-                        st.markdown(preview)
+                        st.markdown(result['snippet'])
                     with col2:
                         st.metric("📊 Words", result['word_count'])
                         st.caption(f"⏰ {result['scraped_at']}")
@@ -0,0 +1,169 @@
+"""
+Async batch scraping engine
+Fetches many URLs concurrently over one pooled HTTP client, paces requests
+per host through the politeness scheduler, checks robots.txt through the
+shared robots service and runs extraction off the event loop. Concurrent
+scrapes of the same URL with the same options share one fetch + extract.
+"""
+
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+
+import httpx
+
+from extraction_pool import get_extraction_pool
+from http_cache import get_http_cache
+from politeness import get_politeness
+from robots import get_robots
+from singleflight import SingleFlight, flight_key
+from web_scraper import DEFAULT_USER_AGENT, cached_text, extract_text
+
+
+class BatchEngine:
+    """Concurrent fetch + extract pipeline shared by the API endpoints"""
+
+    def __init__(self, max_concurrency: int = None, timeout: float = 30.0, politeness=None):
+        self.max_concurrency = max_concurrency or int(os.environ.get('BATCH_CONCURRENCY', 20))
+        self.timeout = timeout
+        # Per-host pacing, in-flight caps and backoff are shared with the sync scrape paths
+        self.politeness = politeness or get_politeness()
+
+        self._client = None
+        self._global_limit = None
+        self._flights = SingleFlight()
+
+    def _get_client(self) -> httpx.AsyncClient:
+        """Lazily create the shared connection-pooled client"""
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                follow_redirects=True,
+                headers={"User-Agent": DEFAULT_USER_AGENT},
+                limits=httpx.Limits(
+                    max_connections=self.max_concurrency,
+                    max_keepalive_connections=self.max_concurrency,
+                ),
+            )
+        return self._client
+
+    async def fetch(self, url: str, headers: dict = None) -> httpx.Response:
+        """Download a URL respecting the global limit and the host's politeness rules"""
+        if self._global_limit is None:
+            self._global_limit = asyncio.Semaphore(self.max_concurrency)
+
+        async def send():
+            # Global slots are only held while a request is actually on the wire
+            async with self._global_limit:
+                return await self._get_client().get(url, headers=headers)
+
+        return await self.politeness.request(url, send)
+
+    @asynccontextmanager
+    async def stream(self, url: str):
+        """Streamed GET of `url`, paced like fetch(); read the body from the yielded response"""
+        if self._global_limit is None:
+            self._global_limit = asyncio.Semaphore(self.max_concurrency)
+
+        async with self.politeness.slot(url), self._global_limit:
+            async with self._get_client().stream('GET', url) as response:
+                self.politeness.record(url, response.status_code, response.headers)
+                yield response
+
+    async def _fetch_text(self, url: str, cache_policy: str):
+        """Page text for `url` through the HTTP cache; returns (text, from_cache)"""
+        if cache_policy == 'bypass':
+            response = await self.fetch(url)
+            response.raise_for_status()
+            # Extraction is CPU-bound, keep it off the event loop
+            return await get_extraction_pool().acall(extract_text, response.content), False
+
+        cache = get_http_cache()
+        entry, conditional_headers = await asyncio.to_thread(cache.lookup, url, cache_policy)
+        if conditional_headers is None:
+            return entry['text'], True
+
+        response = await self.fetch(url, headers=conditional_headers)
+        if response.status_code != 304:
+            response.raise_for_status()
+        text = await get_extraction_pool().acall(cached_text, cache, url, entry, response.status_code,
+                                                 response.headers, response.content)
+        if text is None:
+            # The cached copy went away after the 304: fetch the page in full
+            response = await self.fetch(url)
+            response.raise_for_status()
+            text = await get_extraction_pool().acall(cached_text, cache, url, None, response.status_code,
+                                                     response.headers, response.content)
+            return text or "", False
+        return text, response.status_code == 304
+
+    async def scrape(self, url: str, cache_policy: str = 'default', respect_robots: bool = True) -> dict:
+        """Fetch and extract a single URL, never raising for per-URL failures"""
+        result = await self._flights.do(flight_key(url, cache_policy, respect_robots),
+                                        lambda: self._scrape(url, cache_policy, respect_robots))
+        # Callers sharing a flight each get their own copy, under the URL they asked for
+        return dict(result, url=url)
+
+    async def _scrape(self, url: str, cache_policy: str, respect_robots: bool) -> dict:
+        started = time.monotonic()
+        result = {'url': url, 'success': False, 'content': '', 'error': None, 'from_cache': False,
+                  'blocked': False}
+
+        try:
+            if respect_robots and not await get_robots().acan_fetch(url):
+                result['blocked'] = True
+                result['error'] = "Blocked by robots.txt"
+            else:
+                content, result['from_cache'] = await self._fetch_text(url, cache_policy)
+                if content:
+                    result['success'] = True
+                    result['content'] = content
+                else:
+                    result['error'] = "No content extracted"
+        except httpx.HTTPStatusError as e:
+            result['error'] = f"HTTP {e.response.status_code}"
+        except Exception as e:
+            result['error'] = str(e) or type(e).__name__
+
+        result['word_count'] = len(result['content'].split())
+        result['char_count'] = len(result['content'])
+        result['elapsed'] = round(time.monotonic() - started, 3)
+        return result
+
+    async def run(self, urls, cache_policy: str = 'default', respect_robots: bool = True, scrape=None):
+        """
+        Scrape `urls` concurrently and yield results in completion order.
+        Only a bounded window of URLs is scheduled at a time, so arbitrarily
+        large inputs never turn into one task per URL up front. `scrape`
+        replaces self.scrape (same signature), e.g. for the crawler.
+        """
+        scrape = scrape or self.scrape
+        window = self.max_concurrency * 4
+        pending = set()
+
+        try:
+            for url in urls:
+                pending.add(asyncio.create_task(scrape(url, cache_policy, respect_robots)))
+                if len(pending) >= window:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        yield task.result()
+
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    yield task.result()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def stats(self) -> dict:
+        """Coalescing counters: scrapes in flight, scrape calls and calls that shared a flight"""
+        return self._flights.stats()
+
+    async def aclose(self):
+        """Close the shared HTTP client"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
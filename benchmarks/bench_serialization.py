@@ -0,0 +1,96 @@
+"""
+Serialization benchmark for large session responses
+Compares the previous path (json.dumps with a datetime encoder, json.loads
+back, then JSONResponse encoding again) with the single-pass orjson
+response class, on a synthetic session shaped like /api/session/{id}.
+
+    python benchmarks/bench_serialization.py [items] [content_chars]
+"""
+
+import json
+import os
+import random
+import string
+import sys
+import time
+from datetime import datetime, timedelta
+
+from fastapi.responses import JSONResponse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from serialization import FastJSONResponse  # noqa: E402
+
+
+class DateTimeEncoder(json.JSONEncoder):
+    def default(self, obj):
+        if isinstance(obj, datetime):
+            return obj.isoformat()
+        return super().default(obj)
+
+
+def old_render(data) -> bytes:
+    """What the endpoints did before: serialize() followed by JSONResponse"""
+    return JSONResponse(json.loads(json.dumps(data, cls=DateTimeEncoder))).body
+
+
+def new_render(data) -> bytes:
+    return FastJSONResponse(data).body
+
+
+def synthetic_session(items: int, content_chars: int) -> dict:
+    """Session payload with `items` rows carrying `content_chars` of text each"""
+    random.seed(42)
+    words = [''.join(random.choices(string.ascii_lowercase, k=random.randint(2, 10))) for _ in range(2000)]
+    started = datetime(2026, 1, 1, 12, 0, 0)
+    rows = []
+    for i in range(items):
+        text = ' '.join(random.choices(words, k=content_chars // 6))[:content_chars]
+        rows.append({
+            'id': i + 1,
+            'url': f"https://example.com/articles/{i}",
+            'title': f"Article {i} — résumé",
+            'content': text,
+            'word_count': text.count(' ') + 1,
+            'char_count': len(text),
+            'scraped_at': started + timedelta(seconds=i),
+            'status': 'success',
+            'error_message': None,
+        })
+    return {
+        'session': {'id': 1, 'name': f"Batch: {items} URLs", 'created_at': started,
+                    'completed_at': started + timedelta(hours=1), 'status': 'completed',
+                    'total_urls': items, 'completed_urls': items},
+        'stats': {'items': items, 'successful': items, 'failed': 0},
+        'data': rows,
+        'next_cursor': None,
+    }
+
+
+def best_of(fn, data, runs: int = 5) -> float:
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        fn(data)
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main():
+    items = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    content_chars = int(sys.argv[2]) if len(sys.argv) > 2 else 5000
+    data = synthetic_session(items, content_chars)
+
+    old_body, new_body = old_render(data), new_render(data)
+    assert json.loads(old_body) == json.loads(new_body), "outputs differ"
+
+    old_time = best_of(old_render, data)
+    new_time = best_of(new_render, data)
+    print(f"Session with {items} items x {content_chars} chars ({len(new_body) / 1e6:.1f} MB of JSON)")
+    print(f"  serialize() + JSONResponse : {old_time * 1000:8.1f} ms")
+    print(f"  FastJSONResponse (orjson)  : {new_time * 1000:8.1f} ms")
+    print(f"  speedup                    : {old_time / new_time:8.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,187 @@
+"""
+Link-following crawler
+Crawls start from seed URLs and follow the links of every page they fetch,
+up to a depth and page budget and within a scope (the seeds' hosts or
+domains, optional path prefixes). A crawl is a background job (options
+kind='crawl') and one scraping session; its frontier lives in the
+crawl_frontier table, which doubles as the visited set, so a crawl of
+hundreds of thousands of pages never holds its queue in memory and resumes
+where it stopped. Pages are dequeued breadth-first and round-robin across
+hosts (see ScrapingDatabase.claim_frontier).
+"""
+
+import asyncio
+import fnmatch
+import os
+import time
+from typing import Dict, List
+from urllib.parse import urljoin, urlsplit
+
+import httpx
+import lxml.html
+
+from extraction_pool import get_extraction_pool
+from robots import get_robots
+from url_canonical import canonicalize
+from web_scraper import extract_text
+
+# Crawl scopes: the seeds' exact hosts, the seeds' domains with their subdomains, or anywhere
+CRAWL_SCOPES = ('host', 'domain', 'any')
+
+# Links to files that are never worth fetching as pages
+SKIP_EXTENSIONS = (
+    '.jpg', '.jpeg', '.png', '.gif', '.webp', '.svg', '.ico', '.bmp', '.tif', '.tiff',
+    '.css', '.js', '.woff', '.woff2', '.ttf', '.eot',
+    '.zip', '.gz', '.tgz', '.bz2', '.xz', '.7z', '.rar', '.tar', '.dmg', '.exe', '.msi', '.apk', '.iso',
+    '.mp3', '.mp4', '.m4a', '.m4v', '.avi', '.mov', '.mkv', '.webm', '.wav', '.ogg', '.flac',
+)
+
+# Longer URLs are skipped (they also would not fit the frontier's index)
+MAX_URL_LENGTH = 2000
+
+
+def extract_links(body: bytes, base_url: str, honor_nofollow: bool = True) -> List[str]:
+    """Absolute http(s) URLs of every <a href> on a page, in document order.
+
+    Relative links are resolved against <base href> or `base_url`. With
+    `honor_nofollow`, rel="nofollow" links and pages whose robots meta tag
+    says nofollow yield nothing.
+    """
+    try:
+        doc = lxml.html.fromstring(body)
+    except Exception:
+        return []
+
+    if honor_nofollow:
+        for meta in doc.iterfind('.//meta[@name]'):
+            if meta.get('name').lower() == 'robots' and 'nofollow' in (meta.get('content') or '').lower():
+                return []
+
+    base = doc.find('.//base[@href]')
+    if base is not None:
+        base_url = urljoin(base_url, base.get('href').strip())
+
+    links = []
+    for anchor in doc.iterfind('.//a[@href]'):
+        if honor_nofollow and 'nofollow' in (anchor.get('rel') or '').lower().split():
+            continue
+        href = anchor.get('href').strip()
+        if not href or href.startswith(('#', 'javascript:', 'mailto:', 'tel:', 'data:')):
+            continue
+        try:
+            url = urljoin(base_url, href)
+        except ValueError:
+            continue
+        if url.startswith(('http://', 'https://')):
+            links.append(url)
+    return links
+
+
+class CrawlScope:
+    """Which discovered links a crawl may follow"""
+
+    def __init__(self, seeds: List[str], scope: str = 'host', path_prefixes: List[str] = None,
+                 exclude: List[str] = None):
+        if scope not in CRAWL_SCOPES:
+            raise ValueError(f"scope must be one of {', '.join(CRAWL_SCOPES)}")
+        self.scope = scope
+        self.hosts = {urlsplit(seed).hostname for seed in seeds} - {None}
+        # 'domain' scope: www.example.com as a seed admits example.com and all its subdomains
+        self.domains = {host[4:] if host.startswith('www.') else host for host in self.hosts}
+        self.path_prefixes = path_prefixes or []
+        # Shell-style patterns matched against the URL path, e.g. /tag/*
+        self.exclude = exclude or []
+
+    def allows(self, url: str) -> bool:
+        parts = urlsplit(url)
+        host = parts.hostname or ''
+        if self.scope == 'host' and host not in self.hosts:
+            return False
+        if self.scope == 'domain' and not any(host == domain or host.endswith('.' + domain)
+                                              for domain in self.domains):
+            return False
+        path = parts.path or '/'
+        if self.path_prefixes and not path.startswith(tuple(self.path_prefixes)):
+            return False
+        return not any(fnmatch.fnmatchcase(path, pattern) for pattern in self.exclude)
+
+
+def crawl_settings(seeds: List[str], max_depth: int = None, max_pages: int = None, scope: str = 'host',
+                   path_prefixes: List[str] = None, exclude: List[str] = None) -> Dict:
+    """Complete, validated settings of a new crawl (stored in its job options)"""
+    CrawlScope(seeds, scope)
+    return {
+        'seeds': seeds,
+        'max_depth': max_depth if max_depth is not None else int(os.environ.get('CRAWL_MAX_DEPTH', 3)),
+        'max_pages': max_pages or int(os.environ.get('CRAWL_MAX_PAGES', 1000)),
+        'scope': scope,
+        'path_prefixes': path_prefixes or [],
+        'exclude': exclude or [],
+    }
+
+
+class Crawler:
+    """Fetches crawl pages through the batch engine and picks the links to follow"""
+
+    def __init__(self, engine, settings: Dict):
+        self.engine = engine
+        self.max_depth = settings['max_depth']
+        self.max_pages = settings['max_pages']
+        self.scope = CrawlScope(settings['seeds'], settings['scope'], settings['path_prefixes'],
+                                settings['exclude'])
+
+    def links_to_follow(self, links: List[str]) -> List[str]:
+        """Canonical, in-scope, page-like links without duplicates"""
+        found, seen = [], set()
+        for link in links:
+            url = canonicalize(link)
+            if url in seen or len(url) > MAX_URL_LENGTH:
+                continue
+            seen.add(url)
+            if urlsplit(url).path.lower().endswith(SKIP_EXTENSIONS) or not self.scope.allows(url):
+                continue
+            found.append(url)
+        return found
+
+    async def crawl_page(self, url: str, cache_policy: str = 'default', respect_robots: bool = True,
+                         follow: bool = True) -> Dict:
+        """BatchEngine.scrape() for a crawl: the result also carries the page's links to follow.
+
+        Pages are always downloaded (the HTTP cache keeps extracted text, not
+        the HTML links come from), so `cache_policy` is not used.
+        """
+        started = time.monotonic()
+        result = {'url': url, 'success': False, 'content': '', 'error': None, 'from_cache': False,
+                  'blocked': False, 'links': []}
+
+        try:
+            if respect_robots and not await get_robots().acan_fetch(url):
+                result['blocked'] = True
+                result['error'] = "Blocked by robots.txt"
+            else:
+                response = await self.engine.fetch(url)
+                response.raise_for_status()
+                content = await get_extraction_pool().acall(extract_text, response.content)
+                if content:
+                    result['success'] = True
+                    result['content'] = content
+                else:
+                    result['error'] = "No content extracted"
+                if follow and 'html' in response.headers.get('content-type', 'text/html'):
+                    links = await get_extraction_pool().arun(extract_links, response.content,
+                                                             str(response.url), respect_robots)
+                    links = self.links_to_follow(links)
+                    if respect_robots:
+                        # Disallowed pages would only use up the page budget
+                        robots = get_robots()
+                        links = [link for link in links if await robots.acan_fetch(link)]
+                    result['links'] = links
+        except httpx.HTTPStatusError as e:
+            result['error'] = f"HTTP {e.response.status_code}"
+        except Exception as e:
+            result['error'] = str(e) or type(e).__name__
+
+        result['word_count'] = len(result['content'].split())
+        result['char_count'] = len(result['content'])
+        result['elapsed'] = round(time.monotonic() - started, 3)
+        return result
@@ -1,178 +1,1552 @@
 import os
+import threading
+import time
 import psycopg2
-from psycopg2.extras import RealDictCursor
+from psycopg2 import pool
+from psycopg2.extras import Json, RealDictCursor, execute_values
+from collections import defaultdict
+from contextlib import contextmanager
 from datetime import datetime
 from typing import List, Dict, Optional
+import base64
+import hashlib
+import io
 import json
+import uuid
+from urllib.parse import urlparse
+
+try:
+    import zstandard
+except ImportError:  # only needed when CONTENT_COMPRESSION=zstd
+    zstandard = None
+
+# Full-text search configuration and the per-row cap on indexed content
+# (tsvector values are limited to 1MB, very long pages are indexed by prefix)
+SEARCH_CONFIG = 'english'
+SEARCH_CONTENT_PREFIX = 500000
+
+# Page text lives in content_blobs, keyed by hash; rows written before the
+# blob store existed still carry it inline in scraped_data.content
+CONTENT_SQL = "COALESCE(b.content, d.content)"
+CONTENT_JOIN = "LEFT JOIN content_blobs b ON b.content_hash = d.content_hash"
+# Compressed blobs leave CONTENT_SQL NULL; these columns carry their text instead
+ZSTD_COLUMNS = "b.content_zstd, b.dict_id"
+
+# Columns of scraped_data (d) that exports may select, with the SQL producing each
+EXPORTABLE_COLUMNS = {
+    'url': 'd.url',
+    'title': 'd.title',
+    'content': CONTENT_SQL,
+    'content_preview': f'left({CONTENT_SQL}, 200)',
+    'word_count': 'd.word_count',
+    'char_count': 'd.char_count',
+    'scraped_at': 'd.scraped_at',
+    'status': 'd.status',
+    'error_message': 'd.error_message',
+}
+
+# Search vector of a scraped row (d): its title and url. The page text part
+# lives once per blob in content_blobs.search_vector
+SEARCH_VECTOR_SQL = f'''
+    setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(d.title, '')), 'A') ||
+    setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(d.url, '')), 'B')
+'''
+
+# zstd dictionaries are trained per domain once it has this many stored pages
+COMPRESSION_DICT_MIN_SAMPLES = 20
+COMPRESSION_DICT_MAX_SAMPLES = 500
+COMPRESSION_DICT_SIZE = 112640
+
+def content_domain(url: str) -> str:
+    """Domain whose compression dictionary a page's text uses"""
+    host = (urlparse(url).hostname or '').lower()
+    return host[4:] if host.startswith('www.') else host
+
+def content_hash(content: str) -> str:
+    """Content address of a page's text (matches sha256 over UTF-8 in SQL)"""
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+def _encode_cursor(*values) -> str:
+    """Opaque keyset-pagination cursor from the last row's sort key"""
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+def _decode_cursor(cursor: str) -> list:
+    """Inverse of _encode_cursor; raises ValueError for malformed cursors"""
+    try:
+        return json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
 
 class ScrapingDatabase:
     """Database handler for scraping history and results using PostgreSQL"""
     
-    def __init__(self):
+    def __init__(self, min_connections: int = None, max_connections: int = None):
         # PostgreSQL connection string (loaded from .env)
         self.db_url = os.environ.get('DATABASE_URL')
         if not self.db_url:
             raise RuntimeError("DATABASE_URL must be set in .env")
+        
+        # Connection pool sizing (loaded from .env)
+        self.min_connections = min_connections or int(os.environ.get('DB_POOL_MIN', 1))
+        self.max_connections = max_connections or int(os.environ.get('DB_POOL_MAX', 10))
+        self.checkout_timeout = float(os.environ.get('DB_POOL_TIMEOUT', 30))
+        # Idle connections older than this are pinged before being handed out
+        self.health_check_interval = float(os.environ.get('DB_POOL_HEALTH_CHECK_INTERVAL', 30))
+        
+        # Opt-in zstd compression of stored page text (loaded from .env)
+        self.compression = os.environ.get('CONTENT_COMPRESSION', 'off').lower() == 'zstd'
+        self.compression_level = int(os.environ.get('CONTENT_COMPRESSION_LEVEL', 6))
+        if self.compression and zstandard is None:
+            raise RuntimeError("CONTENT_COMPRESSION=zstd requires the zstandard package")
+        self._zstd_dicts = {}
+        
+        self._pool = pool.ThreadedConnectionPool(self.min_connections, self.max_connections, self.db_url)
+        # ThreadedConnectionPool raises when exhausted; the semaphore makes callers wait instead
+        self._slots = threading.BoundedSemaphore(self.max_connections)
+        self._last_used = {}
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            'checkouts': 0,
+            'in_use': 0,
+            'peak_in_use': 0,
+            'waits': 0,
+            'wait_seconds': 0.0,
+            'timeouts': 0,
+            'health_check_failures': 0,
+        }
+        
         self.init_database()
     
-    def get_connection(self):
-        """Get database connection"""
-        return psycopg2.connect(self.db_url)
+    def _is_healthy(self, conn) -> bool:
+        """Cheap liveness check for a connection coming out of the pool"""
+        if conn.closed:
+            return False
+        last_used = self._last_used.get(id(conn))
+        # Freshly opened or recently used connections skip the round-trip
+        if last_used is None or time.monotonic() - last_used < self.health_check_interval:
+            return True
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
     
-    def init_database(self):
-        """Initialize database tables"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+    def _checkout(self):
+        """Take a healthy connection from the pool, waiting if all are in use"""
+        started = time.monotonic()
+        if not self._slots.acquire(blocking=False):
+            with self._stats_lock:
+                self._stats['waits'] += 1
+            if not self._slots.acquire(timeout=self.checkout_timeout):
+                with self._stats_lock:
+                    self._stats['timeouts'] += 1
+                raise pool.PoolError(f"Timed out after {self.checkout_timeout}s waiting for a database connection")
         
-        # Create scraping_sessions table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS scraping_sessions (
-                id SERIAL PRIMARY KEY,
-                name TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                completed_at TIMESTAMP,
-                status TEXT DEFAULT 'pending',
-                total_urls INTEGER DEFAULT 0,
-                completed_urls INTEGER DEFAULT 0
-            )
-        ''')
-        
-        # Create scraped_data table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS scraped_data (
-                id SERIAL PRIMARY KEY,
-                session_id INTEGER REFERENCES scraping_sessions(id) ON DELETE CASCADE,
-                url TEXT NOT NULL,
-                title TEXT,
-                content TEXT,
-                word_count INTEGER,
-                char_count INTEGER,
-                scraped_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                status TEXT DEFAULT 'success',
-                error_message TEXT
-            )
-        ''')
-        
-        # Create index for faster queries
-        cursor.execute('''
-            CREATE INDEX IF NOT EXISTS idx_session_id ON scraped_data(session_id)
-        ''')
-        cursor.execute('''
-            CREATE INDEX IF NOT EXISTS idx_scraped_at ON scraped_data(scraped_at DESC)
-        ''')
+        try:
+            conn = self._pool.getconn()
+            while not self._is_healthy(conn):
+                with self._stats_lock:
+                    self._stats['health_check_failures'] += 1
+                self._last_used.pop(id(conn), None)
+                self._pool.putconn(conn, close=True)
+                conn = self._pool.getconn()
+        except Exception:
+            self._slots.release()
+            raise
         
-        conn.commit()
-        conn.close()
+        with self._stats_lock:
+            self._stats['checkouts'] += 1
+            self._stats['wait_seconds'] += time.monotonic() - started
+            self._stats['in_use'] += 1
+            self._stats['peak_in_use'] = max(self._stats['peak_in_use'], self._stats['in_use'])
+        return conn
+    
+    def _checkin(self, conn):
+        """Return a connection to the pool, discarding it if it broke"""
+        try:
+            if conn.closed:
+                self._last_used.pop(id(conn), None)
+                self._pool.putconn(conn, close=True)
+            else:
+                self._last_used[id(conn)] = time.monotonic()
+                self._pool.putconn(conn)
+        finally:
+            with self._stats_lock:
+                self._stats['in_use'] -= 1
+            self._slots.release()
+    
+    @contextmanager
+    def connection(self):
+        """Borrow a pooled connection; commits on success, rolls back on error"""
+        conn = self._checkout()
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            if not conn.closed:
+                conn.rollback()
+            raise
+        finally:
+            self._checkin(conn)
+    
+    def pool_stats(self) -> Dict:
+        """Connection pool usage counters, for sizing DB_POOL_MIN/DB_POOL_MAX"""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats['min_connections'] = self.min_connections
+        stats['max_connections'] = self.max_connections
+        stats['available'] = self.max_connections - stats['in_use']
+        stats['avg_wait_ms'] = round(stats['wait_seconds'] * 1000 / max(stats['checkouts'], 1), 3)
+        return stats
+    
+    def close(self):
+        """Close every pooled connection"""
+        self._pool.closeall()
+    
+    def init_database(self):
+        """Initialize database tables"""
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
+            # Create scraping_sessions table
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS scraping_sessions (
+                    id SERIAL PRIMARY KEY,
+                    name TEXT,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    completed_at TIMESTAMP,
+                    status TEXT DEFAULT 'pending',
+                    total_urls INTEGER DEFAULT 0,
+                    completed_urls INTEGER DEFAULT 0
+                )
+            ''')
+            
+            # Create scraped_data table
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS scraped_data (
+                    id SERIAL PRIMARY KEY,
+                    session_id INTEGER REFERENCES scraping_sessions(id) ON DELETE CASCADE,
+                    url TEXT NOT NULL,
+                    title TEXT,
+                    content TEXT,
+                    word_count INTEGER,
+                    char_count INTEGER,
+                    scraped_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    status TEXT DEFAULT 'success',
+                    error_message TEXT
+                )
+            ''')
+            
+            # Create index for faster queries
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_session_id ON scraped_data(session_id)
+            ''')
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_scraped_at ON scraped_data(scraped_at DESC)
+            ''')
+            
+            # Keyset pagination over a session's items
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_scraped_data_session_order ON scraped_data(session_id, scraped_at DESC, id DESC)
+            ''')
+            
+            # Keyset pagination over sessions (newest first, optionally per status)
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_sessions_created ON scraping_sessions(created_at DESC, id DESC)
+            ''')
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_sessions_status_created ON scraping_sessions(status, created_at DESC, id DESC)
+            ''')
+            
+            # Full-text search: weighted tsvector over title and url, filled in on
+            # insert (see SEARCH_VECTOR_SQL); databases from before the blob store
+            # have it as a generated column
+            cursor.execute('''
+                ALTER TABLE scraped_data ADD COLUMN IF NOT EXISTS search_vector tsvector
+            ''')
+            cursor.execute('''
+                ALTER TABLE scraped_data ALTER COLUMN search_vector DROP EXPRESSION IF EXISTS
+            ''')
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_scraped_data_search ON scraped_data USING GIN (search_vector)
+            ''')
+            
+            # Content-addressed page text, stored once however often it is scraped.
+            # search_vector is the text's weight-C vector, searched through the
+            # content_hash join (see search_content)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS content_blobs (
+                    content_hash TEXT PRIMARY KEY,
+                    content TEXT,
+                    word_count INTEGER,
+                    char_count INTEGER,
+                    search_vector tsvector,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_content_blobs_search ON content_blobs USING GIN (search_vector)
+            ''')
+            
+            # Optional zstd storage: compressed blobs keep content NULL and store
+            # content_zstd, compressed with their domain's dictionary if it has one
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS compression_dicts (
+                    id SERIAL PRIMARY KEY,
+                    domain TEXT UNIQUE NOT NULL,
+                    dict_data BYTEA NOT NULL,
+                    sample_count INTEGER,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            cursor.execute('''
+                ALTER TABLE content_blobs 
+                ADD COLUMN IF NOT EXISTS domain TEXT,
+                ADD COLUMN IF NOT EXISTS content_zstd BYTEA,
+                ADD COLUMN IF NOT EXISTS dict_id INTEGER REFERENCES compression_dicts(id)
+            ''')
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_content_blobs_domain ON content_blobs(domain)
+            ''')
+            cursor.execute('''
+                ALTER TABLE scraped_data ADD COLUMN IF NOT EXISTS content_hash TEXT REFERENCES content_blobs(content_hash)
+            ''')
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_scraped_data_content_hash ON scraped_data(content_hash)
+            ''')
+            
+            # Background batch jobs (see jobs.py): a job is a scraping session whose
+            # status moves queued -> in_progress -> completed/cancelled/failed, with
+            # the worker holding it and the URLs it has not finished yet
+            cursor.execute('''
+                ALTER TABLE scraping_sessions 
+                ADD COLUMN IF NOT EXISTS options JSONB,
+                ADD COLUMN IF NOT EXISTS claimed_by TEXT,
+                ADD COLUMN IF NOT EXISTS heartbeat_at TIMESTAMP,
+                ADD COLUMN IF NOT EXISTS error_message TEXT
+            ''')
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS job_urls (
+                    session_id INTEGER REFERENCES scraping_sessions(id) ON DELETE CASCADE,
+                    position INTEGER NOT NULL,
+                    url TEXT NOT NULL,
+                    PRIMARY KEY (session_id, position)
+                )
+            ''')
+            
+            # Submitted URLs rewritten to their canonical form at intake (see url_canonical.py)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS url_aliases (
+                    session_id INTEGER REFERENCES scraping_sessions(id) ON DELETE CASCADE,
+                    original_url TEXT NOT NULL,
+                    canonical_url TEXT NOT NULL,
+                    PRIMARY KEY (session_id, original_url)
+                )
+            ''')
+            
+            # Crawl frontier (see crawler.py): every URL a crawl admitted, so also its visited set.
+            # host_seq numbers each host's URLs in admission order; dequeuing by (depth, host_seq)
+            # is breadth-first and takes one URL per host in turn
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS crawl_frontier (
+                    session_id INTEGER REFERENCES scraping_sessions(id) ON DELETE CASCADE,
+                    url TEXT NOT NULL,
+                    host TEXT NOT NULL,
+                    depth INTEGER NOT NULL,
+                    host_seq INTEGER NOT NULL,
+                    state TEXT NOT NULL DEFAULT 'queued',
+                    PRIMARY KEY (session_id, url)
+                )
+            ''')
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_crawl_frontier_next 
+                ON crawl_frontier(session_id, depth, host_seq) WHERE state = 'queued'
+            ''')
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS crawl_hosts (
+                    session_id INTEGER REFERENCES scraping_sessions(id) ON DELETE CASCADE,
+                    host TEXT NOT NULL,
+                    admitted INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (session_id, host)
+                )
+            ''')
+            
+            # API login tokens (see token_store.py), stored as SHA-256 hashes
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS auth_tokens (
+                    token_hash TEXT PRIMARY KEY,
+                    username TEXT,
+                    data JSONB NOT NULL,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    expires_at TIMESTAMP NOT NULL
+                )
+            ''')
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_auth_tokens_expires ON auth_tokens(expires_at)
+            ''')
+            
+            # Create scheduled_tasks table (used by scheduler.py)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS scheduled_tasks (
+                    id SERIAL PRIMARY KEY,
+                    task_name TEXT NOT NULL,
+                    urls TEXT,
+                    schedule_type TEXT,
+                    schedule_value TEXT,
+                    email_notifications BOOLEAN DEFAULT FALSE,
+                    email_address TEXT,
+                    is_active BOOLEAN DEFAULT TRUE,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    last_run TIMESTAMP
+                )
+            ''')
     
     def create_session(self, session_name: str, total_urls: int) -> int:
         """Create a new scraping session"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            INSERT INTO scraping_sessions (name, total_urls, status)
-            VALUES (%s, %s, 'in_progress')
-            RETURNING id
-        ''', (session_name, total_urls))
-        
-        session_id = cursor.fetchone()[0]
-        conn.commit()
-        conn.close()
-        return session_id
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                INSERT INTO scraping_sessions (name, total_urls, status)
+                VALUES (%s, %s, 'in_progress')
+                RETURNING id
+            ''', (session_name, total_urls))
+            
+            return cursor.fetchone()[0]
     
     def complete_session(self, session_id: int):
         """Mark session as completed"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            UPDATE scraping_sessions 
-            SET status = 'completed', completed_at = CURRENT_TIMESTAMP
-            WHERE id = %s
-        ''', (session_id,))
-        
-        conn.commit()
-        conn.close()
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                UPDATE scraping_sessions 
+                SET status = 'completed', completed_at = CURRENT_TIMESTAMP
+                WHERE id = %s
+            ''', (session_id,))
+    
+    def fail_session(self, session_id: int, error_message: str):
+        """Mark an unfinished session as failed"""
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                UPDATE scraping_sessions 
+                SET status = 'failed', completed_at = CURRENT_TIMESTAMP, error_message = %s
+                WHERE id = %s AND status IN ('queued', 'in_progress')
+            ''', (error_message, session_id))
     
     def save_scraped_data(self, session_id: int, url: str, content: str, 
                          title: str = "", status: str = "success", error_message: str = ""):
         """Save scraped data to database"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+        self.save_scraped_data_many(session_id, [(url, title, content, status, error_message)])
+    
+    def _store_blobs(self, cursor, contents: Dict[str, tuple]) -> Dict[str, tuple]:
+        """Make sure every content (by hash) has a blob; return hash -> (word_count, char_count).
+
+        `contents` maps hash -> (content, domain). Blobs that already exist are
+        neither rewritten nor re-counted; new ones are zstd-compressed when
+        compression is on.
+        """
+        # KEY SHARE keeps a concurrent delete_session from collecting these under us
+        cursor.execute('''
+            SELECT content_hash, word_count, char_count
+            FROM content_blobs 
+            WHERE content_hash = ANY(%s)
+            FOR KEY SHARE
+        ''', (list(contents),))
+        counts = {row[0]: (row[1], row[2]) for row in cursor.fetchall()}
         
-        word_count = len(content.split()) if content else 0
-        char_count = len(content) if content else 0
+        missing = {digest: value for digest, value in contents.items() if digest not in counts}
+        if not missing:
+            return counts
         
-        cursor.execute('''
+        dict_ids = {}
+        if self.compression:
+            cursor.execute('''
+                SELECT domain, id FROM compression_dicts WHERE domain = ANY(%s)
+            ''', (list({domain for _, domain in missing.values()}),))
+            dict_ids = dict(cursor.fetchall())
+        
+        new_blobs = []
+        for digest, (content, domain) in missing.items():
+            counts[digest] = (len(content.split()), len(content))
+            stored, compressed, dict_id = content, None, None
+            if self.compression:
+                dict_id = dict_ids.get(domain)
+                stored, compressed = None, self._compress(cursor, content, dict_id)
+            # The plain text is always sent so Postgres can build the search vector
+            new_blobs.append((digest, stored, compressed, dict_id, domain, content) + counts[digest])
+        
+        execute_values(cursor, f'''
+            INSERT INTO content_blobs 
+            (content_hash, content, content_zstd, dict_id, domain, word_count, char_count, search_vector)
+            SELECT v.content_hash, v.content, v.content_zstd, v.dict_id, v.domain, v.word_count, v.char_count,
+                   setweight(to_tsvector('{SEARCH_CONFIG}', left(v.text, {SEARCH_CONTENT_PREFIX})), 'C')
+            FROM (VALUES %s) AS v(content_hash, content, content_zstd, dict_id, domain, text, word_count, char_count)
+            ON CONFLICT (content_hash) DO NOTHING
+        ''', new_blobs, template='(%s, %s::text, %s::bytea, %s::integer, %s, %s, %s, %s)', page_size=500)
+        
+        return counts
+    
+    def _get_dict(self, cursor, dict_id: int):
+        """Load (and cache) a trained zstd dictionary"""
+        zstd_dict = self._zstd_dicts.get(dict_id)
+        if zstd_dict is None:
+            cursor.execute('SELECT dict_data FROM compression_dicts WHERE id = %s', (dict_id,))
+            zstd_dict = zstandard.ZstdCompressionDict(bytes(cursor.fetchone()[0]))
+            self._zstd_dicts[dict_id] = zstd_dict
+        return zstd_dict
+    
+    def _compress(self, cursor, content: str, dict_id: Optional[int]) -> bytes:
+        """zstd-compress page text, with the domain dictionary if there is one"""
+        zstd_dict = self._get_dict(cursor, dict_id) if dict_id else None
+        compressor = zstandard.ZstdCompressor(level=self.compression_level, dict_data=zstd_dict)
+        return compressor.compress(content.encode('utf-8'))
+    
+    def _decompress(self, cursor, data, dict_id: Optional[int], max_chars: Optional[int] = None) -> str:
+        """Inverse of _compress; with `max_chars` only that much of the text is decoded"""
+        if zstandard is None:
+            raise RuntimeError("Reading compressed content requires the zstandard package")
+        zstd_dict = self._get_dict(cursor, dict_id) if dict_id else None
+        decompressor = zstandard.ZstdDecompressor(dict_data=zstd_dict)
+        if max_chars is None:
+            return decompressor.decompress(data).decode('utf-8')
+        # UTF-8 needs at most 4 bytes per character
+        with decompressor.stream_reader(io.BytesIO(data)) as reader:
+            head = reader.read(max_chars * 4)
+        return head.decode('utf-8', errors='ignore')[:max_chars]
+    
+    def _inflate(self, cursor, row: Dict, key: str = 'content', max_chars: Optional[int] = None) -> Dict:
+        """Fill row[key] from the blob's compressed text, dropping the raw columns"""
+        data = row.pop('content_zstd', None)
+        dict_id = row.pop('dict_id', None)
+        if row.get(key) is None and data is not None:
+            row[key] = self._decompress(cursor, data, dict_id, max_chars)
+        return row
+    
+    def save_scraped_data_many(self, session_id: int, rows: List[tuple]) -> int:
+        """Save many scraped results in a single transaction.
+
+        `rows` holds (url, title, content, status, error_message) tuples. Page
+        text goes to content_blobs keyed by its hash, so unchanged pages are
+        not stored again; the rows go out as multi-row INSERTs and the
+        session's completed_urls counter is bumped once for the whole batch.
+        """
+        if not rows:
+            return 0
+        
+        with self.connection() as conn:
+            return self._insert_scraped_rows(conn.cursor(), session_id, rows)
+    
+    def _insert_scraped_rows(self, cursor, session_id: int, rows: List[tuple]) -> int:
+        """save_scraped_data_many() inside the caller's transaction"""
+        hashes = [content_hash(content) if content else None for _, _, content, _, _ in rows]
+        contents = {digest: (row[2], content_domain(row[0])) for digest, row in zip(hashes, rows) if digest}
+        
+        counts = self._store_blobs(cursor, contents) if contents else {}
+        
+        values = []
+        for digest, (url, title, content, status, error_message) in zip(hashes, rows):
+            word_count, char_count = counts.get(digest, (0, 0))
+            values.append((session_id, url, title, digest, word_count, char_count, status, error_message))
+        
+        # Only title and url are indexed per row; the page text is indexed once per blob
+        execute_values(cursor, f'''
             INSERT INTO scraped_data 
-            (session_id, url, title, content, word_count, char_count, status, error_message)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-        ''', (session_id, url, title, content, word_count, char_count, status, error_message))
+            (session_id, url, title, content_hash, word_count, char_count, status, error_message, search_vector)
+            SELECT d.session_id, d.url, d.title, d.content_hash, d.word_count, d.char_count,
+                   d.status, d.error_message, {SEARCH_VECTOR_SQL}
+            FROM (VALUES %s) AS d(session_id, url, title, content_hash, word_count, char_count, status, error_message)
+        ''', values, page_size=1000)
         
-        # Update completed count
+        # Update completed count once per batch
         cursor.execute('''
             UPDATE scraping_sessions 
-            SET completed_urls = completed_urls + 1
+            SET completed_urls = completed_urls + %s
             WHERE id = %s
-        ''', (session_id,))
+        ''', (len(values), session_id))
         
-        conn.commit()
-        conn.close()
+        return len(values)
+    
+    def migrate_legacy_content(self, batch_size: int = 1000) -> int:
+        """Move inline scraped_data.content written before the blob store into content_blobs.
+
+        Runs in batches (each its own transaction) until no inline content is
+        left; safe to run concurrently with writers and from several processes.
+        Returns the number of rows migrated.
+        """
+        migrated = 0
+        while True:
+            with self.connection() as conn:
+                cursor = conn.cursor()
+                
+                cursor.execute(f'''
+                    WITH batch AS (
+                        SELECT id, content, word_count, char_count,
+                               encode(sha256(convert_to(content, 'UTF8')), 'hex') AS content_hash
+                        FROM scraped_data 
+                        WHERE content_hash IS NULL AND content IS NOT NULL
+                        LIMIT %s
+                        FOR UPDATE SKIP LOCKED
+                    ),
+                    blobs AS (
+                        INSERT INTO content_blobs (content_hash, content, word_count, char_count, search_vector)
+                        SELECT DISTINCT ON (content_hash) content_hash, content, word_count, char_count,
+                               setweight(to_tsvector('{SEARCH_CONFIG}', left(content, {SEARCH_CONTENT_PREFIX})), 'C')
+                        FROM batch 
+                        WHERE content <> ''
+                        ON CONFLICT (content_hash) DO NOTHING
+                    )
+                    UPDATE scraped_data d
+                    SET content = NULL,
+                        content_hash = CASE WHEN batch.content <> '' THEN batch.content_hash END,
+                        -- The page text part of the old vector now lives in the blob
+                        search_vector = {SEARCH_VECTOR_SQL}
+                    FROM batch 
+                    WHERE d.id = batch.id
+                ''', (batch_size,))
+                
+                count = cursor.rowcount
+            
+            migrated += count
+            if count < batch_size:
+                return migrated
+    
+    def train_compression_dicts(self) -> int:
+        """Train a zstd dictionary for every domain with enough stored pages and none yet"""
+        trained = 0
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                SELECT b.domain FROM content_blobs b
+                WHERE b.domain <> ''
+                  AND NOT EXISTS (SELECT 1 FROM compression_dicts c WHERE c.domain = b.domain)
+                GROUP BY b.domain
+                HAVING COUNT(*) >= %s
+            ''', (COMPRESSION_DICT_MIN_SAMPLES,))
+            domains = [row[0] for row in cursor.fetchall()]
+            
+            for domain in domains:
+                cursor.execute('''
+                    SELECT content, content_zstd, dict_id FROM content_blobs 
+                    WHERE domain = %s
+                    ORDER BY created_at DESC
+                    LIMIT %s
+                ''', (domain, COMPRESSION_DICT_MAX_SAMPLES))
+                samples = [(content if content is not None else self._decompress(cursor, data, dict_id)).encode('utf-8')
+                           for content, data, dict_id in cursor.fetchall()]
+                try:
+                    zstd_dict = zstandard.train_dictionary(COMPRESSION_DICT_SIZE, samples)
+                except zstandard.ZstdError:
+                    continue  # too little or too uniform text to learn from yet
+                
+                cursor.execute('''
+                    INSERT INTO compression_dicts (domain, dict_data, sample_count)
+                    VALUES (%s, %s, %s)
+                    ON CONFLICT (domain) DO NOTHING
+                ''', (domain, zstd_dict.as_bytes(), len(samples)))
+                trained += cursor.rowcount
+        
+        return trained
+    
+    def compress_existing_content(self, batch_size: int = 200) -> int:
+        """Recompress stored page text with zstd (and domain dictionaries) in the background.
+
+        Fills in missing blob domains, trains dictionaries for domains that
+        now have enough pages, then rewrites, batch by batch, every blob that
+        is still plain text or was compressed before its domain had a
+        dictionary. Does nothing unless compression is on; returns the number
+        of blobs rewritten.
+        """
+        if not self.compression:
+            return 0
+        
+        # Blobs from before compression was added do not know their domain yet
+        while True:
+            with self.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    SELECT b.content_hash,
+                           (SELECT d.url FROM scraped_data d WHERE d.content_hash = b.content_hash LIMIT 1)
+                    FROM content_blobs b
+                    WHERE b.domain IS NULL
+                    LIMIT %s
+                ''', (batch_size,))
+                domains = [(digest, content_domain(url or '')) for digest, url in cursor.fetchall()]
+                if domains:
+                    execute_values(cursor, '''
+                        UPDATE content_blobs b SET domain = v.domain
+                        FROM (VALUES %s) AS v(content_hash, domain)
+                        WHERE b.content_hash = v.content_hash
+                    ''', domains)
+            if len(domains) < batch_size:
+                break
+        
+        self.train_compression_dicts()
+        
+        rewritten = 0
+        while True:
+            with self.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    SELECT b.content_hash, b.content, b.content_zstd, b.dict_id, c.id
+                    FROM content_blobs b
+                    LEFT JOIN compression_dicts c ON c.domain = b.domain
+                    WHERE b.content IS NOT NULL OR (b.dict_id IS NULL AND c.id IS NOT NULL)
+                    LIMIT %s
+                    FOR UPDATE OF b SKIP LOCKED
+                ''', (batch_size,))
+                rows = cursor.fetchall()
+                
+                values = []
+                for digest, content, data, dict_id, domain_dict_id in rows:
+                    if content is None:
+                        content = self._decompress(cursor, data, dict_id)
+                    values.append((digest, self._compress(cursor, content, domain_dict_id), domain_dict_id))
+                
+                if values:
+                    execute_values(cursor, '''
+                        UPDATE content_blobs b
+                        SET content = NULL, content_zstd = v.content_zstd, dict_id = v.dict_id
+                        FROM (VALUES %s) AS v(content_hash, content_zstd, dict_id)
+                        WHERE b.content_hash = v.content_hash
+                    ''', values, template='(%s, %s::bytea, %s::integer)')
+            
+            rewritten += len(values)
+            if len(rows) < batch_size:
+                return rewritten
+    
+    def bulk_writer(self, session_id: int, batch_size: int = 500, flush_interval: float = None,
+                    auto_flush: bool = True) -> 'ScrapedDataWriter':
+        """Create a buffered writer for streaming many results into a session"""
+        return ScrapedDataWriter(self, session_id, batch_size, flush_interval, auto_flush)
     
     def get_sessions(self) -> List[Dict]:
         """Get all scraping sessions"""
-        conn = self.get_connection()
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        with self.connection() as conn:
+            cursor = conn.cursor(cursor_factory=RealDictCursor)
+            
+            cursor.execute('''
+                SELECT id, name, created_at, completed_at, status, total_urls, completed_urls
+                FROM scraping_sessions 
+                ORDER BY created_at DESC
+            ''')
+            
+            return [dict(row) for row in cursor.fetchall()]
+    
+    def list_sessions(self, limit: int = 50, cursor: Optional[str] = None, status: Optional[str] = None,
+                      created_after: Optional[datetime] = None, created_before: Optional[datetime] = None) -> Dict:
+        """List sessions newest first, one keyset-paginated page at a time"""
+        after_created, after_id = _decode_cursor(cursor) if cursor else (None, None)
+        params = {
+            'status': status,
+            'created_after': created_after,
+            'created_before': created_before,
+            'after_created': after_created,
+            'after_id': after_id,
+            'limit': limit,
+        }
         
-        cursor.execute('''
-            SELECT id, name, created_at, completed_at, status, total_urls, completed_urls
-            FROM scraping_sessions 
-            ORDER BY created_at DESC
-        ''')
+        with self.connection() as conn:
+            db_cursor = conn.cursor(cursor_factory=RealDictCursor)
+            
+            db_cursor.execute('''
+                SELECT id, name, created_at, completed_at, status, total_urls, completed_urls
+                FROM scraping_sessions 
+                WHERE (%(status)s IS NULL OR status = %(status)s)
+                  AND (%(created_after)s IS NULL OR created_at >= %(created_after)s)
+                  AND (%(created_before)s IS NULL OR created_at < %(created_before)s)
+                  AND (%(after_created)s IS NULL OR (created_at, id) < (%(after_created)s::timestamp, %(after_id)s))
+                ORDER BY created_at DESC, id DESC
+                LIMIT %(limit)s
+            ''', params)
+            
+            sessions = [dict(row) for row in db_cursor.fetchall()]
         
-        sessions = cursor.fetchall()
-        conn.close()
-        return [dict(row) for row in sessions]
+        next_cursor = None
+        if len(sessions) == limit:
+            last = sessions[-1]
+            next_cursor = _encode_cursor(last['created_at'].isoformat(), last['id'])
+        
+        return {
+            'sessions': sessions,
+            'next_cursor': next_cursor
+        }
     
     def get_session_data(self, session_id: int) -> Dict:
         """Get session details with all scraped data"""
-        conn = self.get_connection()
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        with self.connection() as conn:
+            cursor = conn.cursor(cursor_factory=RealDictCursor)
+            
+            # Get session info
+            cursor.execute('''
+                SELECT id, name, created_at, completed_at, status, total_urls, completed_urls
+                FROM scraping_sessions 
+                WHERE id = %s
+            ''', (session_id,))
+            
+            session = cursor.fetchone()
+            if not session:
+                return None
+            
+            # Get scraped data
+            cursor.execute(f'''
+                SELECT d.id, d.url, d.title, {CONTENT_SQL} AS content, d.word_count, d.char_count,
+                       d.scraped_at, d.status, d.error_message, {ZSTD_COLUMNS}
+                FROM scraped_data d
+                {CONTENT_JOIN}
+                WHERE d.session_id = %s
+                ORDER BY d.scraped_at DESC
+            ''', (session_id,))
+            
+            data = [self._inflate(cursor, dict(row)) for row in cursor.fetchall()]
         
-        # Get session info
-        cursor.execute('''
-            SELECT id, name, created_at, completed_at, status, total_urls, completed_urls
-            FROM scraping_sessions 
-            WHERE id = %s
-        ''', (session_id,))
+        return {
+            'session': dict(session),
+            'data': data
+        }
+    
+    def search_content(self, search_term: str, session_id: Optional[int] = None,
+                       limit: int = 20, cursor: Optional[str] = None) -> Dict:
+        """Full-text search over scraped pages, best matches first.
+
+        Uses web-search syntax ("quoted phrases", OR, -exclude) and returns
+        one page of results with highlighted snippets plus a `next_cursor`
+        for the following page. A page matches when its title and url, or its
+        text (the blob's vector, shared by every row with that content), match
+        the query; it is ranked on both together.
+        """
+        after_rank, after_id = _decode_cursor(cursor) if cursor else (None, None)
+        params = {
+            'config': SEARCH_CONFIG,
+            'term': search_term,
+            'session_id': session_id,
+            'after_rank': after_rank,
+            'after_id': after_id,
+            'limit': limit,
+            'headline_options': 'MaxFragments=2, MinWords=10, MaxWords=30, StartSel=**, StopSel=**',
+        }
         
-        session = cursor.fetchone()
-        if not session:
-            conn.close()
-            return None
+        with self.connection() as conn:
+            db_cursor = conn.cursor(cursor_factory=RealDictCursor)
+            
+            # Rank every match, take one keyset page, then build snippets for that page only
+            db_cursor.execute(f'''
+                WITH query AS (
+                    -- any_term: the query's indexable terms OR-ed, so a page whose title
+                    -- holds one term and its text another is still a candidate
+                    SELECT q, CASE WHEN querytree(q) <> 'T'
+                                   THEN to_tsquery('simple', replace(querytree(q), ' & ', ' | ')) END AS any_term
+                    FROM websearch_to_tsquery(%(config)s::regconfig, %(term)s) AS q
+                ),
+                -- Candidates through both GIN indexes: rows whose title/url match, and
+                -- rows pointing at a blob whose text matches
+                matches AS (
+                    SELECT d.id FROM scraped_data d, query
+                    WHERE d.search_vector @@ query.any_term
+                    UNION
+                    SELECT d.id FROM content_blobs b
+                    JOIN scraped_data d ON d.content_hash = b.content_hash, query
+                    WHERE b.search_vector @@ query.any_term
+                ),
+                ranked AS (
+                    SELECT d.id, ts_rank(v.vector, query.q)::float8 AS rank
+                    FROM matches
+                    JOIN scraped_data d ON d.id = matches.id
+                    {CONTENT_JOIN}
+                    CROSS JOIN query
+                    CROSS JOIN LATERAL (
+                        SELECT coalesce(d.search_vector, ''::tsvector) || coalesce(b.search_vector, ''::tsvector) AS vector
+                    ) v
+                    WHERE v.vector @@ query.q
+                      AND (%(session_id)s IS NULL OR d.session_id = %(session_id)s)
+                ),
+                page AS (
+                    SELECT id, rank FROM ranked
+                    WHERE %(after_rank)s IS NULL OR (rank, id) < (%(after_rank)s, %(after_id)s)
+                    ORDER BY rank DESC, id DESC
+                    LIMIT %(limit)s
+                )
+                SELECT d.id, d.session_id, s.name AS session_name, d.url, d.title,
+                       d.word_count, d.char_count, d.scraped_at, page.rank,
+                       ts_headline(%(config)s::regconfig, left(coalesce({CONTENT_SQL}, ''), 100000), query.q,
+                                   %(headline_options)s) AS snippet, {ZSTD_COLUMNS}
+                FROM page
+                JOIN scraped_data d ON d.id = page.id
+                {CONTENT_JOIN}
+                JOIN scraping_sessions s ON s.id = d.session_id
+                CROSS JOIN query
+                ORDER BY page.rank DESC, page.id DESC
+            ''', params)
+            
+            results = [dict(row) for row in db_cursor.fetchall()]
+            
+            # Compressed pages are decompressed here and sent back for their snippets
+            compressed = [row for row in results if row['content_zstd'] is not None]
+            if compressed:
+                texts = [self._decompress(db_cursor, row['content_zstd'], row['dict_id'], 100000)
+                         for row in compressed]
+                db_cursor.execute('''
+                    SELECT ts_headline(%(config)s::regconfig, t.text,
+                                       websearch_to_tsquery(%(config)s::regconfig, %(term)s),
+                                       %(headline_options)s) AS snippet
+                    FROM unnest(%(texts)s::text[]) WITH ORDINALITY AS t(text, n)
+                    ORDER BY t.n
+                ''', dict(params, texts=texts))
+                for row, headline in zip(compressed, db_cursor.fetchall()):
+                    row['snippet'] = headline['snippet']
+            
+            for row in results:
+                del row['content_zstd'], row['dict_id']
         
-        # Get scraped data
-        cursor.execute('''
-            SELECT id, url, title, content, word_count, char_count, scraped_at, status, error_message
-            FROM scraped_data 
-            WHERE session_id = %s
-            ORDER BY scraped_at DESC
-        ''', (session_id,))
+        next_cursor = None
+        if len(results) == limit:
+            next_cursor = _encode_cursor(results[-1]['rank'], results[-1]['id'])
         
-        data = cursor.fetchall()
-        conn.close()
+        return {
+            'results': results,
+            'next_cursor': next_cursor
+        }
+    
+    def get_session_summary(self, session_id: int) -> Optional[Dict]:
+        """Get session details and item totals without loading any content"""
+        with self.connection() as conn:
+            cursor = conn.cursor(cursor_factory=RealDictCursor)
+            
+            cursor.execute('''
+                SELECT id, name, created_at, completed_at, status, total_urls, completed_urls, error_message
+                FROM scraping_sessions 
+                WHERE id = %s
+            ''', (session_id,))
+            
+            session = cursor.fetchone()
+            if not session:
+                return None
+            
+            cursor.execute('''
+                SELECT COUNT(*) AS items,
+                       COUNT(*) FILTER (WHERE status = 'success') AS successful,
+                       COUNT(*) FILTER (WHERE status <> 'success') AS failed,
+                       COALESCE(SUM(word_count), 0) AS total_words,
+                       COALESCE(SUM(char_count), 0) AS total_chars
+                FROM scraped_data 
+                WHERE session_id = %s
+            ''', (session_id,))
+            
+            stats = cursor.fetchone()
         
         return {
             'session': dict(session),
-            'data': [dict(row) for row in data]
+            'stats': dict(stats)
         }
     
+    def get_session_items(self, session_id: int, limit: int = 100, cursor: Optional[str] = None,
+                          preview_length: int = 0) -> Dict:
+        """Get one page of a session's items (metadata only, newest first).
+
+        With `preview_length` > 0 each item also carries the first that many
+        characters of its content as `preview`; full content is left to
+        get_item_content().
+        """
+        after_scraped, after_id = _decode_cursor(cursor) if cursor else (None, None)
+        preview_column = f", left({CONTENT_SQL}, %(preview_length)s) AS preview, {ZSTD_COLUMNS}" if preview_length > 0 else ""
+        preview_join = CONTENT_JOIN if preview_length > 0 else ""
+        params = {
+            'session_id': session_id,
+            'after_scraped': after_scraped,
+            'after_id': after_id,
+            'preview_length': preview_length,
+            'limit': limit,
+        }
+        
+        with self.connection() as conn:
+            db_cursor = conn.cursor(cursor_factory=RealDictCursor)
+            
+            db_cursor.execute(f'''
+                SELECT d.id, d.url, d.title, d.word_count, d.char_count, d.scraped_at,
+                       d.status, d.error_message{preview_column}
+                FROM scraped_data d
+                {preview_join}
+                WHERE d.session_id = %(session_id)s
+                  AND (%(after_scraped)s IS NULL OR (d.scraped_at, d.id) < (%(after_scraped)s::timestamp, %(after_id)s))
+                ORDER BY d.scraped_at DESC, d.id DESC
+                LIMIT %(limit)s
+            ''', params)
+            
+            items = [dict(row) for row in db_cursor.fetchall()]
+            if preview_length > 0:
+                items = [self._inflate(db_cursor, item, 'preview', preview_length) for item in items]
+        
+        next_cursor = None
+        if len(items) == limit:
+            last = items[-1]
+            next_cursor = _encode_cursor(last['scraped_at'].isoformat(), last['id'])
+        
+        return {
+            'items': items,
+            'next_cursor': next_cursor
+        }
+    
+    def iter_session_items(self, session_id: int, preview_length: int = 0, page_size: int = 1000):
+        """Yield every item of a session page by page, without full content"""
+        cursor = None
+        while True:
+            page = self.get_session_items(session_id, page_size, cursor, preview_length)
+            yield from page['items']
+            cursor = page['next_cursor']
+            if not cursor:
+                return
+    
+    def iter_session_rows(self, session_id: int, columns: List[str], chunk_size: int = 1000):
+        """Stream a session's rows as tuples of `columns` from a server-side cursor.
+
+        Rows are pulled from Postgres `chunk_size` at a time, so memory stays
+        constant however large the session is. The pooled connection is held
+        until the generator is exhausted or closed.
+        """
+        unknown = [column for column in columns if column not in EXPORTABLE_COLUMNS]
+        if unknown:
+            raise ValueError(f"Unknown columns: {', '.join(unknown)}")
+        
+        # Positions of content columns that compressed blobs must fill in Python
+        content_positions = {i: 200 if column == 'content_preview' else None
+                             for i, column in enumerate(columns) if column in ('content', 'content_preview')}
+        select = [EXPORTABLE_COLUMNS[column] for column in columns]
+        if content_positions:
+            select.append(ZSTD_COLUMNS)
+        
+        with self.connection() as conn:
+            dict_cursor = conn.cursor()
+            # Named cursors live server-side; only chunk_size rows cross the wire per fetch
+            with conn.cursor(name=f"export_{session_id}_{uuid.uuid4().hex}") as cursor:
+                cursor.itersize = chunk_size
+                cursor.execute(f'''
+                    SELECT {', '.join(select)}
+                    FROM scraped_data d
+                    {CONTENT_JOIN}
+                    WHERE d.session_id = %s
+                    ORDER BY d.scraped_at DESC, d.id DESC
+                ''', (session_id,))
+                
+                while True:
+                    rows = cursor.fetchmany(chunk_size)
+                    if not rows:
+                        return
+                    if not content_positions:
+                        yield from rows
+                        continue
+                    for row in rows:
+                        row, data, dict_id = list(row[:-2]), row[-2], row[-1]
+                        if data is not None:
+                            for i, max_chars in content_positions.items():
+                                row[i] = self._decompress(dict_cursor, data, dict_id, max_chars)
+                        yield tuple(row)
+    
+    def get_item_content(self, session_id: int, item_id: int, offset: int = 0,
+                         length: Optional[int] = None) -> Optional[Dict]:
+        """Get the content of one item, optionally just a character range of it"""
+        with self.connection() as conn:
+            cursor = conn.cursor(cursor_factory=RealDictCursor)
+            
+            cursor.execute(f'''
+                SELECT d.id, d.url, coalesce(char_length({CONTENT_SQL}), b.char_count, 0) AS total_chars,
+                       CASE WHEN %(length)s IS NULL THEN substr({CONTENT_SQL}, %(start)s)
+                            ELSE substr({CONTENT_SQL}, %(start)s, %(length)s)
+                       END AS content, {ZSTD_COLUMNS}
+                FROM scraped_data d
+                {CONTENT_JOIN}
+                WHERE d.id = %(item_id)s AND d.session_id = %(session_id)s
+            ''', {'item_id': item_id, 'session_id': session_id, 'start': offset + 1, 'length': length})
+            
+            row = cursor.fetchone()
+            if not row:
+                return None
+            
+            item = dict(row)
+            data, dict_id = item.pop('content_zstd'), item.pop('dict_id')
+            if data is not None:
+                # Only the requested range (and what precedes it) is decompressed
+                text = self._decompress(cursor, data, dict_id, None if length is None else offset + length)
+                item['content'] = text[offset:]
+        
+        item['content'] = item['content'] or ''
+        item['offset'] = offset
+        item['length'] = len(item['content'])
+        return item
+    
     def delete_session(self, session_id: int):
         """Delete a session and all its data"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                SELECT DISTINCT content_hash FROM scraped_data 
+                WHERE session_id = %s AND content_hash IS NOT NULL
+            ''', (session_id,))
+            hashes = [row[0] for row in cursor.fetchall()]
+            
+            cursor.execute('DELETE FROM scraping_sessions WHERE id = %s', (session_id,))
+        
+        if hashes:
+            self._collect_blobs(hashes)
+    
+    def _collect_blobs(self, hashes: List[str]):
+        """Delete the given blobs unless some scraped row still references them"""
+        try:
+            with self.connection() as conn:
+                cursor = conn.cursor()
+                
+                cursor.execute('''
+                    DELETE FROM content_blobs b
+                    WHERE b.content_hash = ANY(%s)
+                      AND NOT EXISTS (SELECT 1 FROM scraped_data d WHERE d.content_hash = b.content_hash)
+                ''', (hashes,))
+        except psycopg2.errors.ForeignKeyViolation:
+            # A writer re-used one of these blobs meanwhile; it is live again
+            pass
+
+    def create_job(self, session_name: str, urls: List[str], options: Dict = None,
+                   aliases: Dict[str, str] = None) -> int:
+        """Queue a batch job: a 'queued' session plus its URLs (and their url_aliases). Returns the session id"""
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                INSERT INTO scraping_sessions (name, total_urls, status, options)
+                VALUES (%s, %s, 'queued', %s)
+                RETURNING id
+            ''', (session_name, len(urls), Json(options or {})))
+            session_id = cursor.fetchone()[0]
+            
+            if urls:
+                execute_values(cursor, '''
+                    INSERT INTO job_urls (session_id, position, url) VALUES %s
+                ''', [(session_id, position, url) for position, url in enumerate(urls)], page_size=1000)
+            
+            if aliases:
+                self._insert_url_aliases(cursor, session_id, aliases)
+        
+        return session_id
+    
+    def add_job_urls(self, session_id: int, urls: List[str]) -> int:
+        """Append URLs to a job (URLs discovered while it runs). Returns the job's new total"""
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
+            # Lock the session row so concurrent appends get distinct positions
+            cursor.execute('''
+                SELECT total_urls FROM scraping_sessions WHERE id = %s FOR UPDATE
+            ''', (session_id,))
+            start = cursor.fetchone()[0]
+            
+            execute_values(cursor, '''
+                INSERT INTO job_urls (session_id, position, url) VALUES %s
+            ''', [(session_id, start + offset, url) for offset, url in enumerate(urls)], page_size=1000)
+            cursor.execute('''
+                UPDATE scraping_sessions SET total_urls = %s WHERE id = %s
+            ''', (start + len(urls), session_id))
+            
+            return start + len(urls)
+    
+    def create_crawl(self, session_name: str, seeds: List[str], options: Dict, max_pages: int) -> int:
+        """Queue a crawl job: a 'queued' session plus its seed URLs at depth 0. Returns the session id"""
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                INSERT INTO scraping_sessions (name, total_urls, status, options)
+                VALUES (%s, 0, 'queued', %s)
+                RETURNING id
+            ''', (session_name, Json(options)))
+            session_id = cursor.fetchone()[0]
+            
+            self._admit_frontier(cursor, session_id, [(url, 0) for url in seeds], max_pages)
+        
+        return session_id
+    
+    def _admit_frontier(self, cursor, session_id: int, links: List[tuple], room: int) -> int:
+        """Queue (url, depth) pairs the crawl has not seen yet, at most `room` of them.
+
+        Runs in the caller's transaction with the session row locked (one
+        writer per crawl). Returns how many were admitted; total_urls counts them.
+        """
+        depths = {}
+        for url, depth in links:
+            depths.setdefault(url, depth)
+        if not depths or room <= 0:
+            return 0
+        
+        cursor.execute('''
+            SELECT url FROM crawl_frontier WHERE session_id = %s AND url = ANY(%s)
+        ''', (session_id, list(depths)))
+        for (url,) in cursor.fetchall():
+            del depths[url]
+        new = list(depths.items())[:room]
+        if not new:
+            return 0
         
-        cursor.execute('DELETE FROM scraping_sessions WHERE id = %s', (session_id,))
+        by_host = defaultdict(list)
+        for url, depth in new:
+            by_host[urlparse(url).netloc.lower()].append((url, depth))
         
-        conn.commit()
-        conn.close()
+        # Reserve a run of sequence numbers per host
+        cursor.execute('''
+            INSERT INTO crawl_hosts (session_id, host, admitted)
+            SELECT %s, host, admitted FROM unnest(%s::text[], %s::int[]) AS h(host, admitted)
+            ON CONFLICT (session_id, host) DO UPDATE SET admitted = crawl_hosts.admitted + EXCLUDED.admitted
+            RETURNING host, admitted
+        ''', (session_id, list(by_host), [len(urls) for urls in by_host.values()]))
+        
+        values = []
+        for host, admitted in cursor.fetchall():
+            first = admitted - len(by_host[host])
+            values.extend((session_id, url, host, depth, first + n) for n, (url, depth) in enumerate(by_host[host]))
+        
+        execute_values(cursor, '''
+            INSERT INTO crawl_frontier (session_id, url, host, depth, host_seq) VALUES %s
+        ''', values, page_size=1000)
+        cursor.execute('''
+            UPDATE scraping_sessions SET total_urls = total_urls + %s WHERE id = %s
+        ''', (len(values), session_id))
+        
+        return len(values)
+    
+    def claim_frontier(self, session_id: int, limit: int) -> List[tuple]:
+        """Take the next (url, depth) pairs of a crawl: shallowest first, one per host in turn"""
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                UPDATE crawl_frontier f SET state = 'claimed'
+                FROM (
+                    SELECT url FROM crawl_frontier 
+                    WHERE session_id = %s AND state = 'queued'
+                    ORDER BY depth, host_seq
+                    LIMIT %s
+                    FOR UPDATE SKIP LOCKED
+                ) next
+                WHERE f.session_id = %s AND f.url = next.url
+                RETURNING f.url, f.depth
+            ''', (session_id, limit, session_id))
+            
+            return cursor.fetchall()
+    
+    def requeue_frontier(self, session_id: int) -> int:
+        """Put back URLs a crawl had claimed but not finished (its worker stopped)"""
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                UPDATE crawl_frontier SET state = 'queued' WHERE session_id = %s AND state = 'claimed'
+            ''', (session_id,))
+            
+            return cursor.rowcount
+    
+    def save_crawl_results(self, session_id: int, worker_id: str, rows: List[tuple],
+                           pages: List[tuple], max_pages: int) -> Optional[tuple]:
+        """save_job_results() for a crawl: store results, mark their pages visited and admit
+        the links they found, in one transaction.
+
+        `pages` holds (url, [(link, depth), ...]) per result. Returns (status,
+        total_urls), or None if the job is no longer this worker's.
+        """
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                SELECT status, claimed_by, total_urls FROM scraping_sessions WHERE id = %s FOR UPDATE
+            ''', (session_id,))
+            job = cursor.fetchone()
+            if job is None or job[1] != worker_id:
+                return None
+            status, total = job[0], job[2]
+            
+            if rows:
+                self._insert_scraped_rows(cursor, session_id, rows)
+                cursor.execute('''
+                    UPDATE crawl_frontier SET state = 'done' WHERE session_id = %s AND url = ANY(%s)
+                ''', (session_id, [url for url, _ in pages]))
+                if status == 'in_progress':
+                    links = [link for _, found in pages for link in found]
+                    total += self._admit_frontier(cursor, session_id, links, max_pages - total)
+            
+            cursor.execute('''
+                UPDATE scraping_sessions SET heartbeat_at = CURRENT_TIMESTAMP WHERE id = %s
+            ''', (session_id,))
+            
+            return status, total
+    
+    def get_frontier_stats(self, session_id: int) -> Dict:
+        """Frontier size of a crawl by state and depth, and the number of hosts seen"""
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                SELECT depth, state, COUNT(*) FROM crawl_frontier WHERE session_id = %s GROUP BY depth, state
+            ''', (session_id,))
+            states, depths = defaultdict(int), defaultdict(int)
+            for depth, state, count in cursor.fetchall():
+                states[state] += count
+                depths[depth] += count
+            
+            cursor.execute('SELECT COUNT(*) FROM crawl_hosts WHERE session_id = %s', (session_id,))
+            
+            return {
+                'queued': states['queued'],
+                'claimed': states['claimed'],
+                'done': states['done'],
+                'by_depth': dict(sorted(depths.items())),
+                'hosts': cursor.fetchone()[0],
+            }
+    
+    def update_job_options(self, session_id: int, options: Dict):
+        """Merge `options` into a job's stored options"""
+        with self.connection() as conn:
+            conn.cursor().execute('''
+                UPDATE scraping_sessions SET options = COALESCE(options, '{}'::jsonb) || %s WHERE id = %s
+            ''', (Json(options), session_id))
+    
+    def _insert_url_aliases(self, cursor, session_id: int, aliases: Dict[str, str]):
+        execute_values(cursor, '''
+            INSERT INTO url_aliases (session_id, original_url, canonical_url) VALUES %s
+            ON CONFLICT (session_id, original_url) DO NOTHING
+        ''', [(session_id, original, canonical) for original, canonical in aliases.items()], page_size=1000)
+    
+    def save_url_aliases(self, session_id: int, aliases: Dict[str, str]):
+        """Record which submitted URLs a session scraped under their canonical form"""
+        if not aliases:
+            return
+        with self.connection() as conn:
+            self._insert_url_aliases(conn.cursor(), session_id, aliases)
+    
+    def get_url_aliases(self, session_id: int, canonical_url: str = None) -> Dict[str, str]:
+        """Original -> canonical URL mapping of a session (optionally for one canonical URL)"""
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
+            if canonical_url is None:
+                cursor.execute('''
+                    SELECT original_url, canonical_url FROM url_aliases WHERE session_id = %s
+                ''', (session_id,))
+            else:
+                cursor.execute('''
+                    SELECT original_url, canonical_url FROM url_aliases
+                    WHERE session_id = %s AND canonical_url = %s
+                ''', (session_id, canonical_url))
+            
+            return dict(cursor.fetchall())
+    
+    def claim_job(self, worker_id: str, lease_seconds: float) -> Optional[Dict]:
+        """Take the oldest queued job, or one whose worker stopped heartbeating.
+
+        Returns {'id', 'options', 'total_urls', 'completed_urls'} or None. Safe to call from many workers and
+        processes at once: each job goes to exactly one of them.
+        """
+        with self.connection() as conn:
+            cursor = conn.cursor(cursor_factory=RealDictCursor)
+            
+            cursor.execute('''
+                UPDATE scraping_sessions 
+                SET status = 'in_progress', claimed_by = %s, heartbeat_at = CURRENT_TIMESTAMP
+                WHERE id = (
+                    SELECT id FROM scraping_sessions 
+                    WHERE status = 'queued' 
+                       OR (status = 'in_progress' AND claimed_by IS NOT NULL
+                           AND heartbeat_at < CURRENT_TIMESTAMP - make_interval(secs => %s))
+                    ORDER BY created_at, id
+                    LIMIT 1
+                    FOR UPDATE SKIP LOCKED
+                )
+                RETURNING id, options, total_urls, completed_urls
+            ''', (worker_id, lease_seconds))
+            
+            job = cursor.fetchone()
+        
+        return dict(job) if job else None
+    
+    def get_job_urls(self, session_id: int, after_position: int = -1, limit: int = 500) -> List[tuple]:
+        """Next unfinished (position, url) pairs of a job, in submission order"""
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                SELECT position, url FROM job_urls 
+                WHERE session_id = %s AND position > %s
+                ORDER BY position
+                LIMIT %s
+            ''', (session_id, after_position, limit))
+            
+            return cursor.fetchall()
+    
+    def save_job_results(self, session_id: int, worker_id: str, rows: List[tuple],
+                         positions: List[int]) -> Optional[str]:
+        """Store a job's results and mark their URLs done in one transaction.
+
+        Also renews the worker's heartbeat. Returns the job's current status,
+        so the worker notices cancellation, or None (and writes nothing) once
+        the job was deleted or taken over by another worker.
+        """
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                SELECT status, claimed_by FROM scraping_sessions WHERE id = %s FOR UPDATE
+            ''', (session_id,))
+            job = cursor.fetchone()
+            if job is None or job[1] != worker_id:
+                return None
+            
+            if rows:
+                self._insert_scraped_rows(cursor, session_id, rows)
+                cursor.execute('''
+                    DELETE FROM job_urls WHERE session_id = %s AND position = ANY(%s)
+                ''', (session_id, positions))
+            
+            cursor.execute('''
+                UPDATE scraping_sessions SET heartbeat_at = CURRENT_TIMESTAMP WHERE id = %s
+            ''', (session_id,))
+            
+            return job[0]
+    
+    def finish_job(self, session_id: int, worker_id: str, status: str = 'completed',
+                   error_message: Optional[str] = None) -> Optional[str]:
+        """Close a job its worker is done with and drop its leftover URLs.
+
+        Returns the job's final status, or None if it was no longer this worker's.
+        """
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                UPDATE scraping_sessions 
+                SET status = CASE WHEN status = 'in_progress' THEN %s ELSE status END,
+                    completed_at = COALESCE(completed_at, CURRENT_TIMESTAMP),
+                    error_message = COALESCE(%s, error_message),
+                    claimed_by = NULL
+                WHERE id = %s AND claimed_by = %s
+                RETURNING status
+            ''', (status, error_message, session_id, worker_id))
+            
+            row = cursor.fetchone()
+            if row:
+                self._drop_job_queue(cursor, session_id)
+            return row[0] if row else None
+    
+    def _drop_job_queue(self, cursor, session_id: int):
+        """Delete the URLs a finished job still had queued (batch URLs or crawl frontier)"""
+        cursor.execute('DELETE FROM job_urls WHERE session_id = %s', (session_id,))
+        cursor.execute('DELETE FROM crawl_frontier WHERE session_id = %s', (session_id,))
+        cursor.execute('DELETE FROM crawl_hosts WHERE session_id = %s', (session_id,))
+    
+    def release_job(self, session_id: int, worker_id: str):
+        """Hand an unfinished job back to the queue (worker shutting down)"""
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                UPDATE scraping_sessions 
+                SET status = CASE WHEN status = 'in_progress' THEN 'queued' ELSE status END,
+                    claimed_by = NULL
+                WHERE id = %s AND claimed_by = %s
+            ''', (session_id, worker_id))
+    
+    def cancel_job(self, session_id: int) -> Optional[str]:
+        """Cancel a queued or running job; returns its resulting status (None if unknown).
+
+        A running worker notices at its next save_job_results() and stops;
+        the results saved so far are kept.
+        """
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                UPDATE scraping_sessions 
+                SET status = 'cancelled', completed_at = CURRENT_TIMESTAMP
+                WHERE id = %s AND status IN ('queued', 'in_progress')
+                RETURNING status
+            ''', (session_id,))
+            
+            if cursor.fetchone():
+                self._drop_job_queue(cursor, session_id)
+                return 'cancelled'
+            
+            cursor.execute('SELECT status FROM scraping_sessions WHERE id = %s', (session_id,))
+            row = cursor.fetchone()
+            return row[0] if row else None
+
+class ScrapedDataWriter:
+    """Buffers scraped results and flushes them to the database in bulk.
+
+    Rows are written once `batch_size` results are pending or, when
+    `flush_interval` is set, once that many seconds passed since the last
+    flush. Sync callers get this automatically from add(); async callers can
+    pass auto_flush=False, check `is_due` and run flush() in a worker thread.
+    Used as a context manager, any remaining rows are flushed on exit.
+    """
+    
+    def __init__(self, db: ScrapingDatabase, session_id: int, batch_size: int = 500,
+                 flush_interval: float = None, auto_flush: bool = True):
+        self.db = db
+        self.session_id = session_id
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.auto_flush = auto_flush
+        self.written = 0
+        self._rows = []
+        self._last_flush = time.monotonic()
+    
+    @property
+    def pending(self) -> int:
+        return len(self._rows)
+    
+    @property
+    def is_due(self) -> bool:
+        """Whether enough rows (or time) accumulated to warrant a flush"""
+        if len(self._rows) >= self.batch_size:
+            return True
+        if self.flush_interval is not None and self._rows:
+            return time.monotonic() - self._last_flush >= self.flush_interval
+        return False
+    
+    def add(self, url: str, content: str, title: str = "", status: str = "success", error_message: str = ""):
+        """Buffer one scraped result"""
+        self._rows.append((url, title, content, status, error_message))
+        if self.auto_flush and self.is_due:
+            self.flush()
+    
+    def flush(self) -> int:
+        """Write all buffered rows in one transaction; on failure they stay buffered"""
+        # Swapped out first so add() can keep buffering while an async caller's flush runs
+        rows, self._rows = self._rows, []
+        self._last_flush = time.monotonic()
+        try:
+            written = self.db.save_scraped_data_many(self.session_id, rows)
+        except Exception:
+            self._rows = rows + self._rows
+            raise
+        self.written += written
+        return written
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        # Keep partial results even when the caller failed midway
+        self.flush()
+
+# Shared instance so every module reuses one connection pool
+_database_instance = None
+_database_lock = threading.Lock()
+
+def get_database() -> ScrapingDatabase:
+    """Get or create the shared database instance"""
+    global _database_instance
+    with _database_lock:
+        if _database_instance is None:
+            _database_instance = ScrapingDatabase()
+    return _database_instance
@@ -0,0 +1,132 @@
+"""
+Streaming export helpers
+Turn row iterators from the database into export files chunk by chunk, so
+exports of any size run in constant memory.
+"""
+
+import csv
+import io
+import re
+import tempfile
+import zlib
+
+from openpyxl import Workbook
+
+# Export column -> header label, in default export order
+COLUMN_LABELS = {
+    'url': 'URL',
+    'title': 'Title',
+    'content': 'Content',
+    'content_preview': 'Content Preview',
+    'word_count': 'Word Count',
+    'char_count': 'Char Count',
+    'scraped_at': 'Scraped At',
+    'status': 'Status',
+    'error_message': 'Error Message',
+}
+
+DEFAULT_CSV_COLUMNS = ['url', 'title', 'word_count', 'char_count', 'scraped_at', 'status']
+DEFAULT_EXCEL_COLUMNS = ['url', 'title', 'content_preview', 'word_count', 'char_count', 'scraped_at', 'status']
+
+# Flush the CSV buffer once it holds roughly this many characters
+CSV_CHUNK_CHARS = 64 * 1024
+
+# Excel limits: rows per sheet (header included) and characters per cell
+EXCEL_MAX_ROWS = 1048576
+EXCEL_MAX_CELL_CHARS = 32767
+# Control characters openpyxl refuses to write into a cell
+_ILLEGAL_XLSX_CHARS = re.compile(r'[\x00-\x08\x0b-\x0c\x0e-\x1f]')
+
+# Workbooks stay in memory up to this size, then spill to a temp file
+SPOOL_MAX_BYTES = 8 * 1024 * 1024
+
+
+def parse_columns(columns: str, default: list) -> list:
+    """Parse a comma-separated column selection, rejecting unknown names"""
+    if not columns:
+        return list(default)
+    selected = [column.strip() for column in columns.split(',') if column.strip()]
+    unknown = [column for column in selected if column not in COLUMN_LABELS]
+    if unknown:
+        raise ValueError(f"Unknown columns: {', '.join(unknown)}")
+    return selected
+
+
+def iter_csv(rows, columns: list, gzip: bool = False):
+    """Yield a CSV file (header + rows) as encoded byte chunks, optionally gzipped"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    compressor = zlib.compressobj(wbits=31) if gzip else None  # wbits=31 -> gzip container
+
+    def drain() -> bytes:
+        data = buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+        return compressor.compress(data) if compressor else data
+
+    writer.writerow([COLUMN_LABELS[column] for column in columns])
+    for row in rows:
+        writer.writerow(['' if value is None else value for value in row])
+        if buffer.tell() >= CSV_CHUNK_CHARS:
+            chunk = drain()
+            if chunk:
+                yield chunk
+
+    chunk = drain()
+    if compressor:
+        chunk += compressor.flush()
+    if chunk:
+        yield chunk
+
+
+def _excel_value(value):
+    """Make a value safe for an Excel cell"""
+    if value is None:
+        return ''
+    if isinstance(value, str):
+        return _ILLEGAL_XLSX_CHARS.sub('', value)[:EXCEL_MAX_CELL_CHARS]
+    return value
+
+
+def write_xlsx(rows, headers: list, sheet_title: str = 'Scraped Data', max_rows: int = EXCEL_MAX_ROWS):
+    """Write rows into a write-only workbook and return it as a spooled temp file.
+
+    Rows are appended one at a time and never held as a whole; once a sheet
+    reaches Excel's row limit the remaining rows continue on a new sheet
+    (`Scraped Data (2)`, ...), each with its own header row.
+    """
+    workbook = Workbook(write_only=True)
+    sheet = None
+    sheet_count = 0
+    sheet_rows = max_rows
+
+    for row in rows:
+        if sheet_rows >= max_rows:
+            sheet_count += 1
+            title = sheet_title if sheet_count == 1 else f"{sheet_title[:24]} ({sheet_count})"
+            sheet = workbook.create_sheet(title=title)
+            sheet.append(headers)
+            sheet_rows = 1
+        sheet.append([_excel_value(value) for value in row])
+        sheet_rows += 1
+
+    if sheet is None:
+        # Empty export still gets a sheet with headers
+        workbook.create_sheet(title=sheet_title).append(headers)
+
+    output = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES)
+    workbook.save(output)
+    output.seek(0)
+    return output
+
+
+def iter_file(fileobj, chunk_size: int = 64 * 1024):
+    """Yield a file's bytes in chunks and close it afterwards"""
+    try:
+        while True:
+            chunk = fileobj.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+    finally:
+        fileobj.close()
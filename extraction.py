@@ -0,0 +1,247 @@
+"""
+Format-aware content extraction
+Downloads a document once, sniffs its type from the response headers plus
+the first bytes of the body, and hands the same bytes to the matching
+extractor (HTML, PDF, JSON or XML).
+"""
+
+import io
+import json
+
+import httpx
+import lxml.html
+from bs4 import BeautifulSoup
+from lxml import etree
+
+from functools import partial
+
+from extraction_cache import get_extraction_cache
+from extraction_pool import get_extraction_pool
+from politeness import get_politeness
+from web_scraper import extract_text_uncached
+
+try:
+    import magic
+except ImportError:  # libmagic is optional, byte signatures cover the common cases
+    magic = None
+
+SNIFF_BYTES = 2048
+
+EXTRACTABLE_TYPES = ('html', 'pdf', 'json', 'xml')
+
+# How many links/images extract_html_content keeps (part of its cache key)
+MAX_LINKS = 20
+MAX_IMAGES = 10
+
+
+def fetch_document(url: str, timeout: float = 30) -> dict:
+    """Download a URL once and keep everything the extractors need"""
+    response = get_politeness().request_sync(
+        url, lambda: httpx.get(url, timeout=timeout, follow_redirects=True))
+    return {
+        'url': str(response.url),
+        'status_code': response.status_code,
+        'content_type': response.headers.get('content-type', ''),
+        'body': response.content,
+    }
+
+
+def content_type_from_header(content_type: str) -> str:
+    """Map a Content-Type header to one of our extractor types"""
+    content_type = (content_type or '').lower()
+
+    if 'text/html' in content_type or 'application/xhtml' in content_type:
+        return 'html'
+    elif 'application/pdf' in content_type:
+        return 'pdf'
+    elif 'json' in content_type:
+        return 'json'
+    elif 'xml' in content_type:
+        return 'xml'
+    else:
+        return 'unknown'
+
+
+def _sniff_body(head: bytes) -> str:
+    """Guess the type from the leading bytes of a body"""
+    if magic is not None:
+        try:
+            detected = content_type_from_header(magic.from_buffer(head, mime=True))
+            if detected != 'unknown':
+                return detected
+        except Exception:
+            pass
+
+    stripped = head.lstrip(b'\xef\xbb\xbf \t\r\n').lower()
+    if stripped.startswith(b'%pdf'):
+        return 'pdf'
+    elif stripped.startswith((b'<!doctype html', b'<html')) or b'<html' in stripped[:512]:
+        return 'html'
+    elif stripped.startswith(b'<?xml') or stripped.startswith(b'<'):
+        return 'xml'
+    elif stripped.startswith((b'{', b'[')):
+        return 'json'
+    return 'unknown'
+
+
+def sniff_content_type(body: bytes, content_type: str = '') -> str:
+    """Detect the document type from headers first, then from the body itself"""
+    detected = content_type_from_header(content_type)
+    if detected != 'unknown' or not body:
+        return detected
+    return _sniff_body(body[:SNIFF_BYTES])
+
+
+def extract_content(body: bytes, content_type: str, url: str = '') -> dict:
+    """Dispatch an already downloaded body to the matching extractor.
+
+    Results are memoized by body hash and extractor configuration, so an
+    unchanged document is not parsed again; cache misses are extracted in
+    the process pool.
+    """
+    cache = get_extraction_cache()
+    run = get_extraction_pool().run
+    if content_type == 'pdf':
+        return cache.memoize('pdf', body, partial(run, extract_pdf_content))
+    elif content_type == 'json':
+        return cache.memoize('json', body, partial(run, extract_json_content))
+    elif content_type == 'xml':
+        return cache.memoize('xml', body, partial(run, extract_xml_content))
+    else:
+        # Default HTML extraction with enhanced processing
+        return cache.memoize('html', body, partial(run, extract_html_content),
+                             config={'max_links': MAX_LINKS, 'max_images': MAX_IMAGES})
+
+
+def extract_pdf_content(body: bytes) -> dict:
+    """Extract content from PDF files"""
+    import pdfplumber
+
+    result = {'content': '', 'title': '', 'metadata': {}, 'content_type': 'pdf'}
+
+    try:
+        with pdfplumber.open(io.BytesIO(body)) as pdf:
+            text_content = []
+            result['metadata']['pages'] = len(pdf.pages)
+
+            for page in pdf.pages:
+                text = page.extract_text()
+                if text:
+                    text_content.append(text)
+
+            result['content'] = '\n\n'.join(text_content)
+            result['title'] = f"PDF Document - {len(pdf.pages)} pages"
+
+            # Extract metadata
+            if pdf.metadata:
+                result['metadata'].update(pdf.metadata)
+
+    except Exception as e:
+        result['error'] = str(e)
+
+    return result
+
+
+def extract_json_content(body: bytes) -> dict:
+    """Extract and format JSON content"""
+    result = {'content': '', 'title': '', 'metadata': {}, 'content_type': 'json'}
+
+    try:
+        json_data = json.loads(body)
+
+        result['content'] = json.dumps(json_data, indent=2, ensure_ascii=False)
+        result['title'] = "JSON Data"
+        result['metadata'] = {
+            'keys': list(json_data.keys()) if isinstance(json_data, dict) else [],
+            'type': type(json_data).__name__,
+            'size': len(str(json_data))
+        }
+
+    except Exception as e:
+        result['error'] = str(e)
+
+    return result
+
+
+def extract_xml_content(body: bytes) -> dict:
+    """Extract content from XML files"""
+    result = {'content': '', 'title': '', 'metadata': {}, 'content_type': 'xml'}
+
+    try:
+        # Parse XML with proper XML parser
+        try:
+            root = etree.fromstring(body)
+            result['content'] = etree.tostring(root, pretty_print=True, encoding='unicode')
+        except etree.XMLSyntaxError:
+            # Fallback to HTML parser if XML parsing fails
+            root = lxml.html.fromstring(body)
+            result['content'] = lxml.html.tostring(root, pretty_print=True, encoding='unicode')
+        result['title'] = "XML Document"
+
+        # Extract metadata
+        result['metadata'] = {
+            'root_tag': root.tag if hasattr(root, 'tag') else 'unknown',
+            'elements': len(root.xpath('.//*')),
+            'text_nodes': len(root.xpath('.//text()[normalize-space()]'))
+        }
+
+    except Exception as e:
+        result['error'] = str(e)
+
+    return result
+
+
+def extract_html_content(body: bytes, url: str = '') -> dict:
+    """Enhanced HTML content extraction"""
+    result = {'content': '', 'title': '', 'metadata': {}, 'content_type': 'html'}
+
+    try:
+        # Main text via trafilatura, on the same bytes BeautifulSoup parses below
+        content = extract_text_uncached(body)
+        result['content'] = content or ""
+
+        soup = BeautifulSoup(body, 'html.parser')
+
+        # Plain str: a bs4 NavigableString would drag the whole tree along when pickled back from a worker
+        result['title'] = str(soup.title.string) if soup.title and soup.title.string else 'Untitled'
+
+        # Extract links
+        links = []
+        for a in soup.find_all('a', href=True):
+            href = a.get('href')
+            if href and isinstance(href, str) and href.startswith('http'):
+                links.append(href)
+        result['links'] = links[:MAX_LINKS]
+
+        # Extract images
+        images = []
+        for img in soup.find_all('img', src=True):
+            src = img.get('src')
+            if src and isinstance(src, str) and src.startswith('http'):
+                images.append(src)
+        result['images'] = images[:MAX_IMAGES]
+
+        # Calculate readability (simple word/sentence ratio)
+        if content:
+            sentences = len([s for s in content.split('.') if s.strip()])
+            words = len(content.split())
+            result['readability_score'] = round((words / max(sentences, 1)), 2)
+
+        # Metadata
+        result['metadata'] = {
+            'description': soup.find('meta', attrs={'name': 'description'}),
+            'keywords': soup.find('meta', attrs={'name': 'keywords'}),
+            'author': soup.find('meta', attrs={'name': 'author'}),
+            'links_found': len(result['links']),
+            'images_found': len(result['images'])
+        }
+
+        # Clean up metadata
+        for key in result['metadata']:
+            if result['metadata'][key] and hasattr(result['metadata'][key], 'get'):
+                result['metadata'][key] = result['metadata'][key].get('content', '')
+
+    except Exception as e:
+        result['error'] = str(e)
+
+    return result
@@ -0,0 +1,132 @@
+"""
+Extraction result memoization
+Caches extractor output keyed by a hash of the raw body plus the extractor
+name and configuration, so byte-identical pages (re-crawls, mirrors, the
+same page under several URLs) skip trafilatura/BeautifulSoup entirely.
+A bounded in-process LRU sits in front of a persistent SQLite tier.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import trafilatura
+
+# Bump when extractor output changes in a way the library versions do not capture
+EXTRACTION_CACHE_VERSION = 1
+
+
+def _config_fingerprint(extractor: str, config: dict) -> str:
+    """Short stable hash of everything besides the body that shapes the output"""
+    description = {
+        'extractor': extractor,
+        'config': config or {},
+        'version': EXTRACTION_CACHE_VERSION,
+        'trafilatura': trafilatura.__version__,
+    }
+    return hashlib.sha256(json.dumps(description, sort_keys=True).encode()).hexdigest()[:16]
+
+
+class ExtractionCache:
+    """Two-tier (memory LRU + SQLite) cache of extraction results"""
+
+    def __init__(self, path: str = None, memory_entries: int = None, max_entries: int = None):
+        self.path = path or os.environ.get('EXTRACTION_CACHE_PATH', '.extraction_cache.sqlite')
+        self.memory_entries = memory_entries or int(os.environ.get('EXTRACTION_CACHE_SIZE', 512))
+        self.max_entries = max_entries or int(os.environ.get('EXTRACTION_CACHE_MAX_ENTRIES', 200000))
+
+        # key -> serialized result; values are stored as JSON so every hit is a fresh copy
+        self._memory = OrderedDict()
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS extractions (
+                    key TEXT PRIMARY KEY,
+                    result TEXT NOT NULL,
+                    last_used REAL NOT NULL
+                )
+            ''')
+            self._conn.execute('CREATE INDEX IF NOT EXISTS idx_extractions_last_used ON extractions(last_used)')
+
+    @staticmethod
+    def key(extractor: str, body, config: dict = None) -> str:
+        """Cache key for running `extractor` with `config` over `body`"""
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        return f"{hashlib.sha256(body).hexdigest()}:{_config_fingerprint(extractor, config)}"
+
+    def _remember(self, key: str, serialized: str):
+        self._memory[key] = serialized
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key: str):
+        """Cached result for `key`, or None"""
+        with self._lock:
+            serialized = self._memory.get(key)
+            if serialized is not None:
+                self._memory.move_to_end(key)
+            else:
+                with self._conn:
+                    row = self._conn.execute('SELECT result FROM extractions WHERE key = ?', (key,)).fetchone()
+                    if row is None:
+                        return None
+                    serialized = row[0]
+                    self._conn.execute('UPDATE extractions SET last_used = ? WHERE key = ?', (time.time(), key))
+                self._remember(key, serialized)
+        return json.loads(serialized)
+
+    def put(self, key: str, result):
+        """Store a result in both tiers"""
+        serialized = json.dumps(result, default=str)
+        with self._lock:
+            self._remember(key, serialized)
+            with self._conn:
+                self._conn.execute('INSERT OR REPLACE INTO extractions (key, result, last_used) VALUES (?, ?, ?)',
+                                   (key, serialized, time.time()))
+            self._writes += 1
+            if self._writes % 1000 == 0:
+                self._prune()
+
+    def _prune(self):
+        """Keep the persistent tier at max_entries, dropping least recently used rows"""
+        with self._conn:
+            self._conn.execute('''
+                DELETE FROM extractions WHERE key IN (
+                    SELECT key FROM extractions ORDER BY last_used DESC LIMIT -1 OFFSET ?
+                )
+            ''', (self.max_entries,))
+
+    def memoize(self, extractor: str, body, compute, config: dict = None):
+        """Return compute(body), reusing a cached result for an identical body and config.
+
+        Results carrying an `error` are not cached, so transient failures are retried.
+        """
+        key = self.key(extractor, body, config)
+        result = self.get(key)
+        if result is None:
+            result = compute(body)
+            if not (isinstance(result, dict) and result.get('error')):
+                self.put(key, result)
+        return result
+
+
+_cache_instance = None
+_cache_lock = threading.Lock()
+
+
+def get_extraction_cache() -> ExtractionCache:
+    """Get or create the shared extraction cache"""
+    global _cache_instance
+    with _cache_lock:
+        if _cache_instance is None:
+            _cache_instance = ExtractionCache()
+    return _cache_instance
@@ -0,0 +1,193 @@
+"""
+Process-pool extraction service
+Runs CPU-bound extractors (trafilatura, BeautifulSoup, pdfplumber, lxml) in
+worker processes so they scale with cores instead of queueing on the GIL.
+Workers are recycled after a number of tasks to bound memory, a task that
+runs past its timeout has its worker killed and replaced, and callers block
+once every worker is busy.
+
+Workers are started with spawn/forkserver, which imports the entry script in
+each worker; keep entry scripts import-safe (`if __name__ == "__main__"`).
+"""
+
+import asyncio
+import multiprocessing
+import os
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+
+
+class ExtractionTimeout(TimeoutError):
+    """An extractor ran longer than the pool's task timeout and was killed"""
+
+
+def _mp_context():
+    """Start workers from a warm fork server where available, never by forking the app itself"""
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context('forkserver')
+        # Preload the extractors only; the app's __main__ must not be re-imported in workers
+        context.set_forkserver_preload(['extraction'])
+        return context
+    return multiprocessing.get_context('spawn')
+
+
+class ExtractionPool:
+    """Bounded process pool that fetchers hand raw bytes to for extraction.
+
+    Each worker is its own single-process lane, so a task that hangs past
+    the timeout only takes its own worker down; tasks on the other lanes
+    keep running.
+    """
+
+    def __init__(self, workers: int = None, max_tasks_per_child: int = None, task_timeout: float = None):
+        # EXTRACTION_WORKERS=0 runs extractors inline (useful for debugging)
+        self.workers = workers if workers is not None else int(os.environ.get('EXTRACTION_WORKERS', os.cpu_count() or 1))
+        self.max_tasks_per_child = max_tasks_per_child or int(os.environ.get('EXTRACTION_MAX_TASKS_PER_CHILD', 200))
+        self.task_timeout = task_timeout or float(os.environ.get('EXTRACTION_TIMEOUT', 60))
+
+        self._lock = threading.Lock()
+        # Lane i runs on self._executors[i]; free lanes wait in the queue. Tasks
+        # never queue inside an executor, so the timeout measures run time and
+        # extra callers wait here (backpressure)
+        self._executors = [None] * self.workers
+        self._lanes = queue.SimpleQueue()
+        for lane in range(self.workers):
+            self._lanes.put(lane)
+        # Threads async callers block on instead of the event loop's default executor
+        self._callers = None
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            'tasks': 0,
+            'running': 0,
+            'waiting': 0,
+            'peak_waiting': 0,
+            'timeouts': 0,
+            'restarts': 0,
+        }
+
+    def _count(self, key: str, delta: int = 1):
+        with self._stats_lock:
+            self._stats[key] += delta
+            if key == 'waiting':
+                self._stats['peak_waiting'] = max(self._stats['peak_waiting'], self._stats['waiting'])
+
+    def _get_executor(self, lane: int) -> ProcessPoolExecutor:
+        """The lane's single-worker executor, creating it if needed"""
+        with self._lock:
+            if self._executors[lane] is None:
+                self._executors[lane] = ProcessPoolExecutor(
+                    max_workers=1,
+                    mp_context=_mp_context(),
+                    max_tasks_per_child=self.max_tasks_per_child,
+                )
+            return self._executors[lane]
+
+    def _restart(self, lane: int, executor: ProcessPoolExecutor):
+        """Kill the lane's worker (if `executor` is still the lane's) so its next task gets a fresh one"""
+        with self._lock:
+            if self._executors[lane] is not executor:
+                return
+            self._executors[lane] = None
+        self._count('restarts')
+
+        # ProcessPoolExecutor cannot cancel a running task; terminating its worker is the only way
+        for process in list((getattr(executor, '_processes', None) or {}).values()):
+            process.terminate()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def _take_lane(self) -> int:
+        try:
+            return self._lanes.get_nowait()
+        except queue.Empty:
+            pass
+        # Only callers that actually block on a lane count as waiting
+        self._count('waiting')
+        try:
+            return self._lanes.get()
+        finally:
+            self._count('waiting', -1)
+
+    def run(self, fn, *args):
+        """Run fn(*args) in a worker process and return its result.
+
+        Blocks while all workers are busy. Raises ExtractionTimeout if the
+        task exceeds the timeout; a task lost to a crashed worker is retried
+        once. `fn`, its arguments and its result must be picklable plain data.
+        """
+        if self.workers == 0:
+            return fn(*args)
+
+        lane = self._take_lane()
+        self._count('running')
+        try:
+            for attempt in range(2):
+                executor = self._get_executor(lane)
+                try:
+                    future = executor.submit(fn, *args)
+                    result = future.result(timeout=self.task_timeout)
+                    self._count('tasks')
+                    return result
+                except TimeoutError:
+                    self._count('timeouts')
+                    self._restart(lane, executor)
+                    raise ExtractionTimeout(f"Extraction took longer than {self.task_timeout:g}s")
+                except BrokenProcessPool:
+                    self._restart(lane, executor)
+                    if attempt:
+                        raise
+        finally:
+            self._count('running', -1)
+            self._lanes.put(lane)
+
+    def _caller_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._callers is None:
+                # One thread per worker is enough to keep every worker busy
+                self._callers = ThreadPoolExecutor(max_workers=self.workers or os.cpu_count() or 1,
+                                                   thread_name_prefix='extraction')
+            return self._callers
+
+    async def acall(self, fn, *args):
+        """Await blocking fn(*args) that extracts through this pool (e.g. a memoized extractor).
+
+        It runs on the pool's own caller threads, so event-loop callers
+        waiting for a free worker never tie up the default executor that
+        asyncio.to_thread() (database, caches, robots.txt) relies on.
+        """
+        return await asyncio.get_running_loop().run_in_executor(self._caller_executor(), partial(fn, *args))
+
+    async def arun(self, fn, *args):
+        """Async variant of run() for event-loop callers"""
+        return await self.acall(self.run, fn, *args)
+
+    def stats(self) -> dict:
+        """Task counters and current load"""
+        with self._stats_lock:
+            return dict(self._stats, workers=self.workers)
+
+    def shutdown(self):
+        """Stop the worker processes and caller threads"""
+        with self._lock:
+            executors, self._executors = self._executors, [None] * self.workers
+            callers, self._callers = self._callers, None
+        for executor in executors:
+            if executor is not None:
+                executor.shutdown(wait=False, cancel_futures=True)
+        if callers is not None:
+            callers.shutdown(wait=False, cancel_futures=True)
+
+
+_pool_instance = None
+_pool_lock = threading.Lock()
+
+
+def get_extraction_pool() -> ExtractionPool:
+    """Get or create the shared extraction pool"""
+    global _pool_instance
+    with _pool_lock:
+        if _pool_instance is None:
+            _pool_instance = ExtractionPool()
+    return _pool_instance
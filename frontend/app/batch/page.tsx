@@ -1,34 +1,112 @@
 'use client';
 
-import { useState } from 'react';
+import { useEffect, useState } from 'react';
 import { useRouter } from 'next/navigation';
-import { api } from '@/lib/api';
+import { api, BatchJob, JobProgress } from '@/lib/api';
 import Link from 'next/link';
 
+// Polling interval when live progress is unavailable, and how many of the latest results are shown
+const POLL_INTERVAL_MS = 2000;
+const RESULTS_SHOWN = 50;
+
 export default function BatchPage() {
   const router = useRouter();
   const [urls, setUrls] = useState('');
   const [loading, setLoading] = useState(false);
-  const [results, setResults] = useState<any>(null);
+  const [jobId, setJobId] = useState<number | null>(null);
+  const [job, setJob] = useState<BatchJob | null>(null);
+  const [results, setResults] = useState<any[]>([]);
   const [error, setError] = useState('');
 
+  // Batches run as background jobs: follow their live progress stream, polling only
+  // if the stream is unavailable
+  useEffect(() => {
+    if (jobId === null) return;
+    let stopped = false;
+    let timer: ReturnType<typeof setTimeout>;
+
+    const refresh = async () => {
+      const [status, page] = await Promise.all([
+        api.getJob(jobId),
+        api.getSessionItems(jobId, { limit: RESULTS_SHOWN }),
+      ]);
+      if (stopped) return true;
+      setJob(status.job);
+      setResults(page.items);
+      if (status.job.finished) setLoading(false);
+      return status.job.finished;
+    };
+
+    const poll = async () => {
+      try {
+        if (await refresh()) return;
+      } catch (err) {
+        if (stopped) return;
+        setError('Telemetry lost: Unable to poll job status. Retrying...');
+      }
+      timer = setTimeout(poll, POLL_INTERVAL_MS);
+    };
+
+    const applyProgress = (progress: JobProgress) => {
+      setJob(prev => prev && {
+        ...prev,
+        ...progress,
+        finished: ['completed', 'cancelled', 'failed'].includes(progress.status ?? prev.status),
+      });
+    };
+
+    refresh().catch(() => {});
+    const unsubscribe = api.subscribeProgress(jobId, {
+      onStatus: (progress) => {
+        applyProgress(progress);
+        // Final status: load the stored results once
+        if (['completed', 'cancelled', 'failed'].includes(progress.status ?? '')) refresh().catch(() => {});
+      },
+      onResult: (result) => {
+        applyProgress(result);
+        setResults(prev => [
+          { ...result, id: `live-${result.processed}`, status: result.success ? 'success' : 'failed' },
+          ...prev,
+        ].slice(0, RESULTS_SHOWN));
+      },
+      onError: () => {
+        if (!stopped) poll();
+      },
+    });
+
+    return () => {
+      stopped = true;
+      unsubscribe();
+      clearTimeout(timer);
+    };
+  }, [jobId]);
+
   const handleBatchScrape = async (e: React.FormEvent) => {
     e.preventDefault();
     setError('');
-    setResults(null);
+    setJob(null);
+    setResults([]);
     setLoading(true);
 
     try {
       const urlList = urls.split('\n').filter(url => url.trim());
       const data = await api.scrapeBatch({ urls: urlList, respect_robots: true });
-      setResults(data);
-      setLoading(false);
+      setJobId(data.session_id);
     } catch (err) {
       setError('Operational failure: Unable to establish handshake with scrape engine.');
       setLoading(false);
     }
   };
 
+  const handleCancel = async () => {
+    if (jobId === null) return;
+    try {
+      await api.cancelJob(jobId);
+    } catch (err) {
+      setError('Abort rejected: The job has already finished.');
+    }
+  };
+
   return (
     <div className="min-h-screen bg-[#02040a] text-slate-200 font-sans pb-20">
       {/* 1. Header Navigation */}
@@ -93,28 +171,41 @@ export default function BatchPage() {
         </div>
 
         {/* 3. Real-time Results Stream */}
-        {results && (
+        {job && (
           <div className="mt-12 space-y-8 animate-in fade-in slide-in-from-bottom-4 duration-700">
             <div className="flex justify-between items-end border-b border-white/5 pb-6">
               <div>
                 <h3 className="text-xs font-black uppercase tracking-[0.3em] text-slate-500 mb-2">Live Execution Log</h3>
                 <div className="flex items-center gap-4">
-                  <span className="text-3xl font-light text-white">{results.successful}<span className="text-slate-700 mx-2">/</span>{results.total_urls}</span>
-                  <span className="text-[10px] font-black uppercase tracking-widest text-emerald-500 bg-emerald-500/10 px-2 py-1 rounded">Success Rate: {Math.round((results.successful/results.total_urls)*100)}%</span>
+                  <span className="text-3xl font-light text-white">{job.processed}<span className="text-slate-700 mx-2">/</span>{job.total_urls}</span>
+                  <span className="text-[10px] font-black uppercase tracking-widest text-slate-400 bg-white/5 px-2 py-1 rounded">{job.status.replace('_', ' ')}</span>
+                  <span className="text-[10px] font-black uppercase tracking-widest text-emerald-500 bg-emerald-500/10 px-2 py-1 rounded">Success Rate: {job.processed ? Math.round((job.successful/job.processed)*100) : 0}%</span>
                 </div>
               </div>
-              <button
-                onClick={() => router.push(`/session/${results.session_id}`)}
-                className="text-[10px] font-black uppercase tracking-widest text-purple-500 hover:text-white transition border-b border-purple-500/20 pb-1"
-              >
-                Deep Inspection →
-              </button>
+              <div className="flex items-center gap-6">
+                {!job.finished && (
+                  <button
+                    onClick={handleCancel}
+                    className="text-[10px] font-black uppercase tracking-widest text-red-500/60 hover:text-red-500 transition border-b border-red-500/20 pb-1"
+                  >
+                    Abort
+                  </button>
+                )}
+                <button
+                  onClick={() => router.push(`/session/${job.id}`)}
+                  className="text-[10px] font-black uppercase tracking-widest text-purple-500 hover:text-white transition border-b border-purple-500/20 pb-1"
+                >
+                  Deep Inspection →
+                </button>
+              </div>
             </div>
 
             <div className="grid gap-3">
-              {results.results?.map((result: any, index: number) => (
+              {results.map((item: any) => {
+                const result = { ...item, success: item.status === 'success' };
+                return (
                 <div
-                  key={index}
+                  key={item.id}
                   className={`flex items-center justify-between p-4 bg-[#0a0f1d]/40 border rounded-xl transition-all ${
                     result.success ? 'border-white/5 hover:border-emerald-500/30' : 'border-red-500/10'
                   }`}
@@ -138,7 +229,8 @@ export default function BatchPage() {
                     </div>
                   </div>
                 </div>
-              ))}
+                );
+              })}
             </div>
           </div>
         )}
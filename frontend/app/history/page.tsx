@@ -6,13 +6,16 @@ import Link from 'next/link';
 
 export default function HistoryPage() {
   const [sessions, setSessions] = useState<any[]>([]);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
   const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
 
   useEffect(() => {
     const fetchSessions = async () => {
       try {
-        const data = await api.getSessions();
+        const data = await api.getSessions({ limit: 50 });
         setSessions(data.sessions || []);
+        setNextCursor(data.next_cursor || null);
         setLoading(false);
       } catch (error) {
         console.error('Failed to fetch sessions');
@@ -23,6 +26,19 @@ export default function HistoryPage() {
     fetchSessions();
   }, []);
 
+  const loadMore = async () => {
+    if (!nextCursor) return;
+    setLoadingMore(true);
+    try {
+      const data = await api.getSessions({ limit: 50, cursor: nextCursor });
+      setSessions(prev => [...prev, ...(data.sessions || [])]);
+      setNextCursor(data.next_cursor || null);
+    } catch (error) {
+      console.error('Failed to fetch sessions');
+    }
+    setLoadingMore(false);
+  };
+
   return (
     <div className="min-h-screen bg-[#02040a] text-slate-200 font-sans">
       {/* 1. Consistent Navigation */}
@@ -46,7 +62,7 @@ export default function HistoryPage() {
         <div className="flex justify-between items-end mb-10">
           <div>
             <h1 className="text-4xl font-light text-white tracking-tight mb-2">Archive</h1>
-            <p className="text-slate-500 text-[10px] uppercase tracking-[0.2em] font-bold">Total Sessions: {sessions.length}</p>
+            <p className="text-slate-500 text-[10px] uppercase tracking-[0.2em] font-bold">Loaded Sessions: {sessions.length}{nextCursor ? '+' : ''}</p>
           </div>
           <Link href="/scraper" className="px-6 py-2.5 bg-white text-black text-xs font-black uppercase rounded-lg hover:bg-slate-200 transition">
             New Extraction
@@ -127,6 +143,16 @@ export default function HistoryPage() {
               </Link>
             </div>
           )}
+
+          {nextCursor && !loading && (
+            <button
+              onClick={loadMore}
+              disabled={loadingMore}
+              className="w-full py-4 text-[10px] font-black uppercase tracking-widest text-slate-500 hover:text-white border border-white/5 rounded-2xl transition disabled:opacity-30"
+            >
+              {loadingMore ? 'Loading…' : 'Load More Sessions'}
+            </button>
+          )}
         </div>
       </main>
 
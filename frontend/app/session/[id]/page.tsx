@@ -13,6 +13,8 @@ export default function SessionDetailPage() {
   const [sessionData, setSessionData] = useState<any>(null);
   const [loading, setLoading] = useState(true);
   const [exporting, setExporting] = useState<string | null>(null);
+  const [contents, setContents] = useState<Record<number, string>>({});
+  const [loadingMore, setLoadingMore] = useState(false);
 
   useEffect(() => {
     const fetchData = async () => {
@@ -27,6 +29,28 @@ export default function SessionDetailPage() {
     fetchData();
   }, [sessionId, router]);
 
+  // Content is only transferred once an item is actually opened
+  const loadContent = async (itemId: number) => {
+    if (contents[itemId] !== undefined) return;
+    try {
+      const item = await api.getItemContent(Number(sessionId), itemId);
+      setContents(prev => ({ ...prev, [itemId]: item.content }));
+    } catch (error) {
+      setContents(prev => ({ ...prev, [itemId]: 'Failed to load content.' }));
+    }
+  };
+
+  const loadMoreItems = async () => {
+    if (!sessionData?.next_cursor) return;
+    setLoadingMore(true);
+    try {
+      const page = await api.getSessionItems(Number(sessionId), { cursor: sessionData.next_cursor });
+      setSessionData((prev: any) => ({ ...prev, data: [...prev.data, ...page.items], next_cursor: page.next_cursor }));
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const handleExport = async (format: 'csv' | 'excel' | 'pdf') => {
     setExporting(format);
     try {
@@ -142,14 +166,17 @@ export default function SessionDetailPage() {
               </div>
 
               {item.status === 'success' ? (
-                <details className="group border-t border-white/5">
+                <details
+                  className="group border-t border-white/5"
+                  onToggle={(e) => { if ((e.target as HTMLDetailsElement).open) loadContent(item.id); }}
+                >
                   <summary className="px-6 py-3 cursor-pointer text-[10px] font-black uppercase tracking-widest text-slate-500 hover:bg-white/[0.02] transition list-none flex items-center justify-between">
                     Raw Payload Inspection
                     <svg className="w-4 h-4 group-open:rotate-180 transition-transform" fill="none" stroke="currentColor" viewBox="0 0 24 24"><path d="M19 9l-7 7-7-7" strokeWidth={2} strokeLinecap="round" strokeLinejoin="round"/></svg>
                   </summary>
                   <div className="p-6 bg-black/40">
                     <pre className="text-xs font-mono text-slate-400 leading-relaxed whitespace-pre-wrap selection:bg-purple-500/30">
-                      {item.content}
+                      {contents[item.id] ?? 'Loading…'}
                     </pre>
                   </div>
                 </details>
@@ -160,6 +187,16 @@ export default function SessionDetailPage() {
               )}
             </div>
           ))}
+
+          {sessionData.next_cursor && (
+            <button
+              onClick={loadMoreItems}
+              disabled={loadingMore}
+              className="w-full py-4 text-[10px] font-black uppercase tracking-widest text-slate-500 hover:text-white border border-white/5 rounded-2xl transition disabled:opacity-30"
+            >
+              {loadingMore ? 'Loading…' : 'Load More Items'}
+            </button>
+          )}
         </div>
       </main>
     </div>
@@ -8,14 +8,75 @@ export interface LoginResponse {
   expires_in?: number;
 }
 
+export type CachePolicy = 'default' | 'revalidate' | 'refresh' | 'bypass';
+
 export interface ScrapeRequest {
   url: string;
   respect_robots?: boolean;
+  cache_policy?: CachePolicy;
 }
 
 export interface BatchScrapeRequest {
   urls: string[];
   respect_robots?: boolean;
+  cache_policy?: CachePolicy;
+}
+
+export type JobStatus = 'queued' | 'in_progress' | 'completed' | 'cancelled' | 'failed';
+
+export interface BatchJob {
+  id: number;
+  name: string;
+  status: JobStatus;
+  total_urls: number;
+  completed_urls: number;
+  processed: number;
+  successful: number;
+  failed: number;
+  finished: boolean;
+  error_message?: string | null;
+  created_at: string;
+  completed_at?: string | null;
+}
+
+export interface JobProgress {
+  session_id: number;
+  status?: JobStatus;
+  total_urls?: number;
+  processed?: number;
+  successful?: number;
+  failed?: number;
+}
+
+export interface UrlResult extends JobProgress {
+  url: string;
+  success: boolean;
+  error: string | null;
+  word_count: number;
+  char_count: number;
+  from_cache: boolean;
+  elapsed: number;
+}
+
+export interface ProgressHandlers {
+  onStatus?: (progress: JobProgress) => void;
+  onResult?: (result: UrlResult) => void;
+  onError?: () => void;
+}
+
+export interface SessionListParams {
+  limit?: number;
+  cursor?: string;
+  status?: string;
+  created_after?: string;
+  created_before?: string;
+}
+
+export interface SearchParams {
+  q: string;
+  session_id?: number;
+  limit?: number;
+  cursor?: string;
 }
 
 class ApiClient {
@@ -61,8 +122,13 @@ class ApiClient {
     return response.json();
   }
 
-  async getSessions() {
-    const response = await fetch(`${API_URL}/api/sessions`, {
+  async getSessions(params: SessionListParams = {}) {
+    const query = new URLSearchParams();
+    Object.entries(params).forEach(([key, value]) => {
+      if (value !== undefined && value !== '') query.set(key, String(value));
+    });
+
+    const response = await fetch(`${API_URL}/api/sessions?${query}`, {
       headers: this.getAuthHeader(),
     });
     
@@ -98,6 +164,76 @@ class ApiClient {
     return response.json();
   }
 
+  // Scrape a batch within the request, receiving each result (content included) as it completes
+  async scrapeBatchStream(data: BatchScrapeRequest, onLine: (line: any) => void) {
+    const response = await fetch(`${API_URL}/api/scrape/batch`, {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+        'Accept': 'application/x-ndjson',
+        ...this.getAuthHeader(),
+      },
+      body: JSON.stringify(data),
+    });
+    
+    if (!response.ok || !response.body) throw new Error('Batch scraping failed');
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffered = '';
+    for (;;) {
+      const { done, value } = await reader.read();
+      buffered += decoder.decode(value, { stream: !done });
+      const lines = buffered.split('\n');
+      buffered = lines.pop() ?? '';
+      lines.filter(line => line.trim()).forEach(line => onLine(JSON.parse(line)));
+      if (done) break;
+    }
+  }
+
+  async getJob(sessionId: number): Promise<{ success: boolean; job: BatchJob }> {
+    const response = await fetch(`${API_URL}/api/jobs/${sessionId}`, {
+      headers: this.getAuthHeader(),
+    });
+    
+    if (!response.ok) throw new Error('Failed to fetch job');
+    return response.json();
+  }
+
+  async cancelJob(sessionId: number) {
+    const response = await fetch(`${API_URL}/api/jobs/${sessionId}/cancel`, {
+      method: 'POST',
+      headers: this.getAuthHeader(),
+    });
+    
+    if (!response.ok) throw new Error('Failed to cancel job');
+    return response.json();
+  }
+
+  // Live job progress over Server-Sent Events; returns a function that closes the stream
+  subscribeProgress(sessionId: number, handlers: ProgressHandlers): () => void {
+    // EventSource cannot send headers, so the token goes in the query string
+    const token = localStorage.getItem('auth_token') || '';
+    const source = new EventSource(`${API_URL}/api/session/${sessionId}/events?token=${encodeURIComponent(token)}`);
+
+    source.addEventListener('status', (event) => {
+      const progress: JobProgress = JSON.parse((event as MessageEvent).data);
+      handlers.onStatus?.(progress);
+      if (progress.status === 'completed' || progress.status === 'cancelled' || progress.status === 'failed') {
+        source.close();
+      }
+    });
+    source.addEventListener('result', (event) => {
+      handlers.onResult?.(JSON.parse((event as MessageEvent).data));
+    });
+    source.onerror = () => {
+      // The browser reconnects on its own unless the stream was closed for good
+      if (source.readyState === EventSource.CLOSED) handlers.onError?.();
+    };
+
+    return () => source.close();
+  }
+
   async getSessionData(sessionId: number) {
     const response = await fetch(`${API_URL}/api/session/${sessionId}`, {
       headers: this.getAuthHeader(),
@@ -107,9 +243,40 @@ class ApiClient {
     return response.json();
   }
 
-  async exportSession(sessionId: number, format: 'csv' | 'excel' | 'pdf') {
+  async getSessionItems(sessionId: number, params: { limit?: number; cursor?: string; preview?: number } = {}) {
+    const query = new URLSearchParams();
+    Object.entries(params).forEach(([key, value]) => {
+      if (value !== undefined && value !== '') query.set(key, String(value));
+    });
+
+    const response = await fetch(`${API_URL}/api/session/${sessionId}/items?${query}`, {
+      headers: this.getAuthHeader(),
+    });
+    
+    if (!response.ok) throw new Error('Failed to fetch session items');
+    return response.json();
+  }
+
+  async getItemContent(sessionId: number, itemId: number, range: { offset?: number; length?: number } = {}) {
+    const query = new URLSearchParams();
+    if (range.offset !== undefined) query.set('offset', String(range.offset));
+    if (range.length !== undefined) query.set('length', String(range.length));
+
+    const response = await fetch(`${API_URL}/api/session/${sessionId}/items/${itemId}/content?${query}`, {
+      headers: this.getAuthHeader(),
+    });
+    
+    if (!response.ok) throw new Error('Failed to fetch item content');
+    return response.json();
+  }
+
+  async exportSession(sessionId: number, format: 'csv' | 'excel' | 'pdf', options: { columns?: string[]; gzip?: boolean } = {}) {
     const token = localStorage.getItem('auth_token');
-    const response = await fetch(`${API_URL}/api/session/${sessionId}/export/${format}`, {
+    const query = new URLSearchParams();
+    if (options.columns?.length) query.set('columns', options.columns.join(','));
+    if (options.gzip) query.set('gzip', 'true');
+
+    const response = await fetch(`${API_URL}/api/session/${sessionId}/export/${format}?${query}`, {
       headers: { 'Authorization': `Bearer ${token}` },
     });
     
@@ -119,13 +286,27 @@ class ApiClient {
     const url = window.URL.createObjectURL(blob);
     const a = document.createElement('a');
     a.href = url;
-    a.download = `session_${sessionId}.${format === 'excel' ? 'xlsx' : format}`;
+    a.download = `session_${sessionId}.${format === 'excel' ? 'xlsx' : format}${options.gzip ? '.gz' : ''}`;
     document.body.appendChild(a);
     a.click();
     window.URL.revokeObjectURL(url);
     document.body.removeChild(a);
   }
 
+  async search(params: SearchParams) {
+    const query = new URLSearchParams({ q: params.q });
+    if (params.session_id !== undefined) query.set('session_id', String(params.session_id));
+    if (params.limit !== undefined) query.set('limit', String(params.limit));
+    if (params.cursor) query.set('cursor', params.cursor);
+
+    const response = await fetch(`${API_URL}/api/search?${query}`, {
+      headers: this.getAuthHeader(),
+    });
+    
+    if (!response.ok) throw new Error('Search failed');
+    return response.json();
+  }
+
   async deleteSession(sessionId: number) {
     const response = await fetch(`${API_URL}/api/session/${sessionId}`, {
       method: 'DELETE',
@@ -0,0 +1,247 @@
+"""
+Persistent HTTP response cache
+Keeps downloaded bodies on disk (with an SQLite index) together with their
+validators and the text extracted from them, so a repeated scrape can be
+answered from disk or with a conditional request: a 304 (or an unchanged
+body) skips both the download and the re-extraction.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+# Per-request cache policies:
+#   default    - serve fresh entries without a request, revalidate stale ones
+#   revalidate - always ask the server, conditionally when we hold validators
+#   refresh    - ignore the cached entry, download again and store the result
+#   bypass     - neither read nor write the cache
+CACHE_POLICIES = ('default', 'revalidate', 'refresh', 'bypass')
+
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024
+
+
+def _parse_cache_control(value: str) -> dict:
+    """Split a Cache-Control header into {directive: value or True}"""
+    directives = {}
+    for part in (value or '').split(','):
+        name, _, arg = part.strip().partition('=')
+        if name:
+            directives[name.lower()] = arg.strip('"') if arg else True
+    return directives
+
+
+def _expires_at(headers, now: float) -> float:
+    """When a response stops being fresh; `now` means revalidate every time"""
+    cache_control = _parse_cache_control(headers.get('cache-control', ''))
+    if 'no-cache' in cache_control:
+        return now
+    for directive in ('s-maxage', 'max-age'):
+        try:
+            return now + max(int(cache_control[directive]), 0)
+        except (KeyError, ValueError):
+            continue
+    if headers.get('expires'):
+        try:
+            return parsedate_to_datetime(headers['expires']).timestamp()
+        except (TypeError, ValueError):
+            return now
+    return now
+
+
+class HttpCache:
+    """On-disk response cache with conditional revalidation and LRU eviction"""
+
+    def __init__(self, directory: str = None, max_bytes: int = None):
+        self.directory = directory or os.environ.get('HTTP_CACHE_DIR', '.http_cache')
+        self.max_bytes = max_bytes or int(os.environ.get('HTTP_CACHE_MAX_BYTES', DEFAULT_MAX_BYTES))
+        os.makedirs(os.path.join(self.directory, 'bodies'), exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(self.directory, 'index.sqlite'),
+                                     timeout=30, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS entries (
+                    key TEXT PRIMARY KEY,
+                    url TEXT NOT NULL,
+                    content_type TEXT,
+                    etag TEXT,
+                    last_modified TEXT,
+                    body_hash TEXT,
+                    text TEXT,
+                    size INTEGER NOT NULL,
+                    stored_at REAL NOT NULL,
+                    expires_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )
+            ''')
+            self._conn.execute('CREATE INDEX IF NOT EXISTS idx_entries_last_access ON entries(last_access)')
+            self._total = self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+
+    @staticmethod
+    def _key(url: str) -> str:
+        return hashlib.sha256(url.encode('utf-8')).hexdigest()
+
+    def _body_path(self, key: str) -> str:
+        return os.path.join(self.directory, 'bodies', key[:2], key)
+
+    def get(self, url: str) -> dict:
+        """Cached entry for `url` (without its body) or None; `fresh` tells if it may be used as is"""
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute('SELECT * FROM entries WHERE key = ?', (self._key(url),)).fetchone()
+            if row is None:
+                return None
+            self._conn.execute('UPDATE entries SET last_access = ? WHERE key = ?', (now, row['key']))
+
+        entry = dict(row)
+        entry['fresh'] = now < entry['expires_at']
+        return entry
+
+    def lookup(self, url: str, policy: str = 'default'):
+        """Decide how to fetch `url` under `policy`.
+
+        Returns (entry, request_headers): a fresh entry the caller may use
+        without any request when request_headers is None, otherwise the
+        conditional headers (possibly empty) to send with the download.
+        """
+        if policy in ('refresh', 'bypass'):
+            return None, {}
+        entry = self.get(url)
+        if entry is None:
+            return None, {}
+        if entry['text'] is None and not os.path.exists(self._body_path(entry['key'])):
+            # Nothing usable left to revalidate
+            return None, {}
+        if policy == 'default' and entry['fresh'] and entry['text'] is not None:
+            return entry, None
+
+        headers = {}
+        if entry['etag']:
+            headers['If-None-Match'] = entry['etag']
+        if entry['last_modified']:
+            headers['If-Modified-Since'] = entry['last_modified']
+        return entry, headers
+
+    def read_body(self, entry: dict) -> bytes:
+        """Body of a cached entry, or None if its file has gone missing"""
+        try:
+            with open(self._body_path(entry['key']), 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def revalidated(self, url: str, headers) -> dict:
+        """Record a 304 for `url`: the cached body is current again"""
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute('''
+                UPDATE entries SET expires_at = ?, last_access = ?,
+                       etag = COALESCE(?, etag), last_modified = COALESCE(?, last_modified)
+                WHERE key = ?
+            ''', (_expires_at(headers, now), now, headers.get('etag'), headers.get('last-modified'),
+                  self._key(url)))
+        return self.get(url)
+
+    def store(self, url: str, headers, body: bytes, previous: dict = None) -> dict:
+        """Cache a successful response; returns the new entry or None if it may not be stored.
+
+        When the body is byte-identical to `previous`, its extracted text is kept.
+        """
+        if 'no-store' in _parse_cache_control(headers.get('cache-control', '')):
+            self.delete(url)
+            return None
+
+        key = self._key(url)
+        now = time.time()
+        body_hash = hashlib.sha256(body).hexdigest()
+        text = previous['text'] if previous and previous['body_hash'] == body_hash else None
+
+        path = self._body_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(body)
+        os.replace(temp_path, path)
+
+        size = len(body) + len(text or '')
+        with self._lock, self._conn:
+            old = self._conn.execute('SELECT size FROM entries WHERE key = ?', (key,)).fetchone()
+            self._conn.execute('''
+                INSERT OR REPLACE INTO entries
+                (key, url, content_type, etag, last_modified, body_hash, text, size, stored_at, expires_at, last_access)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (key, url, headers.get('content-type', ''), headers.get('etag'), headers.get('last-modified'),
+                  body_hash, text, size, now, _expires_at(headers, now), now))
+            self._total += size - (old['size'] if old else 0)
+
+        self._evict()
+        return self.get(url)
+
+    def set_text(self, url: str, text: str):
+        """Attach the extracted text to a cached entry so it is not extracted again"""
+        with self._lock, self._conn:
+            row = self._conn.execute('SELECT size, text FROM entries WHERE key = ?', (self._key(url),)).fetchone()
+            if row is None:
+                return
+            delta = len(text) - len(row['text'] or '')
+            self._conn.execute('UPDATE entries SET text = ?, size = size + ? WHERE key = ?',
+                               (text, delta, self._key(url)))
+            self._total += delta
+        self._evict()
+
+    def delete(self, url: str):
+        """Drop the entry for `url`, if any"""
+        self._remove([self._key(url)])
+
+    def _remove(self, keys):
+        with self._lock, self._conn:
+            for key in keys:
+                row = self._conn.execute('DELETE FROM entries WHERE key = ? RETURNING size', (key,)).fetchone()
+                if row:
+                    self._total -= row['size']
+                try:
+                    os.remove(self._body_path(key))
+                except FileNotFoundError:
+                    pass
+
+    def _evict(self):
+        """Drop least recently used entries until the cache is back under 90% of max_bytes"""
+        if self._total <= self.max_bytes:
+            return
+        with self._lock:
+            # Other processes share the index, so re-read the real total first
+            self._total = self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+            excess = self._total - int(self.max_bytes * 0.9)
+            victims = []
+            if excess > 0:
+                for row in self._conn.execute('SELECT key, size FROM entries ORDER BY last_access'):
+                    victims.append(row['key'])
+                    excess -= row['size']
+                    if excess <= 0:
+                        break
+        self._remove(victims)
+
+    def stats(self) -> dict:
+        """Entry count and bytes used"""
+        with self._lock:
+            count = self._conn.execute('SELECT COUNT(*) FROM entries').fetchone()[0]
+        return {'entries': count, 'bytes': self._total, 'max_bytes': self.max_bytes}
+
+
+_cache_instance = None
+_cache_lock = threading.Lock()
+
+
+def get_http_cache() -> HttpCache:
+    """Get or create the shared HTTP cache"""
+    global _cache_instance
+    with _cache_lock:
+        if _cache_instance is None:
+            _cache_instance = HttpCache()
+    return _cache_instance
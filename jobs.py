@@ -0,0 +1,325 @@
+"""
+Background batch jobs
+Batch scrapes are queued in the database (a 'queued' scraping session plus
+its URLs in job_urls) and processed by workers running in the API process,
+so the submitting request returns at once. Workers claim jobs atomically,
+save results as they arrive (partial results are visible while a job runs),
+heartbeat while working and stop when a job is cancelled. A job left behind
+by a stopped or crashed process is handed back or picked up again once its
+heartbeat goes stale, and continues with the URLs it had not finished.
+Progress (every finished URL and status change) is pushed to the progress
+broker as it happens, for the API's event streams.
+
+Sitemap jobs (options kind='sitemap') start without URLs: the worker reads
+the sitemaps while it scrapes, appending the pages it finds to the job in
+batches, so scraping starts with the first batch. Crawl jobs (kind='crawl')
+take their pages from the crawl frontier instead of job_urls and add the
+links they find to it (see crawler.py).
+"""
+
+import asyncio
+import logging
+import os
+import socket
+import time
+from collections import defaultdict
+from contextlib import aclosing
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from database import get_database
+from crawler import Crawler
+from progress import get_progress_broker
+from sitemaps import SitemapFilter, SitemapReader
+
+logger = logging.getLogger(__name__)
+
+# scraping_sessions.status values a job goes through
+JOB_STATUSES = ('queued', 'in_progress', 'completed', 'cancelled', 'failed')
+
+
+def result_row(result: Dict) -> tuple:
+    """BatchEngine result -> save_scraped_data_many() row"""
+    if result['success']:
+        return (result['url'], result['url'], result['content'], 'success', '')
+    return (result['url'], result['url'], '', 'failed', result['error'])
+
+
+class JobQueue:
+    """Database-backed queue of batch scrape jobs and the workers draining it"""
+
+    def __init__(self, engine, db=None, workers: int = None, poll_interval: float = None,
+                 lease: float = None, flush_interval: float = 2.0, batch_size: int = 200,
+                 chunk_size: int = 1000):
+        self.engine = engine
+        self.db = db or get_database()
+        # Jobs processed at once by this process; each job is scraped with the engine's concurrency
+        self.workers = workers or int(os.environ.get('JOB_WORKERS', 2))
+        self.poll_interval = poll_interval or float(os.environ.get('JOB_POLL_INTERVAL', 5))
+        # A running job whose worker has not heartbeated for this long is taken over
+        self.lease = lease or float(os.environ.get('JOB_LEASE', 60))
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.chunk_size = chunk_size
+        self.progress = get_progress_broker()
+
+        self._worker_prefix = f"{socket.gethostname()}:{os.getpid()}"
+        self._tasks = []
+        self._wakeup = None
+        self._cancelled = set()
+
+    async def start(self):
+        """Start the worker tasks on the running event loop"""
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._worker(f"{self._worker_prefix}:{n}"))
+                       for n in range(self.workers)]
+
+    async def stop(self):
+        """Stop the workers; jobs they were running go back to the queue"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def submit(self, name: str, urls: List[str], options: Dict = None, aliases: Dict[str, str] = None) -> int:
+        """Queue a job and return its session id; `aliases` maps submitted URLs to the canonical ones queued"""
+        session_id = await asyncio.to_thread(self.db.create_job, name, urls, options, aliases)
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return session_id
+
+    async def submit_crawl(self, name: str, settings: Dict, options: Dict = None) -> int:
+        """Queue a crawl (settings from crawler.crawl_settings()) and return its session id"""
+        options = dict(options or {}, kind='crawl', crawl=settings)
+        session_id = await asyncio.to_thread(self.db.create_crawl, name, settings['seeds'], options,
+                                             settings['max_pages'])
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return session_id
+
+    async def cancel(self, session_id: int) -> Optional[str]:
+        """Cancel a job; returns its resulting status (None if there is no such session)"""
+        status = await asyncio.to_thread(self.db.cancel_job, session_id)
+        if status == 'cancelled':
+            # Lets a worker in this process stop right away instead of at its next save
+            self._cancelled.add(session_id)
+            self.progress.publish(session_id, 'status', {'session_id': session_id, 'status': status})
+        return status
+
+    async def _worker(self, worker_id: str):
+        while True:
+            try:
+                job = await asyncio.to_thread(self.db.claim_job, worker_id, self.lease)
+            except Exception:
+                logger.exception(f"Job worker {worker_id} could not claim a job")
+                job = None
+
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+                continue
+
+            try:
+                await self._process(job, worker_id)
+            except Exception:
+                logger.exception(f"Job worker {worker_id} lost job {job['id']}")
+
+    async def _heartbeat(self, session_id: int, worker_id: str, state: Dict):
+        """Keep the lease alive while results are slow to come in"""
+        while True:
+            await asyncio.sleep(self.lease / 3)
+            status = await asyncio.to_thread(self.db.save_job_results, session_id, worker_id, [], [])
+            if status != 'in_progress':
+                state['status'] = status
+
+    async def _discover(self, job: Dict, counts: Dict, found: asyncio.Event):
+        """Append the pages listed in a sitemap job's sitemaps to the job as they are read"""
+        session_id, options = job['id'], job['options']
+        spec = options['sitemap']
+        since = datetime.fromisoformat(spec['lastmod_since']) if spec.get('lastmod_since') else None
+        reader = SitemapReader(self.engine, respect_robots=options.get('respect_robots', True))
+        # A resumed job already holds the first URLs the sitemaps list
+        skip, limit = job['total_urls'], spec.get('max_urls')
+        listed, batch = 0, []
+        last_add = time.monotonic()
+
+        async def add():
+            nonlocal batch, last_add
+            counts['total_urls'] = await asyncio.to_thread(self.db.add_job_urls, session_id, batch)
+            batch, last_add = [], time.monotonic()
+            found.set()
+            self.progress.publish(session_id, 'status', {**counts, 'status': 'in_progress'})
+
+        try:
+            urls = reader.urls(spec['source'], SitemapFilter(since, spec.get('include'), spec.get('exclude')))
+            async with aclosing(urls):
+                async for entry in urls:
+                    listed += 1
+                    if listed > skip:
+                        batch.append(entry['url'])
+                        if len(batch) >= self.chunk_size or time.monotonic() - last_add >= self.flush_interval:
+                            await add()
+                    if limit and listed >= limit:
+                        break
+            if batch:
+                await add()
+            await asyncio.to_thread(self.db.update_job_options, session_id, {
+                'discovered': True,
+                'sitemaps_read': reader.sitemaps_read,
+                'sitemap_errors': reader.errors[:100],
+            })
+        finally:
+            found.set()
+
+    async def _listed_results(self, session_id: int, options: Dict, running, discovery, found: asyncio.Event):
+        """(result, position) for the URLs queued in job_urls, chunk by chunk"""
+        after = -1
+        while running():
+            found.clear()
+            # Taken before the query: URLs discovery adds while it runs must not be missed
+            discovered = discovery is None or discovery.done()
+            chunk = await asyncio.to_thread(self.db.get_job_urls, session_id, after, self.chunk_size)
+            if not chunk:
+                if discovered:
+                    break
+                # Wait for the sitemaps to yield more URLs (checking for cancellation now and then)
+                try:
+                    await asyncio.wait_for(found.wait(), self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            after = chunk[-1][0]
+
+            # Results arrive in completion order; map them back to their positions
+            waiting = defaultdict(list)
+            for position, url in chunk:
+                waiting[url].append(position)
+
+            results = self.engine.run([url for _, url in chunk], options.get('cache_policy', 'default'),
+                                      options.get('respect_robots', True))
+            async with aclosing(results):
+                async for result in results:
+                    yield result, waiting[result['url']].pop()
+
+    async def _crawl_results(self, session_id: int, options: Dict, running, flush):
+        """(result, (url, links to queue)) for the pages of a crawl, batch by batch from its frontier"""
+        crawler = Crawler(self.engine, options['crawl'])
+        await asyncio.to_thread(self.db.requeue_frontier, session_id)
+        while running():
+            batch = await asyncio.to_thread(self.db.claim_frontier, session_id, self.batch_size)
+            if not batch:
+                break
+            depths = dict(batch)
+
+            def crawl_page(url, cache_policy, respect_robots):
+                return crawler.crawl_page(url, cache_policy, respect_robots, follow=depths[url] < crawler.max_depth)
+
+            results = self.engine.run(list(depths), options.get('cache_policy', 'default'),
+                                      options.get('respect_robots', True), scrape=crawl_page)
+            async with aclosing(results):
+                async for result in results:
+                    depth = depths[result['url']] + 1
+                    yield result, (result['url'], [(link, depth) for link in result.pop('links')])
+            # The links found so far join the frontier before the next batch is taken
+            await flush()
+
+    async def _process(self, job: Dict, worker_id: str):
+        """Scrape a claimed job's remaining URLs (or crawl pages), saving results as they complete"""
+        session_id, options = job['id'], job['options'] or {}
+        crawl = options.get('kind') == 'crawl'
+        state = {'status': 'in_progress'}
+        # Results not saved yet, and what each one finishes (a job_urls position or a crawl page)
+        rows, done = [], []
+        last_flush = time.monotonic()
+
+        # Running totals carried by every progress event; a resumed job starts from what it saved
+        counts = {'session_id': session_id, 'total_urls': job['total_urls'],
+                  'processed': job['completed_urls'], 'successful': 0, 'failed': 0}
+        if job['completed_urls']:
+            summary = await asyncio.to_thread(self.db.get_session_summary, session_id)
+            counts['successful'] = summary['stats']['successful']
+            counts['failed'] = summary['stats']['failed']
+        self.progress.publish(session_id, 'status', {**counts, 'status': 'in_progress'})
+
+        def report(result: Dict):
+            counts['processed'] += 1
+            counts['successful' if result['success'] else 'failed'] += 1
+            if self.progress.has_subscribers(session_id):
+                self.progress.publish(session_id, 'result', {
+                    **counts,
+                    'url': result['url'],
+                    'success': result['success'],
+                    'error': result['error'],
+                    'word_count': result['word_count'],
+                    'char_count': result['char_count'],
+                    'from_cache': result['from_cache'],
+                    'elapsed': result['elapsed'],
+                })
+
+        async def save(batch: List[tuple], finished: List) -> Optional[str]:
+            if not crawl:
+                return await asyncio.to_thread(self.db.save_job_results, session_id, worker_id, batch, finished)
+            saved = await asyncio.to_thread(self.db.save_crawl_results, session_id, worker_id, batch, finished,
+                                            options['crawl']['max_pages'])
+            if saved is None:
+                return None
+            status, counts['total_urls'] = saved
+            return status
+
+        async def flush():
+            nonlocal rows, done, last_flush
+            batch, finished = rows, done
+            rows, done = [], []
+            last_flush = time.monotonic()
+            status = await save(batch, finished)
+            if status != 'in_progress':
+                state['status'] = status
+
+        def running() -> bool:
+            return state['status'] == 'in_progress' and session_id not in self._cancelled
+
+        heartbeat = asyncio.create_task(self._heartbeat(session_id, worker_id, state))
+        discovery, found = None, asyncio.Event()
+        if options.get('kind') == 'sitemap' and not options.get('discovered'):
+            discovery = asyncio.create_task(self._discover(job, counts, found))
+        try:
+            if crawl:
+                results = self._crawl_results(session_id, options, running, flush)
+            else:
+                results = self._listed_results(session_id, options, running, discovery, found)
+            async with aclosing(results):
+                async for result, finishes in results:
+                    done.append(finishes)
+                    rows.append(result_row(result))
+                    report(result)
+                    if len(rows) >= self.batch_size or time.monotonic() - last_flush >= self.flush_interval:
+                        await flush()
+                    if not running():
+                        break
+
+            await flush()
+            if discovery is not None and discovery.done() and discovery.exception():
+                raise discovery.exception()
+            # Leaves a cancelled job cancelled, and is a no-op if the job was taken over
+            final = await asyncio.to_thread(self.db.finish_job, session_id, worker_id, 'completed')
+            if final:
+                self.progress.publish(session_id, 'status', {**counts, 'status': final})
+        except asyncio.CancelledError:
+            # Shutting down: keep what was scraped and let another worker finish the job
+            await save(rows, done)
+            await asyncio.to_thread(self.db.release_job, session_id, worker_id)
+            self.progress.publish(session_id, 'status', {**counts, 'status': 'queued'})
+            raise
+        except Exception as e:
+            logger.exception(f"Job {session_id} failed")
+            final = await asyncio.to_thread(self.db.finish_job, session_id, worker_id, 'failed', str(e))
+            if final:
+                self.progress.publish(session_id, 'status', {**counts, 'status': final, 'error': str(e)})
+        finally:
+            heartbeat.cancel()
+            if discovery is not None:
+                discovery.cancel()
+            self._cancelled.discard(session_id)
@@ -7,29 +7,42 @@ from dotenv import load_dotenv
 load_dotenv()
 
 from fastapi import FastAPI, Request, Depends, HTTPException, status
-from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 import os
 from datetime import datetime, timedelta
-from database import ScrapingDatabase
-from web_scraper import get_website_text_content
-from typing import Optional
-import secrets
-import json
-
-class DateTimeEncoder(json.JSONEncoder):
-    def default(self, obj):
-        if isinstance(obj, datetime):
-            return obj.isoformat()
-        return super().default(obj)
-
-def serialize(data):
-    """Convert data with datetime objects to JSON-safe dict."""
-    return json.loads(json.dumps(data, cls=DateTimeEncoder))
+from database import get_database
+from batch_engine import BatchEngine
+from extraction_pool import get_extraction_pool
+from politeness import get_politeness
+from robots import get_robots
+from jobs import JobQueue
+from progress import get_progress_broker
+from serialization import FastJSONResponse, dumps
+from token_store import get_token_store
+from url_canonical import get_canonicalizer
+from sitemaps import SitemapFilter, SitemapReader
+from crawler import CRAWL_SCOPES, crawl_settings
+from exports import (
+    COLUMN_LABELS,
+    DEFAULT_CSV_COLUMNS,
+    DEFAULT_EXCEL_COLUMNS,
+    iter_csv,
+    iter_file,
+    parse_columns,
+    write_xlsx,
+)
+from typing import Literal, Optional
+import asyncio
+import logging
+from contextlib import aclosing
+
+logger = logging.getLogger(__name__)
 
 # Initialize FastAPI app
-app = FastAPI(title="Smart Web Scraper API", description="Modern web scraping API")
+# Responses are encoded with orjson in a single pass (datetimes included)
+app = FastAPI(title="Smart Web Scraper API", description="Modern web scraping API",
+              default_response_class=FastJSONResponse)
 
 # CORS Configuration
 cors_origins = os.environ.get("CORS_ORIGINS", "http://localhost:3000,http://127.0.0.1:3000")
@@ -42,7 +55,20 @@ app.add_middleware(
 )
 
 # Database
-db = ScrapingDatabase()
+db = get_database()
+
+# Shared async scraping engine (one pooled HTTP client for every request)
+engine = BatchEngine()
+
+# Background batch jobs, processed by workers on this event loop
+jobs = JobQueue(engine, db)
+
+# Streaming batch responses (one JSON document per line)
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+# Job statuses after which a progress stream ends, and seconds between keepalives
+FINISHED_STATUSES = ('completed', 'cancelled', 'failed')
+SSE_KEEPALIVE = float(os.environ.get('SSE_KEEPALIVE', 15))
 
 # Admin credentials (loaded from .env)
 ADMIN_USERNAME = os.environ.get('ADMIN_USERNAME')
@@ -51,24 +77,58 @@ ADMIN_PASSWORD = os.environ.get('ADMIN_PASSWORD')
 if not ADMIN_USERNAME or not ADMIN_PASSWORD:
     raise RuntimeError("ADMIN_USERNAME and ADMIN_PASSWORD must be set in .env")
 
-# Session storage (in production, use Redis or database)
-sessions = {}
+# Login tokens, shared by every API worker (see token_store.py)
+tokens = get_token_store()
+
+# Seconds between deletions of expired tokens
+TOKEN_SWEEP_INTERVAL = float(os.environ.get('TOKEN_SWEEP_INTERVAL', 600))
 
 # Token expiry time
 TOKEN_EXPIRY_HOURS = 24
 
+# Lifetime of the single-session tokens EventSource clients put in the URL
+STREAM_TOKEN_SECONDS = int(os.environ.get('STREAM_TOKEN_SECONDS', 60))
+
 # Pydantic models
 class LoginRequest(BaseModel):
     username: str
     password: str
 
+# HTTP cache policy per request (see http_cache.CACHE_POLICIES)
+CachePolicy = Literal['default', 'revalidate', 'refresh', 'bypass']
+
 class ScrapeRequest(BaseModel):
     url: str
     respect_robots: bool = True
+    cache_policy: CachePolicy = 'default'
 
 class ScrapeBatchRequest(BaseModel):
     urls: list[str]
     respect_robots: bool = True
+    cache_policy: CachePolicy = 'default'
+
+class SitemapRequest(BaseModel):
+    # A domain, a site URL (its robots.txt Sitemap lines or /sitemap.xml are read) or a sitemap URL
+    source: str
+    lastmod_since: Optional[datetime] = None
+    # Shell-style patterns matched against URL paths, e.g. /blog/*
+    include: list[str] = []
+    exclude: list[str] = []
+    max_urls: Optional[int] = None
+    respect_robots: bool = True
+    cache_policy: CachePolicy = 'default'
+
+class CrawlRequest(BaseModel):
+    seeds: list[str]
+    # Defaults come from CRAWL_MAX_DEPTH / CRAWL_MAX_PAGES
+    max_depth: Optional[int] = None
+    max_pages: Optional[int] = None
+    # Follow links on the seeds' hosts, on their domains (with subdomains) or anywhere
+    scope: Literal[CRAWL_SCOPES] = 'host'
+    path_prefixes: list[str] = []
+    # Shell-style patterns matched against URL paths, e.g. /tag/*
+    exclude: list[str] = []
+    respect_robots: bool = True
 
 # Authentication dependency
 async def get_current_user(request: Request):
@@ -76,17 +136,11 @@ async def get_current_user(request: Request):
     if not auth_header or not auth_header.startswith("Bearer "):
         return None
     
-    token = auth_header.replace("Bearer ", "")
-    if token not in sessions:
-        return None
-    
-    session = sessions[token]
-    # Check if token expired
-    if datetime.now() > session.get("expires_at", datetime.now()):
-        del sessions[token]
+    user = await tokens.aget(auth_header.replace("Bearer ", ""))
+    # Scoped tokens (see stream_scope) are only good for what they were issued for
+    if user and user.get("scope"):
         return None
-    
-    return session
+    return user
 
 async def require_auth(request: Request):
     user = await get_current_user(request)
@@ -94,6 +148,25 @@ async def require_auth(request: Request):
         raise HTTPException(status_code=401, detail="Authentication required")
     return user
 
+def stream_scope(session_id: int) -> str:
+    """Scope of a token that may only open the event stream of one session"""
+    return f"events:{session_id}"
+
+async def require_stream_auth(request: Request, session_id: int, token: Optional[str] = None):
+    """require_auth that also takes a stream token as `?token=`, for EventSource clients.
+
+    Only short-lived tokens from /api/session/{id}/events/token, scoped to
+    this session, are accepted in the URL; login tokens must use the header.
+    """
+    user = await get_current_user(request)
+    if not user and token:
+        user = await tokens.aget(token)
+        if user and user.get("scope") != stream_scope(session_id):
+            user = None
+    if not user:
+        raise HTTPException(status_code=401, detail="Authentication required")
+    return user
+
 # Routes
 @app.get("/")
 async def root():
@@ -109,13 +182,11 @@ async def login_api(login_data: LoginRequest):
     """Login API endpoint - returns JWT-like token"""
     if login_data.username == ADMIN_USERNAME and login_data.password == ADMIN_PASSWORD:
         # Create session token
-        token = secrets.token_urlsafe(32)
-        sessions[token] = {
+        token = await asyncio.to_thread(tokens.issue, {
             "username": login_data.username,
             "authenticated": True,
-            "login_time": datetime.now(),
-            "expires_at": datetime.now() + timedelta(hours=TOKEN_EXPIRY_HOURS)
-        }
+            "login_time": datetime.now()
+        }, timedelta(hours=TOKEN_EXPIRY_HOURS))
         
         return {
             "success": True, 
@@ -130,47 +201,64 @@ async def login_api(login_data: LoginRequest):
 @app.get("/api/dashboard")
 async def dashboard(user = Depends(require_auth)):
     """Get dashboard data"""
-    recent_sessions = db.get_sessions()[:6]
-    return serialize({
+    recent_sessions = (await asyncio.to_thread(db.list_sessions, 6))['sessions']
+    return FastJSONResponse({
         "user": user,
         "recent_sessions": recent_sessions
     })
 
 @app.get("/api/sessions")
-async def get_all_sessions(user = Depends(require_auth)):
-    """Get all scraping sessions"""
-    sessions_data = db.get_sessions()
-    return serialize({
-        "sessions": sessions_data
-    })
+async def get_all_sessions(limit: int = 50, cursor: Optional[str] = None, status: Optional[str] = None,
+                           created_after: Optional[datetime] = None, created_before: Optional[datetime] = None,
+                           user = Depends(require_auth)):
+    """Get scraping sessions, newest first, one page at a time"""
+    limit = max(1, min(limit, 500))
+    try:
+        page = await asyncio.to_thread(db.list_sessions, limit, cursor, status, created_after, created_before)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return FastJSONResponse(page)
+
+@app.get("/api/search")
+async def search_content(q: str, session_id: Optional[int] = None, limit: int = 20,
+                         cursor: Optional[str] = None, user = Depends(require_auth)):
+    """Full-text search across scraped content"""
+    limit = max(1, min(limit, 100))
+    try:
+        page = await asyncio.to_thread(db.search_content, q, session_id, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return FastJSONResponse(page)
 
 @app.post("/api/scrape")
 async def scrape_single_url(request: Request, scrape_data: ScrapeRequest, user = Depends(require_auth)):
     """API endpoint for single URL scraping"""
     try:
         # Start scraping session
-        session_id = db.create_session(f"Single URL: {scrape_data.url}", 1)
+        session_id = await asyncio.to_thread(db.create_session, f"Single URL: {scrape_data.url}", 1)
         
         # Extract content
-        content = get_website_text_content(scrape_data.url)
+        result = await engine.scrape(scrape_data.url, scrape_data.cache_policy, scrape_data.respect_robots)
+        content = result['content']
         
         if content:
             # Store the result
-            db.save_scraped_data(session_id, scrape_data.url, content, title=scrape_data.url)
+            await asyncio.to_thread(db.save_scraped_data, session_id, scrape_data.url, content, title=scrape_data.url)
             
             # Mark session as completed
-            db.complete_session(session_id)
+            await asyncio.to_thread(db.complete_session, session_id)
             
             # Calculate metrics
             word_count = len(content.split()) if content else 0
             char_count = len(content) if content else 0
             line_count = len(content.splitlines()) if content else 0
             
-            return JSONResponse({
+            return FastJSONResponse({
                 "success": True,
                 "session_id": session_id,
                 "content": content,
                 "url": scrape_data.url,
+                "from_cache": result['from_cache'],
                 "metrics": {
                     "word_count": word_count,
                     "char_count": char_count,
@@ -179,93 +267,476 @@ async def scrape_single_url(request: Request, scrape_data: ScrapeRequest, user =
                 }
             })
         else:
-            db.save_scraped_data(session_id, scrape_data.url, "", title=scrape_data.url, status="failed", error_message="Failed to extract content")
-            db.complete_session(session_id)
-            return JSONResponse({
+            await asyncio.to_thread(db.save_scraped_data, session_id, scrape_data.url, "", title=scrape_data.url, status="failed", error_message=result['error'] or "Failed to extract content")
+            await asyncio.to_thread(db.complete_session, session_id)
+            if result['blocked']:
+                return FastJSONResponse({
+                    "success": False,
+                    "error": "Scraping this URL is disallowed by robots.txt"
+                }, status_code=403)
+            return FastJSONResponse({
                 "success": False,
                 "error": "Failed to extract content from URL"
             }, status_code=400)
             
     except Exception as e:
-        return JSONResponse({
+        return FastJSONResponse({
             "success": False,
             "error": f"Scraping failed: {str(e)}"
         }, status_code=500)
 
-@app.post("/api/scrape/batch")
+@app.post("/api/scrape/batch", status_code=202)
 async def scrape_batch_urls(request: Request, batch_data: ScrapeBatchRequest, user = Depends(require_auth)):
-    """API endpoint for batch URL scraping"""
+    """Queue a batch scrape as a background job and return its id right away.
+
+    Poll /api/jobs/{session_id} for progress and /api/session/{session_id}/items
+    for the results saved so far. With `Accept: application/x-ndjson` the batch
+    is scraped within the request instead and every result is streamed as one
+    JSON line as soon as it completes (see stream_batch).
+
+    URLs are canonicalized and deduplicated first; `url_aliases` maps each
+    submitted URL that was rewritten to the URL actually scraped.
+    """
+    urls, aliases = await asyncio.to_thread(get_canonicalizer().dedupe, batch_data.urls)
+    if not urls:
+        raise HTTPException(status_code=400, detail="No URLs given")
+    intake = {
+        "total_urls": len(urls),
+        "duplicates": sum(1 for url in batch_data.urls if url.strip()) - len(urls),
+        "url_aliases": aliases,
+    }
+    
+    if NDJSON_MEDIA_TYPE in request.headers.get("accept", ""):
+        from fastapi.responses import StreamingResponse
+        session_id = await asyncio.to_thread(db.create_session, f"Batch: {len(urls)} URLs", len(urls))
+        await asyncio.to_thread(db.save_url_aliases, session_id, aliases)
+        return StreamingResponse(stream_batch(session_id, urls, batch_data, intake), media_type=NDJSON_MEDIA_TYPE)
+    
     try:
-        # Start scraping session
-        session_id = db.create_session(f"Batch: {len(batch_data.urls)} URLs", len(batch_data.urls))
-        results = []
-        
-        for url in batch_data.urls:
-            try:
-                content = get_website_text_content(url)
-                if content:
-                    db.save_scraped_data(session_id, url, content, title=url)
-                    results.append({
-                        "url": url,
-                        "success": True,
-                        "word_count": len(content.split()),
-                        "char_count": len(content)
-                    })
+        session_id = await jobs.submit(f"Batch: {len(urls)} URLs", urls, {
+            "cache_policy": batch_data.cache_policy,
+            "respect_robots": batch_data.respect_robots,
+        }, aliases)
+    except Exception as e:
+        return FastJSONResponse({
+            "success": False,
+            "error": f"Batch scraping failed: {str(e)}"
+        }, status_code=500)
+    
+    return FastJSONResponse({
+        "success": True,
+        "session_id": session_id,
+        "job_id": session_id,
+        "status": "queued",
+        **intake
+    }, status_code=202)
+
+async def stream_batch(session_id: int, urls: list[str], batch_data: ScrapeBatchRequest, intake: dict):
+    """NDJSON lines for a batch scraped in completion order.
+
+    A `session` line comes first (with the intake counts and URL aliases),
+    then one `result` line per URL (content included) and a closing `summary`
+    line. Results are saved in bulk as they stream, nothing is collected in
+    memory; if the client goes away the session is kept, marked cancelled,
+    with the results written so far (marked failed if the scrape itself failed).
+    """
+    writer = db.bulk_writer(session_id, auto_flush=False)
+    total = successful = 0
+    finished = False
+    error = None
+    
+    yield dumps({"type": "session", "session_id": session_id, **intake}) + b"\n"
+    try:
+        async with aclosing(engine.run(urls, batch_data.cache_policy, batch_data.respect_robots)) as results:
+            async for result in results:
+                total += 1
+                if result['success']:
+                    successful += 1
+                    writer.add(result['url'], result['content'], title=result['url'])
                 else:
-                    db.save_scraped_data(session_id, url, "", title=url, status="failed", error_message="No content extracted")
-                    results.append({
-                        "url": url,
-                        "success": False,
-                        "error": "No content extracted"
-                    })
-            except Exception as e:
-                db.save_scraped_data(session_id, url, "", title=url, status="failed", error_message=str(e))
-                results.append({
-                    "url": url,
-                    "success": False,
-                    "error": str(e)
-                })
-        
-        # Mark session as completed
-        db.complete_session(session_id)
+                    writer.add(result['url'], "", title=result['url'], status="failed", error_message=result['error'])
+                
+                yield dumps({
+                    "type": "result",
+                    "url": result['url'],
+                    "success": result['success'],
+                    "content": result['content'],
+                    "word_count": result['word_count'],
+                    "char_count": result['char_count'],
+                    "from_cache": result['from_cache'],
+                    "error": result['error'],
+                    "elapsed": result['elapsed']
+                }) + b"\n"
+                
+                if writer.is_due:
+                    await asyncio.to_thread(writer.flush)
         
-        return JSONResponse({
-            "success": True,
+        await asyncio.to_thread(writer.flush)
+        await asyncio.to_thread(db.complete_session, session_id)
+        finished = True
+        yield dumps({
+            "type": "summary",
             "session_id": session_id,
-            "results": results,
-            "total_urls": len(batch_data.urls),
-            "successful": len([r for r in results if r["success"]])
+            "total_urls": total,
+            "successful": successful
+        }) + b"\n"
+    except Exception as e:
+        # A disconnect arrives as GeneratorExit / CancelledError and is not caught here
+        error = str(e) or type(e).__name__
+        raise
+    finally:
+        if not finished:
+            # Client disconnected (or the scrape failed) midway. The response task is
+            # being cancelled, so any await here would be too: hand off to a thread
+            def abandon():
+                try:
+                    writer.flush()
+                except Exception:
+                    logger.exception(f"Could not save the last results of batch {session_id}")
+                try:
+                    if error is None:
+                        db.cancel_job(session_id)
+                    else:
+                        db.fail_session(session_id, error)
+                except Exception:
+                    logger.exception(f"Could not close batch {session_id}")
+            asyncio.get_running_loop().run_in_executor(None, abandon)
+
+@app.post("/api/scrape/sitemap", status_code=202)
+async def scrape_sitemap(sitemap_data: SitemapRequest, user = Depends(require_auth)):
+    """Queue a job scraping the pages listed in a site's sitemaps.
+
+    The job reads the sitemaps itself and starts scraping as soon as the first
+    URLs are found; total_urls grows while it runs. Follow it like a batch job.
+    """
+    if not sitemap_data.source.strip():
+        raise HTTPException(status_code=400, detail="No sitemap source given")
+    
+    try:
+        session_id = await jobs.submit(f"Sitemap: {sitemap_data.source.strip()}", [], {
+            "kind": "sitemap",
+            "sitemap": {
+                "source": sitemap_data.source.strip(),
+                "lastmod_since": sitemap_data.lastmod_since.isoformat() if sitemap_data.lastmod_since else None,
+                "include": sitemap_data.include,
+                "exclude": sitemap_data.exclude,
+                "max_urls": sitemap_data.max_urls,
+            },
+            "cache_policy": sitemap_data.cache_policy,
+            "respect_robots": sitemap_data.respect_robots,
         })
-        
     except Exception as e:
-        return JSONResponse({
+        return FastJSONResponse({
             "success": False,
-            "error": f"Batch scraping failed: {str(e)}"
+            "error": f"Sitemap scraping failed: {str(e)}"
         }, status_code=500)
+    
+    return FastJSONResponse({
+        "success": True,
+        "session_id": session_id,
+        "job_id": session_id,
+        "status": "queued"
+    }, status_code=202)
+
+@app.post("/api/sitemap/preview")
+async def preview_sitemap(sitemap_data: SitemapRequest, limit: int = 100, user = Depends(require_auth)):
+    """First URLs a sitemap job with these settings would scrape"""
+    limit = max(1, min(limit, 1000))
+    if sitemap_data.max_urls:
+        limit = min(limit, sitemap_data.max_urls)
+    
+    reader = SitemapReader(engine, respect_robots=sitemap_data.respect_robots)
+    urls = reader.urls(sitemap_data.source, SitemapFilter(sitemap_data.lastmod_since, sitemap_data.include,
+                                                          sitemap_data.exclude))
+    found = []
+    try:
+        async with aclosing(urls):
+            async for entry in urls:
+                found.append(entry)
+                if len(found) >= limit:
+                    break
+    except Exception as e:
+        return FastJSONResponse({"success": False, "error": str(e) or type(e).__name__}, status_code=502)
+    
+    return {
+        "success": True,
+        "urls": found,
+        "sitemaps_read": reader.sitemaps_read,
+        "errors": [{"sitemap": url, "error": error} for url, error in reader.errors],
+    }
+
+@app.post("/api/crawl", status_code=202)
+async def start_crawl(crawl_data: CrawlRequest, user = Depends(require_auth)):
+    """Queue a crawl following links from the seed URLs.
+
+    Pages are scraped breadth-first up to max_depth links from a seed and
+    max_pages pages in total; total_urls grows as links are found. Follow it
+    like a batch job.
+    """
+    seeds, _ = await asyncio.to_thread(get_canonicalizer().dedupe, crawl_data.seeds)
+    if not seeds:
+        raise HTTPException(status_code=400, detail="No seed URLs given")
+    if (crawl_data.max_depth is not None and crawl_data.max_depth < 0) or \
+            (crawl_data.max_pages is not None and crawl_data.max_pages < 1):
+        raise HTTPException(status_code=400, detail="max_depth must be >= 0 and max_pages >= 1")
+    
+    settings = crawl_settings(seeds, crawl_data.max_depth, crawl_data.max_pages, crawl_data.scope,
+                              crawl_data.path_prefixes, crawl_data.exclude)
+    try:
+        session_id = await jobs.submit_crawl(f"Crawl: {seeds[0]}", settings, {
+            "respect_robots": crawl_data.respect_robots,
+        })
+    except Exception as e:
+        return FastJSONResponse({
+            "success": False,
+            "error": f"Crawl failed: {str(e)}"
+        }, status_code=500)
+    
+    return FastJSONResponse({
+        "success": True,
+        "session_id": session_id,
+        "job_id": session_id,
+        "status": "queued",
+        "crawl": settings,
+    }, status_code=202)
+
+@app.get("/api/jobs/{session_id}/frontier")
+async def get_crawl_frontier(session_id: int, user = Depends(require_auth)):
+    """Pages of a running crawl still queued, being scraped and done, by link depth"""
+    stats = await asyncio.to_thread(db.get_frontier_stats, session_id)
+    return {"session_id": session_id, "frontier": stats}
+
+@app.get("/api/jobs/{session_id}")
+async def get_job_status(session_id: int, user = Depends(require_auth)):
+    """Status and progress of a batch job"""
+    summary = await asyncio.to_thread(db.get_session_summary, session_id)
+    if not summary:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    job = summary['session']
+    return FastJSONResponse({
+        "success": True,
+        "job": {
+            **job,
+            "processed": summary['stats']['items'],
+            "successful": summary['stats']['successful'],
+            "failed": summary['stats']['failed'],
+            "finished": job['status'] in FINISHED_STATUSES,
+        }
+    })
+
+@app.post("/api/jobs/{session_id}/cancel")
+async def cancel_job(session_id: int, user = Depends(require_auth)):
+    """Cancel a queued or running batch job; results saved so far are kept"""
+    job_status = await jobs.cancel(session_id)
+    if job_status is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job_status != 'cancelled':
+        return FastJSONResponse({
+            "success": False,
+            "error": f"Job already {job_status}"
+        }, status_code=409)
+    return {"success": True, "session_id": session_id, "status": job_status}
+
+def sse_event(event: str, data: dict) -> str:
+    """One Server-Sent Events message"""
+    return f"event: {event}\ndata: {dumps(data).decode()}\n\n"
+
+def job_snapshot(summary: dict) -> dict:
+    """Progress event payload from a session summary"""
+    session = summary['session']
+    return {
+        "session_id": session['id'],
+        "status": session['status'],
+        "total_urls": session['total_urls'],
+        "processed": summary['stats']['items'],
+        "successful": summary['stats']['successful'],
+        "failed": summary['stats']['failed'],
+    }
+
+@app.post("/api/session/{session_id}/events/token")
+async def session_events_token(session_id: int, user = Depends(require_auth)):
+    """Issue a short-lived token for opening this session's event stream as `?token=`"""
+    if not await asyncio.to_thread(db.get_session_summary, session_id):
+        raise HTTPException(status_code=404, detail="Session not found")
+    
+    token = await asyncio.to_thread(tokens.issue, {
+        "username": user["username"],
+        "scope": stream_scope(session_id),
+    }, timedelta(seconds=STREAM_TOKEN_SECONDS))
+    return {"token": token, "expires_in": STREAM_TOKEN_SECONDS}
+
+@app.get("/api/session/{session_id}/events")
+async def session_events(request: Request, session_id: int, user = Depends(require_stream_auth)):
+    """Live progress of a session as Server-Sent Events.
+
+    Starts with a `status` snapshot, then pushes a `result` event per finished
+    URL (with timings, word counts and running totals) and a `status` event
+    on every status change, straight from the job workers. The stream ends
+    once the job is completed, cancelled or failed.
+    """
+    from fastapi.responses import StreamingResponse
+    
+    if not await asyncio.to_thread(db.get_session_summary, session_id):
+        raise HTTPException(status_code=404, detail="Session not found")
+    
+    async def stream():
+        with get_progress_broker().subscribe(session_id) as queue:
+            # Snapshot taken after subscribing, so no event falls in between
+            summary = await asyncio.to_thread(db.get_session_summary, session_id)
+            yield sse_event("status", job_snapshot(summary))
+            if summary['session']['status'] in FINISHED_STATUSES:
+                return
+            
+            while True:
+                try:
+                    event, data = await asyncio.wait_for(queue.get(), SSE_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        return
+                    # Quiet stream: the job may be running in another API process, so
+                    # look at its status once per keepalive
+                    summary = await asyncio.to_thread(db.get_session_summary, session_id)
+                    if not summary or summary['session']['status'] in FINISHED_STATUSES:
+                        if summary:
+                            yield sse_event("status", job_snapshot(summary))
+                        return
+                    yield ": keepalive\n\n"
+                    continue
+                
+                yield sse_event(event, data)
+                if event == "status" and data['status'] in FINISHED_STATUSES:
+                    return
+    
+    return StreamingResponse(stream(), media_type="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",
+    })
 
 @app.get("/api/session/{session_id}")
-async def get_session_data(session_id: int, user = Depends(require_auth)):
-    """Get session data"""
+async def get_session_data(session_id: int, limit: int = 100, preview: int = 0, user = Depends(require_auth)):
+    """Get session metadata and the first page of its items (content is loaded per item)"""
     try:
-        session_data = db.get_session_data(session_id)
-        if session_data:
-            return JSONResponse(serialize(session_data))
-        else:
-            return JSONResponse({"error": "Session not found"}, status_code=404)
+        summary = await asyncio.to_thread(db.get_session_summary, session_id)
+        if not summary:
+            return FastJSONResponse({"error": "Session not found"}, status_code=404)
+        
+        page = await asyncio.to_thread(db.get_session_items, session_id, max(1, min(limit, 1000)), None, max(preview, 0))
+        return FastJSONResponse({
+            "session": summary['session'],
+            "stats": summary['stats'],
+            "data": page['items'],
+            "next_cursor": page['next_cursor']
+        })
     except Exception as e:
-        return JSONResponse({"error": str(e)}, status_code=500)
+        return FastJSONResponse({"error": str(e)}, status_code=500)
+
+@app.get("/api/session/{session_id}/items")
+async def get_session_items(session_id: int, limit: int = 100, cursor: Optional[str] = None,
+                            preview: int = 0, user = Depends(require_auth)):
+    """Get a page of session items without their content"""
+    try:
+        page = await asyncio.to_thread(db.get_session_items, session_id, max(1, min(limit, 1000)), cursor, max(preview, 0))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return FastJSONResponse(page)
+
+@app.get("/api/session/{session_id}/url-aliases")
+async def get_session_url_aliases(session_id: int, url: Optional[str] = None, user = Depends(require_auth)):
+    """Submitted URLs that were scraped under a canonical URL (optionally only those mapping to `url`)"""
+    aliases = await asyncio.to_thread(db.get_url_aliases, session_id, url)
+    return {"session_id": session_id, "url_aliases": aliases}
+
+@app.get("/api/session/{session_id}/items/{item_id}/content")
+async def get_item_content(session_id: int, item_id: int, offset: int = 0, length: Optional[int] = None,
+                           user = Depends(require_auth)):
+    """Get the content of a single item; `offset`/`length` select a character range"""
+    if offset < 0 or (length is not None and length < 0):
+        raise HTTPException(status_code=400, detail="offset and length must be non-negative")
+    
+    item = await asyncio.to_thread(db.get_item_content, session_id, item_id, offset, length)
+    if not item:
+        raise HTTPException(status_code=404, detail="Item not found")
+    return item
 
 @app.post("/api/logout")
 async def logout(request: Request):
     """Logout endpoint"""
     auth_header = request.headers.get("Authorization")
     if auth_header and auth_header.startswith("Bearer "):
-        token = auth_header.replace("Bearer ", "")
-        if token in sessions:
-            del sessions[token]
+        await asyncio.to_thread(tokens.revoke, auth_header.replace("Bearer ", ""))
     
     return {"success": True, "message": "Logged out successfully"}
 
+@app.get("/api/db/pool")
+async def database_pool_stats(user = Depends(require_auth)):
+    """Database connection pool usage statistics"""
+    return db.pool_stats()
+
+@app.get("/api/extraction/pool")
+async def extraction_pool_stats(user = Depends(require_auth)):
+    """Extraction worker pool load and counters"""
+    return get_extraction_pool().stats()
+
+@app.get("/api/politeness")
+async def politeness_stats(user = Depends(require_auth)):
+    """Per-origin pacing and backoff state"""
+    return get_politeness().stats()
+
+@app.get("/api/scrape/coalescing")
+async def coalescing_stats(user = Depends(require_auth)):
+    """Scrapes in flight and how many calls shared one"""
+    return engine.stats()
+
+@app.get("/api/robots")
+async def robots_stats(user = Depends(require_auth)):
+    """robots.txt cache counters"""
+    return get_robots().stats()
+
+@app.on_event("startup")
+async def migrate_content():
+    """Move pre-blob-store page text into content_blobs, then (re)compress it, in the background"""
+    async def run():
+        try:
+            migrated = await asyncio.to_thread(db.migrate_legacy_content)
+            if migrated:
+                logger.info(f"Migrated content of {migrated} scraped rows to the blob store")
+            compressed = await asyncio.to_thread(db.compress_existing_content)
+            if compressed:
+                logger.info(f"Compressed {compressed} stored pages")
+        except Exception:
+            logger.exception("Content migration failed")
+    
+    app.state.content_migration = asyncio.create_task(run())
+
+@app.on_event("startup")
+async def sweep_tokens():
+    """Periodically delete expired login tokens"""
+    async def run():
+        while True:
+            try:
+                await asyncio.to_thread(tokens.sweep)
+            except Exception:
+                logger.exception("Token sweep failed")
+            await asyncio.sleep(TOKEN_SWEEP_INTERVAL)
+    
+    app.state.token_sweeper = asyncio.create_task(run())
+
+@app.on_event("startup")
+async def start_jobs():
+    """Start the batch job workers; queued and interrupted jobs are picked up"""
+    await jobs.start()
+
+@app.on_event("shutdown")
+async def shutdown_engine():
+    """Release pooled HTTP and database connections and extraction workers on shutdown"""
+    # Running jobs go back to the queue before their HTTP client closes
+    await jobs.stop()
+    app.state.token_sweeper.cancel()
+    await engine.aclose()
+    get_extraction_pool().shutdown()
+    db.close()
+
 # Health check
 @app.get("/health")
 async def health_check():
@@ -273,83 +744,59 @@ async def health_check():
     return {"status": "healthy", "timestamp": datetime.now().isoformat()}
 
 @app.get("/api/session/{session_id}/export/csv")
-async def export_csv(session_id: int, user = Depends(require_auth)):
-    """Export session data as CSV"""
+async def export_csv(session_id: int, columns: Optional[str] = None, gzip: bool = False,
+                     user = Depends(require_auth)):
+    """Export session data as CSV, streamed straight from the database.
+
+    `columns` is an optional comma-separated selection (e.g. `url,title,content`)
+    and `gzip=true` compresses the stream on the fly.
+    """
     from fastapi.responses import StreamingResponse
-    import io
-    import csv
     
     try:
-        session_data = db.get_session_data(session_id)
-        if not session_data:
-            raise HTTPException(status_code=404, detail="Session not found")
-        
-        output = io.StringIO()
-        writer = csv.writer(output)
-        
-        # Write header
-        writer.writerow(['URL', 'Title', 'Word Count', 'Char Count', 'Scraped At', 'Status'])
-        
-        # Write data
-        for item in session_data['data']:
-            writer.writerow([
-                item['url'],
-                item['title'] or '',
-                item['word_count'],
-                item['char_count'],
-                item['scraped_at'],
-                item['status']
-            ])
-        
-        output.seek(0)
-        return StreamingResponse(
-            iter([output.getvalue()]),
-            media_type="text/csv",
-            headers={"Content-Disposition": f"attachment; filename=session_{session_id}.csv"}
-        )
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        selected = parse_columns(columns, DEFAULT_CSV_COLUMNS)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    if not await asyncio.to_thread(db.get_session_summary, session_id):
+        raise HTTPException(status_code=404, detail="Session not found")
+    
+    filename = f"session_{session_id}.csv"
+    media_type = "text/csv"
+    if gzip:
+        filename += ".gz"
+        media_type = "application/gzip"
+    
+    return StreamingResponse(
+        iter_csv(db.iter_session_rows(session_id, selected), selected, gzip=gzip),
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
 
 @app.get("/api/session/{session_id}/export/excel")
-async def export_excel(session_id: int, user = Depends(require_auth)):
-    """Export session data as Excel"""
+async def export_excel(session_id: int, columns: Optional[str] = None, user = Depends(require_auth)):
+    """Export session data as Excel, built in write-only mode from a database stream"""
     from fastapi.responses import StreamingResponse
-    import io
-    import pandas as pd
     
     try:
-        session_data = db.get_session_data(session_id)
-        if not session_data:
-            raise HTTPException(status_code=404, detail="Session not found")
-        
-        # Create DataFrame
-        df_data = []
-        for item in session_data['data']:
-            df_data.append({
-                'URL': item['url'],
-                'Title': item['title'] or '',
-                'Content Preview': item['content'][:200] if item['content'] else '',
-                'Word Count': item['word_count'],
-                'Char Count': item['char_count'],
-                'Scraped At': item['scraped_at'],
-                'Status': item['status']
-            })
-        
-        df = pd.DataFrame(df_data)
-        
-        # Create Excel file in memory
-        output = io.BytesIO()
-        with pd.ExcelWriter(output, engine='openpyxl') as writer:
-            df.to_excel(writer, index=False, sheet_name='Scraped Data')
-        
-        output.seek(0)
-        return StreamingResponse(
-            iter([output.getvalue()]),
-            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            headers={"Content-Disposition": f"attachment; filename=session_{session_id}.xlsx"}
-        )
+        selected = parse_columns(columns, DEFAULT_EXCEL_COLUMNS)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    if not await asyncio.to_thread(db.get_session_summary, session_id):
+        raise HTTPException(status_code=404, detail="Session not found")
+    
+    try:
+        headers = [COLUMN_LABELS[column] for column in selected]
+        output = await asyncio.to_thread(write_xlsx, db.iter_session_rows(session_id, selected), headers)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    
+    return StreamingResponse(
+        iter_file(output),
+        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        headers={"Content-Disposition": f"attachment; filename=session_{session_id}.xlsx"}
+    )
 
 @app.get("/api/session/{session_id}/export/pdf")
 async def export_pdf(session_id: int, user = Depends(require_auth)):
@@ -362,11 +809,11 @@ async def export_pdf(session_id: int, user = Depends(require_auth)):
     from reportlab.lib.units import inch
     import io
     
-    try:
-        session_data = db.get_session_data(session_id)
-        if not session_data:
-            raise HTTPException(status_code=404, detail="Session not found")
-        
+    summary = await asyncio.to_thread(db.get_session_summary, session_id)
+    if not summary:
+        raise HTTPException(status_code=404, detail="Session not found")
+    
+    def build_pdf() -> bytes:
         buffer = io.BytesIO()
         doc = SimpleDocTemplate(buffer, pagesize=letter)
         elements = []
@@ -384,7 +831,7 @@ async def export_pdf(session_id: int, user = Depends(require_auth)):
         elements.append(Spacer(1, 12))
         
         # Session info
-        session_info = session_data['session']
+        session_info = summary['session']
         info_data = [
             ['Session Name:', session_info['name']],
             ['Created:', str(session_info['created_at'])],
@@ -410,7 +857,7 @@ async def export_pdf(session_id: int, user = Depends(require_auth)):
         elements.append(Spacer(1, 12))
         
         table_data = [['URL', 'Words', 'Chars', 'Status']]
-        for item in session_data['data']:
+        for item in db.iter_session_items(session_id):
             url_text = item['url'][:50] + '...' if len(item['url']) > 50 else item['url']
             table_data.append([
                 url_text,
@@ -433,21 +880,25 @@ async def export_pdf(session_id: int, user = Depends(require_auth)):
         elements.append(data_table)
         
         doc.build(elements)
-        buffer.seek(0)
-        
-        return StreamingResponse(
-            iter([buffer.getvalue()]),
-            media_type="application/pdf",
-            headers={"Content-Disposition": f"attachment; filename=session_{session_id}.pdf"}
-        )
+        return buffer.getvalue()
+    
+    try:
+        # Reading every item and laying out the document both block
+        pdf = await asyncio.to_thread(build_pdf)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    
+    return StreamingResponse(
+        iter([pdf]),
+        media_type="application/pdf",
+        headers={"Content-Disposition": f"attachment; filename=session_{session_id}.pdf"}
+    )
 
 @app.delete("/api/session/{session_id}")
 async def delete_session(session_id: int, user = Depends(require_auth)):
     """Delete a session"""
     try:
-        db.delete_session(session_id)
+        await asyncio.to_thread(db.delete_session, session_id)
         return {"success": True, "message": "Session deleted successfully"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,311 @@
+"""
+Per-host politeness scheduler
+Paces requests to each origin with a token bucket, caps how many requests
+are in flight per origin, honors robots.txt Crawl-delay and backs off when a
+site answers 429/503 (respecting Retry-After), so high global concurrency
+never turns into hammering one site. Every scrape path (async engine, sync
+scraper, Streamlit fetches) goes through the shared instance.
+"""
+
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+from robots import get_robots
+
+# Responses that mean "slow down"
+THROTTLE_STATUSES = (429, 503)
+
+# Backoff never slows a host by more than this factor, and recovers gradually
+MAX_PENALTY = 32.0
+PENALTY_RECOVERY = 0.9
+
+# How often an origin's Crawl-delay is re-read from the robots service
+CRAWL_DELAY_RECHECK = 300
+
+
+def origin_of(url: str) -> str:
+    """scheme://host[:port] of a URL, the unit politeness is tracked by"""
+    parsed = urlparse(url)
+    return f"{parsed.scheme.lower()}://{parsed.netloc.lower()}"
+
+
+def retry_after_seconds(headers) -> float:
+    """Seconds requested by a Retry-After header (delta or HTTP date), or None"""
+    value = (headers or {}).get('retry-after')
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+def robots_crawl_delay(origin: str) -> float:
+    """Crawl-delay from the shared robots.txt service"""
+    return get_robots().crawl_delay(origin)
+
+
+class _HostState:
+    """Pacing state of one origin"""
+
+    __slots__ = ('tat', 'blocked_until', 'penalty', 'crawl_delay', 'crawl_delay_expires',
+                 'in_flight', 'waiters', 'users')
+
+    def __init__(self):
+        self.tat = 0.0              # theoretical arrival time of the next request (GCRA)
+        self.blocked_until = 0.0    # no requests before this (Retry-After / backoff)
+        self.penalty = 1.0          # adaptive slow-down factor
+        self.crawl_delay = None
+        self.crawl_delay_expires = 0.0
+        # One in-flight cap shared by coroutines and threads; waiters are
+        # (loop, future) for coroutines and (None, threading.Event) for threads
+        self.in_flight = 0
+        self.waiters = deque()
+        self.users = 0
+
+
+def _wake(waiter: asyncio.Future):
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+class PolitenessScheduler:
+    """Token-bucket pacing, in-flight caps and adaptive backoff per origin"""
+
+    def __init__(self, rate: float = None, burst: int = None, max_in_flight: int = None,
+                 max_crawl_delay: float = None, max_retries: int = None,
+                 crawl_delay_provider=robots_crawl_delay, clock=time.monotonic):
+        # Requests per second allowed to one origin, and how many may go back to back
+        self.rate = rate or float(os.environ.get('POLITENESS_RATE', 2.0))
+        self.burst = burst or int(os.environ.get('POLITENESS_BURST', 2))
+        self.max_in_flight = max_in_flight or int(os.environ.get('POLITENESS_MAX_IN_FLIGHT', 4))
+        # Sites asking for absurd Crawl-delays are capped rather than stalling a batch
+        self.max_crawl_delay = max_crawl_delay or float(os.environ.get('POLITENESS_MAX_CRAWL_DELAY', 30))
+        # Throttled requests are retried after the requested pause, if it is not too long
+        self.max_retries = max_retries if max_retries is not None else int(os.environ.get('POLITENESS_MAX_RETRIES', 2))
+        self.max_retry_wait = float(os.environ.get('POLITENESS_MAX_RETRY_WAIT', 60))
+        self.crawl_delay_provider = crawl_delay_provider
+        self._clock = clock
+
+        self._lock = threading.Lock()
+        self._hosts = {}
+
+    def _state(self, origin: str) -> _HostState:
+        state = self._hosts.get(origin)
+        if state is None:
+            state = self._hosts[origin] = _HostState()
+        return state
+
+    def _acquire_state(self, origin: str) -> _HostState:
+        with self._lock:
+            state = self._state(origin)
+            state.users += 1
+            return state
+
+    def _release_state(self, origin: str, state: _HostState):
+        """Forget idle origins that are not being paced or backed off any more"""
+        with self._lock:
+            state.users -= 1
+            now = self._clock()
+            if (state.users == 0 and state.penalty == 1.0 and state.tat <= now
+                    and state.blocked_until <= now and state.crawl_delay_expires <= now):
+                self._hosts.pop(origin, None)
+
+    def _enter(self, state: _HostState, waiter_factory):
+        """Take an in-flight slot, or queue a waiter (returned) that is handed one later"""
+        with self._lock:
+            if state.in_flight < self.max_in_flight and not state.waiters:
+                state.in_flight += 1
+                return None
+            entry = waiter_factory()
+            state.waiters.append(entry)
+            return entry
+
+    def _leave(self, state: _HostState):
+        """Give an in-flight slot back, passing it straight to the longest waiter if there is one"""
+        with self._lock:
+            if not state.waiters:
+                state.in_flight -= 1
+                return
+            loop, waiter = state.waiters.popleft()
+        if loop is None:
+            waiter.set()
+            return
+        try:
+            loop.call_soon_threadsafe(_wake, waiter)
+        except RuntimeError:
+            # That waiter's event loop is gone; try the next one
+            self._leave(state)
+
+    async def _enter_async(self, state: _HostState):
+        def waiter_factory():
+            loop = asyncio.get_running_loop()
+            return loop, loop.create_future()
+
+        entry = self._enter(state, waiter_factory)
+        if entry is None:
+            return
+        try:
+            await entry[1]
+        except asyncio.CancelledError:
+            with self._lock:
+                handed = entry not in state.waiters
+                if not handed:
+                    state.waiters.remove(entry)
+            # Cancelled after being handed the slot: pass it on
+            if handed:
+                self._leave(state)
+            raise
+
+    def _enter_sync(self, state: _HostState):
+        entry = self._enter(state, lambda: (None, threading.Event()))
+        if entry is not None:
+            entry[1].wait()
+
+    def crawl_delay(self, origin: str) -> float:
+        """Crawl-delay for an origin, re-read every CRAWL_DELAY_RECHECK seconds (may block on robots.txt)"""
+        with self._lock:
+            state = self._state(origin)
+        if state.crawl_delay_expires > self._clock() or self.crawl_delay_provider is None:
+            return state.crawl_delay
+
+        # The robots service coalesces concurrent downloads for one origin
+        try:
+            delay = self.crawl_delay_provider(origin)
+        except Exception:
+            delay = None
+        state.crawl_delay = min(delay, self.max_crawl_delay) if delay else None
+        state.crawl_delay_expires = self._clock() + CRAWL_DELAY_RECHECK
+        return state.crawl_delay
+
+    def reserve(self, origin: str) -> float:
+        """Book the next request slot for `origin`; returns how long to wait before sending"""
+        with self._lock:
+            state = self._state(origin)
+            now = self._clock()
+            interval = max(1.0 / self.rate, state.crawl_delay or 0.0) * state.penalty
+            # A Crawl-delay means strict spacing, no bursts
+            burst = 1 if state.crawl_delay else self.burst
+
+            tat = max(state.tat, now)
+            start = max(now, tat - (burst - 1) * interval, state.blocked_until)
+            state.tat = max(tat, start) + interval
+            return start - now
+
+    def record(self, url: str, status_code: int, headers=None):
+        """Feed a response back: throttling slows the origin down, successes speed it up again"""
+        with self._lock:
+            state = self._state(origin_of(url))
+            now = self._clock()
+            if status_code in THROTTLE_STATUSES:
+                state.penalty = min(state.penalty * 2, MAX_PENALTY)
+                wait = retry_after_seconds(headers)
+                if wait is None:
+                    wait = state.penalty / self.rate
+                state.blocked_until = max(state.blocked_until, now + wait)
+            elif status_code < 400:
+                state.penalty = max(1.0, state.penalty * PENALTY_RECOVERY)
+
+    def should_retry(self, attempt: int, status_code: int, headers=None) -> bool:
+        """Whether a throttled response is worth another (paced) attempt"""
+        if status_code not in THROTTLE_STATUSES or attempt >= self.max_retries:
+            return False
+        wait = retry_after_seconds(headers)
+        return wait is None or wait <= self.max_retry_wait
+
+    @asynccontextmanager
+    async def slot(self, url: str):
+        """Async: wait for an in-flight slot and the origin's pacing, then let the request go"""
+        origin = origin_of(url)
+        state = self._acquire_state(origin)
+        try:
+            await self._enter_async(state)
+            try:
+                if state.crawl_delay_expires <= self._clock():
+                    await asyncio.to_thread(self.crawl_delay, origin)
+                delay = self.reserve(origin)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                yield
+            finally:
+                self._leave(state)
+        finally:
+            self._release_state(origin, state)
+
+    @contextmanager
+    def slot_sync(self, url: str):
+        """Blocking variant of slot() for threads (scheduler, Streamlit)"""
+        origin = origin_of(url)
+        state = self._acquire_state(origin)
+        try:
+            self._enter_sync(state)
+            try:
+                self.crawl_delay(origin)
+                delay = self.reserve(origin)
+                if delay > 0:
+                    time.sleep(delay)
+                yield
+            finally:
+                self._leave(state)
+        finally:
+            self._release_state(origin, state)
+
+    async def request(self, url: str, send):
+        """Run `send()` (a coroutine factory returning an httpx response) politely, retrying throttled attempts"""
+        attempt = 0
+        while True:
+            async with self.slot(url):
+                response = await send()
+            self.record(url, response.status_code, response.headers)
+            if not self.should_retry(attempt, response.status_code, response.headers):
+                return response
+            attempt += 1
+
+    def request_sync(self, url: str, send):
+        """Blocking variant of request() for a plain `send()` callable"""
+        attempt = 0
+        while True:
+            with self.slot_sync(url):
+                response = send()
+            self.record(url, response.status_code, response.headers)
+            if not self.should_retry(attempt, response.status_code, response.headers):
+                return response
+            attempt += 1
+
+    def stats(self) -> dict:
+        """Origins currently tracked with their pacing state"""
+        now = self._clock()
+        with self._lock:
+            return {
+                origin: {
+                    'penalty': round(state.penalty, 2),
+                    'crawl_delay': state.crawl_delay,
+                    'blocked_for': round(max(state.blocked_until - now, 0.0), 2),
+                    'in_flight': state.in_flight,
+                    'in_use': state.users,
+                }
+                for origin, state in self._hosts.items()
+            }
+
+
+_scheduler_instance = None
+_scheduler_lock = threading.Lock()
+
+
+def get_politeness() -> PolitenessScheduler:
+    """Get or create the shared politeness scheduler"""
+    global _scheduler_instance
+    with _scheduler_lock:
+        if _scheduler_instance is None:
+            _scheduler_instance = PolitenessScheduler()
+    return _scheduler_instance
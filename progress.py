@@ -0,0 +1,61 @@
+"""
+In-process progress broker
+Job workers publish per-URL and status events for a session; API streams
+(Server-Sent Events) subscribe to them. Publishing never blocks a worker:
+every subscriber has a bounded queue and a subscriber that falls behind
+loses result events (each one carries the running totals, so the next one
+it gets is still accurate) but never a status change.
+"""
+
+import asyncio
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict
+
+
+class ProgressBroker:
+    """Fan-out of session events to the subscribers on this event loop"""
+
+    def __init__(self, queue_size: int = 1000):
+        self.queue_size = queue_size
+        self._subscribers = defaultdict(set)
+
+    def publish(self, session_id: int, event: str, data: Dict):
+        """Send an event to everyone following `session_id` (call from the event loop)"""
+        for queue in self._subscribers.get(session_id, ()):
+            if queue.full():
+                if event == 'result':
+                    continue
+                # Make room for a status change by dropping the oldest event
+                queue.get_nowait()
+            queue.put_nowait((event, data))
+
+    def has_subscribers(self, session_id: int) -> bool:
+        return bool(self._subscribers.get(session_id))
+
+    @contextmanager
+    def subscribe(self, session_id: int):
+        """Queue receiving (event, data) tuples for `session_id` while the block runs"""
+        queue = asyncio.Queue(self.queue_size)
+        self._subscribers[session_id].add(queue)
+        try:
+            yield queue
+        finally:
+            self._subscribers[session_id].discard(queue)
+            if not self._subscribers[session_id]:
+                del self._subscribers[session_id]
+
+    def stats(self) -> Dict:
+        """Subscribers per session"""
+        return {session_id: len(queues) for session_id, queues in self._subscribers.items()}
+
+
+_broker_instance = None
+
+
+def get_progress_broker() -> ProgressBroker:
+    """Get or create the shared progress broker (used from the event loop only)"""
+    global _broker_instance
+    if _broker_instance is None:
+        _broker_instance = ProgressBroker()
+    return _broker_instance
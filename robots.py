@@ -0,0 +1,196 @@
+"""
+Shared robots.txt service
+Downloads each origin's robots.txt once per TTL and answers can-fetch and
+Crawl-delay questions from a bounded in-process cache backed by SQLite, so
+the API, the Streamlit pages and the scheduler (separate processes) share
+what was fetched. Missing and unreachable robots.txt files are cached too,
+and concurrent lookups for one origin wait for a single download.
+"""
+
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlparse
+from urllib.robotparser import RobotFileParser
+
+import httpx
+
+# Lookup outcomes:
+#   ok          - robots.txt was downloaded and parsed
+#   missing     - 4xx (or a dangling redirect), no rules apply (everything allowed)
+#   unreachable - 5xx, timeout or network error; treated as allowed, retried sooner
+ROBOTS_STATUSES = ('ok', 'missing', 'unreachable')
+
+# Only the first 500 KiB of a robots.txt are parsed (RFC 9309)
+MAX_ROBOTS_BYTES = 500 * 1024
+
+
+def origin_of(url: str) -> str:
+    """scheme://host[:port] of a URL, the unit robots.txt applies to"""
+    parsed = urlparse(url)
+    return f"{parsed.scheme.lower()}://{parsed.netloc.lower()}"
+
+
+def _parse(status: str, body: str) -> RobotFileParser:
+    parser = RobotFileParser()
+    if status == 'ok':
+        parser.parse((body or '').splitlines())
+    else:
+        parser.allow_all = True
+    return parser
+
+
+class RobotsService:
+    """TTL-cached robots.txt rules per origin"""
+
+    def __init__(self, path: str = None, ttl: float = None, error_ttl: float = None,
+                 memory_entries: int = None, user_agent: str = None, timeout: float = 10.0,
+                 missing_ttl: float = None):
+        self.path = path or os.environ.get('ROBOTS_CACHE_PATH', '.robots_cache.sqlite')
+        self.ttl = ttl or float(os.environ.get('ROBOTS_TTL', 3600))
+        # Missing files (allow-all) are cached this long, by default the full TTL
+        self.missing_ttl = missing_ttl or float(os.environ.get('ROBOTS_MISSING_TTL', self.ttl))
+        # Failed downloads are retried after this long
+        self.error_ttl = error_ttl or float(os.environ.get('ROBOTS_ERROR_TTL', 300))
+        self.memory_entries = memory_entries or int(os.environ.get('ROBOTS_CACHE_SIZE', 1024))
+        # Product token matched against User-agent lines (falls back to the * group)
+        self.user_agent = user_agent or os.environ.get('ROBOTS_USER_AGENT', 'SmartWebScraper')
+        self.timeout = timeout
+
+        # origin -> {'status', 'parser', 'expires_at'}
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        # origin -> lock, so concurrent misses for one origin download robots.txt once
+        self._fetch_locks = {}
+        self._stats = {'hits': 0, 'misses': 0, 'downloads': 0}
+
+        self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS robots (
+                    origin TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    body TEXT,
+                    fetched_at REAL NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+            ''')
+
+    def _remember(self, origin: str, entry: dict):
+        self._memory[origin] = entry
+        self._memory.move_to_end(origin)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _cached(self, origin: str) -> dict:
+        """Unexpired entry from memory, or None (never blocks on the network)"""
+        with self._lock:
+            entry = self._memory.get(origin)
+            if entry is not None and entry['expires_at'] > time.time():
+                self._memory.move_to_end(origin)
+                self._stats['hits'] += 1
+                return entry
+        return None
+
+    def _load(self, origin: str) -> dict:
+        """Unexpired entry from the persistent tier, or None"""
+        with self._lock:
+            row = self._conn.execute('SELECT status, body, expires_at FROM robots WHERE origin = ?',
+                                     (origin,)).fetchone()
+        if row is None or row[2] <= time.time():
+            return None
+        return {'status': row[0], 'parser': _parse(row[0], row[1]), 'expires_at': row[2]}
+
+    def _download(self, origin: str):
+        """Fetch robots.txt; returns (status, body)"""
+        with self._lock:
+            self._stats['downloads'] += 1
+        try:
+            response = httpx.get(f"{origin}/robots.txt", timeout=self.timeout, follow_redirects=True,
+                                 headers={"User-Agent": self.user_agent})
+        except httpx.HTTPError:
+            return 'unreachable', None
+        if response.status_code >= 500:
+            return 'unreachable', None
+        if response.status_code >= 300:
+            return 'missing', None
+        return 'ok', response.content[:MAX_ROBOTS_BYTES].decode('utf-8', errors='replace')
+
+    def lookup(self, origin: str) -> dict:
+        """Rules for an origin, downloading robots.txt if nothing fresh is cached (blocking)"""
+        entry = self._cached(origin)
+        if entry is not None:
+            return entry
+
+        with self._lock:
+            self._stats['misses'] += 1
+            lock = self._fetch_locks.setdefault(origin, threading.Lock())
+        with lock:
+            # Whoever held the lock may have just fetched it
+            entry = self._cached(origin) or self._load(origin)
+            if entry is None:
+                status, body = self._download(origin)
+                now = time.time()
+                expires_at = now + {'ok': self.ttl, 'missing': self.missing_ttl, 'unreachable': self.error_ttl}[status]
+                entry = {'status': status, 'parser': _parse(status, body), 'expires_at': expires_at}
+                with self._lock, self._conn:
+                    self._conn.execute('''
+                        INSERT OR REPLACE INTO robots (origin, status, body, fetched_at, expires_at)
+                        VALUES (?, ?, ?, ?, ?)
+                    ''', (origin, status, body, now, expires_at))
+            with self._lock:
+                self._remember(origin, entry)
+                self._fetch_locks.pop(origin, None)
+        return entry
+
+    async def alookup(self, origin: str) -> dict:
+        """Async variant of lookup(); cache hits never leave the event loop"""
+        entry = self._cached(origin)
+        if entry is not None:
+            return entry
+        return await asyncio.to_thread(self.lookup, origin)
+
+    def can_fetch(self, url: str) -> bool:
+        """Whether robots.txt allows fetching `url`"""
+        return self.lookup(origin_of(url))['parser'].can_fetch(self.user_agent, url)
+
+    async def acan_fetch(self, url: str) -> bool:
+        """Async variant of can_fetch()"""
+        entry = await self.alookup(origin_of(url))
+        return entry['parser'].can_fetch(self.user_agent, url)
+
+    def check(self, url: str):
+        """(allowed, status) for `url`, status being one of ROBOTS_STATUSES"""
+        entry = self.lookup(origin_of(url))
+        return entry['parser'].can_fetch(self.user_agent, url), entry['status']
+
+    def crawl_delay(self, origin: str) -> float:
+        """Crawl-delay the origin asks of us, or None"""
+        delay = self.lookup(origin)['parser'].crawl_delay(self.user_agent)
+        return float(delay) if delay is not None else None
+
+    def sitemaps(self, origin: str) -> list:
+        """Sitemap URLs listed in the origin's robots.txt"""
+        return list(self.lookup(origin)['parser'].site_maps() or [])
+
+    def stats(self) -> dict:
+        """Cache counters"""
+        with self._lock:
+            return dict(self._stats, cached_origins=len(self._memory))
+
+
+_robots_instance = None
+_robots_lock = threading.Lock()
+
+
+def get_robots() -> RobotsService:
+    """Get or create the shared robots.txt service"""
+    global _robots_instance
+    with _robots_lock:
+        if _robots_instance is None:
+            _robots_instance = RobotsService()
+    return _robots_instance
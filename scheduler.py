@@ -6,10 +6,13 @@ from email.mime.multipart import MIMEMultipart
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
 from apscheduler.executors.pool import ThreadPoolExecutor
+from apscheduler.jobstores.base import JobLookupError
 import logging
 
-from database import ScrapingDatabase
+from database import get_database
 from web_scraper import get_website_text_content
+from robots import get_robots
+from url_canonical import get_canonicalizer
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -19,7 +22,8 @@ class WebScrapingScheduler:
     """Background scheduler for automated web scraping tasks"""
     
     def __init__(self):
-        self.db = ScrapingDatabase()
+        # Shared pooled database instance
+        self.db = get_database()
         
         # Configure job store and executor
         jobstores = {
@@ -48,19 +52,18 @@ class WebScrapingScheduler:
         """Create a new scheduled scraping task"""
         try:
             # Save task to database
-            conn = self.db._get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-                INSERT INTO scheduled_tasks 
-                (task_name, urls, schedule_type, schedule_value, email_notifications, email_address, is_active)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', (task_name, '\n'.join(urls), schedule_type, schedule_value, 
-                  email_notifications, email_address, True))
-            
-            task_id = cursor.lastrowid
-            conn.commit()
-            conn.close()
+            with self.db.connection() as conn:
+                cursor = conn.cursor()
+                
+                cursor.execute('''
+                    INSERT INTO scheduled_tasks 
+                    (task_name, urls, schedule_type, schedule_value, email_notifications, email_address, is_active)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s)
+                    RETURNING id
+                ''', (task_name, '\n'.join(urls), schedule_type, schedule_value, 
+                      email_notifications, email_address, True))
+                
+                task_id = cursor.fetchone()[0]
             
             # Schedule the job
             self._schedule_job(task_id, schedule_type, schedule_value)
@@ -146,66 +149,71 @@ class WebScrapingScheduler:
         
         try:
             # Get task details
-            conn = self.db._get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-                SELECT task_name, urls, email_notifications, email_address
-                FROM scheduled_tasks 
-                WHERE id = ? AND is_active = 1
-            ''', (task_id,))
-            
-            result = cursor.fetchone()
-            if not result:
-                logger.warning(f"Task {task_id} not found or inactive")
-                return
-            
-            task_name, urls_string, email_notifications, email_address = result
-            urls = [url.strip() for url in urls_string.split('\n') if url.strip()]
-            
-            # Update last run time
-            cursor.execute('''
-                UPDATE scheduled_tasks 
-                SET last_run = CURRENT_TIMESTAMP 
-                WHERE id = ?
-            ''', (task_id,))
-            conn.commit()
-            conn.close()
+            with self.db.connection() as conn:
+                cursor = conn.cursor()
+                
+                cursor.execute('''
+                    SELECT task_name, urls, email_notifications, email_address
+                    FROM scheduled_tasks 
+                    WHERE id = %s AND is_active = TRUE
+                ''', (task_id,))
+                
+                result = cursor.fetchone()
+                if not result:
+                    logger.warning(f"Task {task_id} not found or inactive")
+                    return
+                
+                task_name, urls_string, email_notifications, email_address = result
+                urls, url_aliases = get_canonicalizer().dedupe(urls_string.split('\n'))
+                
+                # Update last run time
+                cursor.execute('''
+                    UPDATE scheduled_tasks 
+                    SET last_run = CURRENT_TIMESTAMP 
+                    WHERE id = %s
+                ''', (task_id,))
             
             # Create scraping session
             session_name = f"Scheduled_{task_name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
             session_id = self.db.create_session(session_name, len(urls))
+            self.db.save_url_aliases(session_id, url_aliases)
             
             # Perform scraping
             successful_scrapes = 0
             failed_scrapes = 0
             scraped_data = []
             
-            for url in urls:
-                try:
-                    content = get_website_text_content(url)
-                    if content:
-                        title = url.split('/')[-1] if '/' in url else url
-                        self.db.save_scraped_data(session_id, url, content, title)
-                        successful_scrapes += 1
-                        scraped_data.append({
-                            'url': url,
-                            'title': title,
-                            'content': content[:200] + "..." if len(content) > 200 else content,
-                            'word_count': len(content.split())
-                        })
-                    else:
-                        self.db.save_scraped_data(session_id, url, "", "", "failed", "No content extracted")
+            # Results are buffered and written in bulk
+            with self.db.bulk_writer(session_id) as writer:
+                for url in urls:
+                    try:
+                        if not get_robots().can_fetch(url):
+                            writer.add(url, "", "", "failed", "Blocked by robots.txt")
+                            failed_scrapes += 1
+                            continue
+                        content = get_website_text_content(url)
+                        if content:
+                            title = url.split('/')[-1] if '/' in url else url
+                            writer.add(url, content, title)
+                            successful_scrapes += 1
+                            scraped_data.append({
+                                'url': url,
+                                'title': title,
+                                'content': content[:200] + "..." if len(content) > 200 else content,
+                                'word_count': len(content.split())
+                            })
+                        else:
+                            writer.add(url, "", "", "failed", "No content extracted")
+                            failed_scrapes += 1
+                            
+                    except Exception as e:
+                        error_msg = str(e)
+                        writer.add(url, "", "", "failed", error_msg)
                         failed_scrapes += 1
-                        
-                except Exception as e:
-                    error_msg = str(e)
-                    self.db.save_scraped_data(session_id, url, "", "", "failed", error_msg)
-                    failed_scrapes += 1
-                    logger.error(f"Error scraping {url}: {error_msg}")
+                        logger.error(f"Error scraping {url}: {error_msg}")
             
             # Update session status
-            self.db.update_session_progress(session_id, len(urls), 'completed')
+            self.db.complete_session(session_id)
             
             # Send email notification if configured
             if email_notifications and email_address:
@@ -292,11 +300,9 @@ class WebScrapingScheduler:
         """Pause a scheduled task"""
         try:
             # Update database
-            conn = self.db._get_connection()
-            cursor = conn.cursor()
-            cursor.execute('UPDATE scheduled_tasks SET is_active = 0 WHERE id = ?', (task_id,))
-            conn.commit()
-            conn.close()
+            with self.db.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute('UPDATE scheduled_tasks SET is_active = FALSE WHERE id = %s', (task_id,))
             
             # Remove from scheduler
             self.scheduler.remove_job(f'task_{task_id}')
@@ -309,29 +315,27 @@ class WebScrapingScheduler:
         """Resume a paused scheduled task"""
         try:
             # Get task details and re-schedule
-            conn = self.db._get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-                SELECT schedule_type, schedule_value
-                FROM scheduled_tasks 
-                WHERE id = ?
-            ''', (task_id,))
+            with self.db.connection() as conn:
+                cursor = conn.cursor()
+                
+                cursor.execute('''
+                    SELECT schedule_type, schedule_value
+                    FROM scheduled_tasks 
+                    WHERE id = %s
+                ''', (task_id,))
+                
+                result = cursor.fetchone()
+                if result:
+                    # Update database
+                    cursor.execute('UPDATE scheduled_tasks SET is_active = TRUE WHERE id = %s', (task_id,))
             
-            result = cursor.fetchone()
             if result:
                 schedule_type, schedule_value = result
                 
-                # Update database
-                cursor.execute('UPDATE scheduled_tasks SET is_active = 1 WHERE id = ?', (task_id,))
-                conn.commit()
-                
                 # Re-schedule job
                 self._schedule_job(task_id, schedule_type, schedule_value)
                 logger.info(f"Resumed task {task_id}")
             
-            conn.close()
-            
         except Exception as e:
             logger.error(f"Error resuming task {task_id}: {e}")
     
@@ -345,11 +349,9 @@ class WebScrapingScheduler:
                 pass  # Job might not exist
             
             # Remove from database
-            conn = self.db._get_connection()
-            cursor = conn.cursor()
-            cursor.execute('DELETE FROM scheduled_tasks WHERE id = ?', (task_id,))
-            conn.commit()
-            conn.close()
+            with self.db.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute('DELETE FROM scheduled_tasks WHERE id = %s', (task_id,))
             
             logger.info(f"Deleted task {task_id}")
             
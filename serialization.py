@@ -0,0 +1,31 @@
+"""
+Single-pass JSON serialization for the API
+orjson encodes datetimes (and dates, UUIDs, dataclasses) natively, so
+database rows go straight to bytes without converting them first.
+"""
+
+from decimal import Decimal
+
+import orjson
+from fastapi.responses import JSONResponse
+
+
+def _default(obj):
+    """Types orjson does not know natively"""
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(data) -> bytes:
+    """Encode `data` as JSON bytes in one pass"""
+    return orjson.dumps(data, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson (the API's default response class)"""
+
+    def render(self, content) -> bytes:
+        return dumps(content)
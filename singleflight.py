@@ -0,0 +1,92 @@
+"""
+Request coalescing (single-flight)
+Concurrent calls for the same key share one execution: the first caller runs
+the work and everyone who asks for the key while it is in flight gets the
+same result (or exception). Nothing is cached; once the call finishes the
+next request for the key starts a new one. Used in front of fetch + extract
+so a burst of requests for one page costs one download and one extraction.
+"""
+
+import asyncio
+import threading
+from typing import Awaitable, Callable, Dict, Hashable
+
+from url_canonical import canonicalize
+
+
+def flight_key(url: str, *options) -> tuple:
+    """Key for a scrape of `url`: its canonical form plus the options"""
+    return (canonicalize(url),) + options
+
+
+class SingleFlight:
+    """Coalesces concurrent coroutine calls by key (use from one event loop)"""
+
+    def __init__(self):
+        self._flights = {}
+        self.calls = 0
+        self.shared = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable]):
+        """Result of `fn()`, shared with every concurrent caller using `key`"""
+        self.calls += 1
+        task = self._flights.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._flights[key] = task
+            task.add_done_callback(lambda _: self._flights.pop(key, None))
+        else:
+            self.shared += 1
+        # A caller that goes away must not cancel the work for the others
+        return await asyncio.shield(task)
+
+    def stats(self) -> Dict:
+        return {'in_flight': len(self._flights), 'calls': self.calls, 'shared': self.shared}
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SyncSingleFlight:
+    """Coalesces concurrent blocking calls by key across threads"""
+
+    def __init__(self):
+        self._flights = {}
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.shared = 0
+
+    def do(self, key: Hashable, fn: Callable):
+        """Result of `fn()`, shared with every concurrent caller using `key`"""
+        with self._lock:
+            self.calls += 1
+            call = self._flights.get(key)
+            leader = call is None
+            if leader:
+                call = self._flights[key] = _Call()
+            else:
+                self.shared += 1
+
+        if not leader:
+            call.done.wait()
+        else:
+            try:
+                call.result = fn()
+            except BaseException as e:
+                call.error = e
+            finally:
+                with self._lock:
+                    del self._flights[key]
+                call.done.set()
+
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {'in_flight': len(self._flights), 'calls': self.calls, 'shared': self.shared}
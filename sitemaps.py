@@ -0,0 +1,213 @@
+"""
+Sitemap discovery
+Reads sitemaps (and sitemap indexes, recursively) as streams: the XML is
+parsed incrementally as it downloads, gzip-compressed files are inflated on
+the fly and every parsed element is discarded right away, so sitemaps with
+millions of entries are never held in memory. URLs come out one by one,
+filtered by lastmod and path patterns, ready to be queued for scraping.
+"""
+
+import asyncio
+import fnmatch
+import os
+import zlib
+from contextlib import aclosing
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import AsyncIterator, Dict, List, Optional
+from urllib.parse import urlsplit
+
+from lxml import etree
+
+from robots import get_robots, origin_of
+from url_canonical import canonicalize
+
+GZIP_MAGIC = b'\x1f\x8b'
+
+# Inflated gzip data is handed to the parser in pieces of at most this size
+MAX_FEED = 256 * 1024
+
+
+@lru_cache(maxsize=4096)
+def parse_lastmod(text: Optional[str]) -> Optional[datetime]:
+    """W3C datetime of a <lastmod> (any precision, from a year up) as an aware UTC datetime"""
+    if not text:
+        return None
+    text = text.strip()
+    try:
+        if len(text) == 4:
+            value = datetime(int(text), 1, 1)
+        elif len(text) == 7:
+            value = datetime(int(text[:4]), int(text[5:7]), 1)
+        else:
+            value = datetime.fromisoformat(text.replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+class SitemapFilter:
+    """Which sitemap entries to keep.
+
+    `since` keeps entries modified at or after it (entries without a lastmod
+    are kept, their age is unknown). `include` / `exclude` are shell-style
+    patterns matched against the URL path, e.g. /blog/*.
+    """
+
+    def __init__(self, since: datetime = None, include: List[str] = None, exclude: List[str] = None):
+        if since is not None and since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        self.since = since
+        self.include = include or []
+        self.exclude = exclude or []
+
+    def fresh(self, lastmod: Optional[datetime]) -> bool:
+        return self.since is None or lastmod is None or lastmod >= self.since
+
+    def matches(self, url: str, lastmod: Optional[datetime]) -> bool:
+        if not self.fresh(lastmod):
+            return False
+        if not self.include and not self.exclude:
+            return True
+        path = urlsplit(url).path or '/'
+        if self.include and not any(fnmatch.fnmatchcase(path, pattern) for pattern in self.include):
+            return False
+        return not any(fnmatch.fnmatchcase(path, pattern) for pattern in self.exclude)
+
+
+def _loc_and_lastmod(element) -> tuple:
+    """<loc> and <lastmod> text of an entry (a plain child walk, much cheaper than findtext)"""
+    loc = lastmod = None
+    for child in element:
+        tag = child.tag
+        if not isinstance(tag, str):
+            continue
+        if tag == 'loc' or tag.endswith('}loc'):
+            loc = (child.text or '').strip() or None
+        elif tag == 'lastmod' or tag.endswith('}lastmod'):
+            lastmod = (child.text or '').strip() or None
+    return loc, lastmod
+
+
+class SitemapReader:
+    """Streams the URLs of a site's sitemaps through the batch engine's HTTP client"""
+
+    def __init__(self, engine, max_depth: int = None, max_sitemaps: int = None, respect_robots: bool = True):
+        self.engine = engine
+        # Nesting of sitemap indexes followed, and sitemap files read per source
+        self.max_depth = max_depth or int(os.environ.get('SITEMAP_MAX_DEPTH', 3))
+        self.max_sitemaps = max_sitemaps or int(os.environ.get('SITEMAP_MAX_FILES', 10000))
+        self.respect_robots = respect_robots
+        self.sitemaps_read = 0
+        # (sitemap url, error) of sitemaps that could not be read
+        self.errors = []
+
+    async def sources(self, source: str) -> List[str]:
+        """Sitemaps to start from: `source` itself if it names a file, else the site's robots.txt
+        Sitemap lines, falling back to /sitemap.xml"""
+        source = source.strip()
+        if '://' not in source:
+            source = f'https://{source}'
+        parts = urlsplit(source)
+        if parts.path not in ('', '/') or parts.query:
+            return [source]
+
+        origin = origin_of(source)
+        return await asyncio.to_thread(get_robots().sitemaps, origin) or [f'{origin}/sitemap.xml']
+
+    async def _entries(self, url: str) -> AsyncIterator[List[tuple]]:
+        """Lists of ('url' | 'sitemap', loc, lastmod text), one per downloaded chunk of a sitemap file"""
+        # Only <url> and <sitemap> elements (in any namespace) are reported
+        parser = etree.XMLPullParser(events=('end',), tag=('{*}url', '{*}sitemap'), resolve_entities=False,
+                                     no_network=True, huge_tree=True, recover=True)
+        inflate = None
+
+        async with self.engine.stream(url) as response:
+            response.raise_for_status()
+            first = True
+            async for chunk in response.aiter_bytes():
+                if first:
+                    first = False
+                    # .xml.gz files are usually served as plain bytes, not Content-Encoding: gzip
+                    if chunk.startswith(GZIP_MAGIC):
+                        inflate = zlib.decompressobj(16 + zlib.MAX_WBITS)
+                if inflate is None:
+                    parser.feed(chunk)
+                    yield self._read_events(parser)
+                    continue
+                # Compressed chunks can inflate a hundredfold; parse them piece by piece
+                while True:
+                    data = inflate.decompress(chunk, MAX_FEED)
+                    parser.feed(data)
+                    yield self._read_events(parser)
+                    chunk = inflate.unconsumed_tail
+                    if not chunk and len(data) < MAX_FEED:
+                        break
+                    # Let other tasks run between pieces
+                    await asyncio.sleep(0)
+
+        if inflate is not None:
+            parser.feed(inflate.flush())
+            yield self._read_events(parser)
+        # Entries that only end here were closed by recovery: the file was cut
+        # off inside them and their <loc> may be incomplete, so they are dropped
+        parser.close()
+
+    @staticmethod
+    def _read_events(parser) -> List[tuple]:
+        entries = []
+        for _, element in parser.read_events():
+            kind = etree.QName(element).localname
+            loc, lastmod = _loc_and_lastmod(element)
+            # Drop the finished entry (and any siblings before it) so the tree stays empty
+            element.clear()
+            parent = element.getparent()
+            if parent is not None:
+                while element.getprevious() is not None:
+                    del parent[0]
+            if loc:
+                entries.append((kind, loc, lastmod))
+        return entries
+
+    async def urls(self, source: str, filter: SitemapFilter = None) -> AsyncIterator[Dict]:
+        """{'url', 'lastmod'} of every page listed under `source` that passes `filter`.
+
+        URLs come out canonicalized. An unreadable nested sitemap is recorded
+        in `errors` and skipped; if nothing at all could be read the last
+        error is raised.
+        """
+        filter = filter or SitemapFilter()
+        pending = [(url, 0) for url in reversed(await self.sources(source))]
+        seen = set()
+
+        while pending and self.sitemaps_read < self.max_sitemaps:
+            sitemap_url, depth = pending.pop()
+            if sitemap_url in seen:
+                continue
+            seen.add(sitemap_url)
+            if self.respect_robots and not await get_robots().acan_fetch(sitemap_url):
+                self.errors.append((sitemap_url, "Blocked by robots.txt"))
+                continue
+
+            children = []
+            try:
+                async with aclosing(self._entries(sitemap_url)) as entries:
+                    async for batch in entries:
+                        for kind, loc, lastmod in batch:
+                            modified = parse_lastmod(lastmod)
+                            if kind == 'sitemap':
+                                # A sitemap not modified since the cutoff holds no newer pages
+                                if depth < self.max_depth and filter.fresh(modified):
+                                    children.append(loc)
+                            elif filter.matches(loc, modified):
+                                yield {'url': canonicalize(loc), 'lastmod': modified}
+                self.sitemaps_read += 1
+            except Exception as e:
+                self.errors.append((sitemap_url, str(e) or type(e).__name__))
+                if not self.sitemaps_read and not pending:
+                    raise
+
+            # Children are read in document order, depth-first
+            pending.extend((child, depth + 1) for child in reversed(children))
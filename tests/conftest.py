@@ -0,0 +1,42 @@
+import os
+import uuid
+
+import psycopg2
+import pytest
+
+from database import ScrapingDatabase
+
+
+@pytest.fixture
+def pg_database(monkeypatch):
+    """A ScrapingDatabase in a throwaway schema of TEST_DATABASE_URL (skipped when unset)"""
+    url = os.environ.get('TEST_DATABASE_URL')
+    if not url:
+        pytest.skip("TEST_DATABASE_URL is not set")
+    schema = 'test_' + uuid.uuid4().hex[:12]
+    _execute(url, f'CREATE SCHEMA {schema}')
+    separator = '&' if '?' in url else '?'
+    monkeypatch.setenv('DATABASE_URL', f'{url}{separator}options=-csearch_path%3D{schema}')
+    monkeypatch.setenv('DB_POOL_MAX', '4')
+
+    def make(**env):
+        for key, value in env.items():
+            monkeypatch.setenv(key, value)
+        database = ScrapingDatabase()
+        databases.append(database)
+        return database
+
+    databases = []
+    yield make
+    for database in databases:
+        database.close()
+    _execute(url, f'DROP SCHEMA {schema} CASCADE')
+
+
+def _execute(url, statement):
+    conn = psycopg2.connect(url)
+    try:
+        with conn, conn.cursor() as cursor:
+            cursor.execute(statement)
+    finally:
+        conn.close()
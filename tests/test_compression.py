@@ -0,0 +1,132 @@
+import random
+
+import pytest
+
+zstandard = pytest.importorskip('zstandard')
+
+from database import COMPRESSION_DICT_MIN_SAMPLES, ScrapingDatabase
+
+WORDS = ('price stock shipping review rating warranty colour size delivery returns '
+         'product order basket checkout customer service').split()
+
+
+def page(n: int) -> str:
+    rng = random.Random(n)
+    body = ' '.join(rng.choice(WORDS) for _ in range(300))
+    return f"Example Shop - Product {n}\nHome > Catalogue > Item {n}\n{body}\nCopyright Example Shop. All rights reserved."
+
+
+class FakeCursor:
+    """Serves compression_dicts lookups for _get_dict"""
+
+    def __init__(self, dicts):
+        self.dicts = dicts
+        self.loads = 0
+
+    def execute(self, query, params):
+        self.row = (self.dicts[params[0]],)
+        self.loads += 1
+
+    def fetchone(self):
+        return self.row
+
+
+@pytest.fixture
+def database():
+    # Only the compression helpers are exercised; no connection is opened
+    database = ScrapingDatabase.__new__(ScrapingDatabase)
+    database.compression_level = 6
+    database._zstd_dicts = {}
+    return database
+
+
+@pytest.fixture
+def cursor():
+    trained = zstandard.train_dictionary(16384, [page(n).encode() for n in range(200)])
+    return FakeCursor({1: trained.as_bytes()})
+
+
+TEXT = page(1000) + ' Ünïcödé ✓ 日本語'
+
+
+def test_round_trip_without_a_dictionary(database):
+    data = database._compress(None, TEXT, None)
+    assert data != TEXT.encode()
+    assert database._decompress(None, data, None) == TEXT
+
+
+def test_round_trip_with_a_dictionary(database, cursor):
+    data = database._compress(cursor, TEXT, 1)
+    assert database._decompress(cursor, data, 1) == TEXT
+    # Dictionaries are loaded once and reused
+    assert cursor.loads == 1
+    assert len(data) < len(database._compress(None, TEXT, None))
+
+
+def test_dictionary_blobs_need_their_dictionary(database, cursor):
+    data = database._compress(cursor, TEXT, 1)
+    with pytest.raises(zstandard.ZstdError):
+        database._decompress(None, data, None)
+
+
+@pytest.mark.parametrize('max_chars', [0, 1, 50, len(TEXT) - 1, len(TEXT), len(TEXT) + 100])
+@pytest.mark.parametrize('dict_id', [None, 1])
+def test_partial_decode(database, cursor, dict_id, max_chars):
+    data = database._compress(cursor, TEXT, dict_id)
+    assert database._decompress(cursor, data, dict_id, max_chars) == TEXT[:max_chars]
+
+
+def test_partial_decode_never_splits_a_character(database):
+    text = '日本語' * 100
+    data = database._compress(None, text, None)
+    for max_chars in range(1, 20):
+        assert database._decompress(None, data, None, max_chars) == text[:max_chars]
+
+
+def test_existing_content_is_compressed_with_a_trained_dictionary(pg_database):
+    plain = pg_database(CONTENT_COMPRESSION='off')
+    session_id = plain.create_session('compression', COMPRESSION_DICT_MIN_SAMPLES)
+    pages = {f'https://www.shop.example/item/{n}': page(n) for n in range(COMPRESSION_DICT_MIN_SAMPLES)}
+    plain.save_scraped_data_many(session_id, [(url, 'Item', text, 'success', '') for url, text in pages.items()])
+
+    compressed = pg_database(CONTENT_COMPRESSION='zstd')
+    assert compressed.compress_existing_content(batch_size=7) == len(pages)
+    with compressed.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('SELECT COUNT(*) FILTER (WHERE content IS NULL AND dict_id IS NOT NULL), COUNT(*) '
+                       'FROM content_blobs')
+        assert cursor.fetchone() == (len(pages), len(pages))
+        cursor.execute('SELECT domain FROM compression_dicts')
+        assert cursor.fetchall() == [('shop.example',)]
+    # Nothing is left to rewrite
+    assert compressed.compress_existing_content() == 0
+
+    items = list(compressed.iter_session_items(session_id, preview_length=40, page_size=5))
+    assert {item['url']: item['preview'] for item in items} == {url: text[:40] for url, text in pages.items()}
+    item = items[0]
+    content = compressed.get_item_content(session_id, item['id'], offset=10, length=30)
+    assert content['content'] == pages[item['url']][10:40]
+    assert compressed.get_item_content(session_id, item['id'])['content'] == pages[item['url']]
+
+
+def test_new_pages_use_the_domain_dictionary(pg_database):
+    database = pg_database(CONTENT_COMPRESSION='zstd')
+    session_id = database.create_session('compression', 0)
+    rows = [(f'https://shop.example/item/{n}', 'Item', page(n), 'success', '')
+            for n in range(COMPRESSION_DICT_MIN_SAMPLES)]
+    database.save_scraped_data_many(session_id, rows)
+    assert database.train_compression_dicts() == 1
+    # Blobs compressed before the dictionary existed are rewritten with it
+    assert database.compress_existing_content() == len(rows)
+
+    text = page(5000)
+    database.save_scraped_data(session_id, 'https://shop.example/item/new', text, 'New')
+    with database.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT dict_id IS NOT NULL FROM content_blobs WHERE content_zstd IS NOT NULL "
+                       "AND char_count = %s", (len(text),))
+        assert cursor.fetchone() == (True,)
+    # Snippets of compressed pages come from their decompressed text
+    results = database.search_content('"Item 5000"', session_id)['results']
+    assert [row['url'] for row in results] == ['https://shop.example/item/new']
+    assert 'Catalogue > **Item** **5000**' in results[0]['snippet']
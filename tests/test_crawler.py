@@ -0,0 +1,255 @@
+import asyncio
+
+import httpx
+import pytest
+
+import crawler
+from crawler import MAX_URL_LENGTH, CrawlScope, Crawler, crawl_settings, extract_links
+from extraction_pool import ExtractionPool
+from jobs import JobQueue
+
+SITE = 'https://example.com'
+
+
+def links(html: str, base_url: str = f'{SITE}/dir/page', **kwargs):
+    return extract_links(html.encode(), base_url, **kwargs)
+
+
+def test_relative_links_resolve_against_the_page():
+    assert links('<a href="other">o</a><a href="/root">r</a><a href="../up">u</a>') == [
+        f'{SITE}/dir/other', f'{SITE}/root', f'{SITE}/up']
+
+
+def test_base_href_changes_the_resolution():
+    html = '<head><base href="https://cdn.example.net/docs/"></head><a href="intro">i</a><a href="/top">t</a>'
+    assert links(html) == ['https://cdn.example.net/docs/intro', 'https://cdn.example.net/top']
+
+
+def test_relative_base_href_resolves_against_the_page():
+    assert links('<base href="/v2/"><a href="guide">g</a>') == [f'{SITE}/v2/guide']
+
+
+def test_rel_nofollow_links_are_skipped():
+    html = '<a href="/a" rel="nofollow">a</a><a href="/b" rel="noopener NoFollow">b</a><a href="/c" rel="next">c</a>'
+    assert links(html) == [f'{SITE}/c']
+    assert links(html, honor_nofollow=False) == [f'{SITE}/a', f'{SITE}/b', f'{SITE}/c']
+
+
+def test_robots_meta_nofollow_drops_every_link():
+    html = '<head><meta name="Robots" content="noindex, NOFOLLOW"></head><a href="/a">a</a>'
+    assert links(html) == []
+    assert links(html, honor_nofollow=False) == [f'{SITE}/a']
+
+
+def test_non_page_links_are_skipped():
+    html = ''.join(f'<a href="{href}">x</a>' for href in (
+        '#top', 'javascript:void(0)', 'mailto:a@example.com', 'tel:123', 'data:text/plain,x',
+        'ftp://example.com/file', '', '  /kept  '))
+    assert links(html) == [f'{SITE}/kept']
+
+
+@pytest.mark.parametrize('body', [b'', b'\x00\x01', b'<'])
+def test_unparseable_pages_have_no_links(body):
+    assert extract_links(body, SITE) == []
+
+
+def test_host_scope_rejects_other_hosts():
+    scope = CrawlScope([f'{SITE}/start', 'https://blog.example.org/'])
+    assert scope.allows(f'{SITE}/anything')
+    assert scope.allows('http://example.com/other-scheme')
+    assert scope.allows('https://blog.example.org/post')
+    assert not scope.allows('https://www.example.com/')
+    assert not scope.allows('https://sub.example.com/')
+    assert not scope.allows('https://example.org/')
+    assert not scope.allows('https://elsewhere.net/')
+
+
+def test_domain_scope_admits_subdomains_only():
+    scope = CrawlScope(['https://www.example.com/'], 'domain')
+    assert scope.allows('https://example.com/')
+    assert scope.allows('https://docs.example.com/')
+    assert scope.allows('https://a.b.example.com/')
+    assert not scope.allows('https://badexample.com/')
+    assert not scope.allows('https://example.com.evil.net/')
+
+
+def test_any_scope_still_applies_path_rules():
+    scope = CrawlScope([SITE], 'any', path_prefixes=['/docs/'], exclude=['*/print'])
+    assert scope.allows('https://elsewhere.net/docs/a')
+    assert not scope.allows('https://elsewhere.net/blog/a')
+    assert not scope.allows(f'{SITE}/docs/a/print')
+
+
+def test_unknown_scope():
+    with pytest.raises(ValueError):
+        CrawlScope([SITE], 'planet')
+
+
+def make_crawler(**settings):
+    return Crawler(None, crawl_settings([f'{SITE}/'], **settings))
+
+
+def test_links_to_follow():
+    found = make_crawler(exclude=['/tag/*']).links_to_follow([
+        f'{SITE}/a',
+        'HTTPS://EXAMPLE.com:443/a#section',
+        f'{SITE}/b',
+        f'{SITE}/logo.PNG',
+        f'{SITE}/files/archive.tar.gz',
+        f'{SITE}/tag/news',
+        'https://other.example/a',
+        f'{SITE}/' + 'x' * MAX_URL_LENGTH,
+    ])
+    # Canonical, in order, without duplicates, files, excluded paths or other hosts
+    assert found == [f'{SITE}/a', f'{SITE}/b']
+
+
+class FakeSite:
+    """Stands in for the batch engine: serves `pages` (path -> html), 404 for anything else"""
+
+    def __init__(self, pages):
+        self.pages = pages
+        self.fetched = []
+
+    async def fetch(self, url, headers=None):
+        self.fetched.append(url)
+        html = self.pages.get(url[len(SITE):])
+        request = httpx.Request('GET', url)
+        if html is None:
+            return httpx.Response(404, request=request)
+        return httpx.Response(200, headers={'content-type': 'text/html'}, content=html.encode(), request=request)
+
+    async def run(self, urls, cache_policy='default', respect_robots=True, scrape=None):
+        for url in urls:
+            yield await scrape(url, cache_policy, respect_robots)
+
+
+def page(*paths, text='Some words on this page.'):
+    return f'<html><body><p>{text}</p>' + ''.join(f'<a href="{path}">{path}</a>' for path in paths) + '</body></html>'
+
+
+@pytest.fixture
+def inline_extraction(monkeypatch):
+    monkeypatch.setattr(crawler, 'get_extraction_pool', lambda: ExtractionPool(workers=0))
+    monkeypatch.setattr(crawler, 'extract_text', lambda body: body.decode())
+
+
+def test_crawl_page_returns_links_to_follow(inline_extraction):
+    site = FakeSite({'/': page('/a', '/a', 'https://other.example/', '/img.jpg', '/b')})
+    crawl = Crawler(site, crawl_settings([f'{SITE}/']))
+    result = asyncio.run(crawl.crawl_page(f'{SITE}/', respect_robots=False))
+    assert result['success'] and result['links'] == [f'{SITE}/a', f'{SITE}/b']
+    result = asyncio.run(crawl.crawl_page(f'{SITE}/', respect_robots=False, follow=False))
+    assert result['success'] and result['links'] == []
+
+
+def test_crawl_page_http_error(inline_extraction):
+    crawl = Crawler(FakeSite({}), crawl_settings([f'{SITE}/']))
+    result = asyncio.run(crawl.crawl_page(f'{SITE}/gone', respect_robots=False))
+    assert not result['success'] and result['error'] == 'HTTP 404' and result['links'] == []
+
+
+# The frontier lives in Postgres; these need TEST_DATABASE_URL
+
+WORKER = 'test-worker'
+
+
+def start_crawl(db, seeds, max_pages):
+    session_id = db.create_crawl('crawl', seeds, {'kind': 'crawl'}, max_pages)
+    assert db.claim_job(WORKER, 60)['id'] == session_id
+    return session_id
+
+
+def frontier(db, session_id):
+    with db.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('SELECT url, depth, state FROM crawl_frontier WHERE session_id = %s ORDER BY url',
+                       (session_id,))
+        return {url: (depth, state) for url, depth, state in cursor.fetchall()}
+
+
+def finish(db, session_id, url, found, max_pages):
+    return db.save_crawl_results(session_id, WORKER, [(url, url, 'text', 'success', '')], [(url, found)],
+                                 max_pages)
+
+
+def test_frontier_admits_new_links_once_at_their_first_depth(pg_database):
+    db = pg_database()
+    session_id = start_crawl(db, [f'{SITE}/'], 100)
+    assert db.claim_frontier(session_id, 10) == [(f'{SITE}/', 0)]
+
+    found = [(f'{SITE}/a', 1), (f'{SITE}/b', 1), (f'{SITE}/a', 1), (f'{SITE}/', 1)]
+    assert finish(db, session_id, f'{SITE}/', found, 100) == ('in_progress', 3)
+    # A later, deeper sighting of a known URL changes nothing
+    assert finish(db, session_id, f'{SITE}/a', [(f'{SITE}/b', 2), (f'{SITE}/c', 2)], 100) == ('in_progress', 4)
+    assert frontier(db, session_id) == {
+        f'{SITE}/': (0, 'done'),
+        f'{SITE}/a': (1, 'done'),
+        f'{SITE}/b': (1, 'queued'),
+        f'{SITE}/c': (2, 'queued'),
+    }
+
+
+def test_frontier_stops_admitting_at_the_page_budget(pg_database):
+    db = pg_database()
+    session_id = start_crawl(db, [f'{SITE}/', f'{SITE}/seed2'], 5)
+    found = [(f'{SITE}/p{n}', 1) for n in range(10)]
+    assert finish(db, session_id, f'{SITE}/', found, 5) == ('in_progress', 5)
+    assert finish(db, session_id, f'{SITE}/seed2', [(f'{SITE}/more', 1)], 5) == ('in_progress', 5)
+    # Links are admitted in the order they were found
+    assert sorted(frontier(db, session_id)) == sorted([f'{SITE}/', f'{SITE}/seed2'] +
+                                                      [f'{SITE}/p{n}' for n in range(3)])
+    assert db.get_session_summary(session_id)['session']['total_urls'] == 5
+
+
+def test_frontier_takes_hosts_in_turn(pg_database):
+    db = pg_database()
+    hosts = ['https://a.example', 'https://b.example', 'https://c.example']
+    session_id = start_crawl(db, [f'{SITE}/'], 100)
+    db.claim_frontier(session_id, 1)
+    # One host dominates the links found
+    found = [(f'{hosts[0]}/{n}', 1) for n in range(4)] + [(f'{hosts[1]}/0', 1), (f'{hosts[2]}/0', 1)]
+    finish(db, session_id, f'{SITE}/', found, 100)
+
+    claimed = db.claim_frontier(session_id, 3)
+    assert sorted(claimed) == [(f'{host}/0', 1) for host in hosts]
+    assert db.claim_frontier(session_id, 10) == [(f'{hosts[0]}/{n}', 1) for n in range(1, 4)]
+    assert db.get_frontier_stats(session_id)['hosts'] == 4
+
+
+def test_only_the_owning_worker_admits_links(pg_database):
+    db = pg_database()
+    session_id = start_crawl(db, [f'{SITE}/'], 100)
+    assert db.save_crawl_results(session_id, 'someone-else', [], [(f'{SITE}/', [(f'{SITE}/a', 1)])], 100) is None
+    db.cancel_job(session_id)
+    # A cancelled crawl keeps its results but queues nothing more
+    assert finish(db, session_id, f'{SITE}/', [(f'{SITE}/a', 1)], 100) == ('cancelled', 1)
+    assert db.get_session_summary(session_id)['stats']['items'] == 1
+
+
+def test_crawl_stops_at_max_depth(pg_database, inline_extraction):
+    db = pg_database()
+    site = FakeSite({
+        '/': page('/d1a', '/d1b'),
+        '/d1a': page('/d2a', '/'),
+        '/d1b': page('/d2b'),
+        '/d2a': page('/d3'),
+        '/d2b': page(),
+        '/d3': page(),
+    })
+    settings = crawl_settings([f'{SITE}/'], max_depth=2, max_pages=100)
+
+    async def run():
+        queue = JobQueue(site, db, workers=1, batch_size=2)
+        session_id = await queue.submit_crawl('crawl', settings, {'respect_robots': False})
+        job = await asyncio.to_thread(db.claim_job, WORKER, 60)
+        await queue._process(job, WORKER)
+        return session_id
+
+    session_id = asyncio.run(run())
+    assert sorted(site.fetched) == [f'{SITE}{path}' for path in ('/', '/d1a', '/d1b', '/d2a', '/d2b')]
+    # Pages at max_depth are scraped but their links are never queued
+    summary = db.get_session_summary(session_id)
+    assert summary['session']['status'] == 'completed'
+    assert summary['session']['total_urls'] == 5
+    assert summary['stats']['successful'] == 5
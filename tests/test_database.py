@@ -0,0 +1,49 @@
+import pytest
+
+from database import ScrapedDataWriter
+
+
+class FakeDatabase:
+    def __init__(self):
+        self.saved = []
+        self.fail = False
+
+    def save_scraped_data_many(self, session_id, rows):
+        if self.fail:
+            raise RuntimeError("database unavailable")
+        self.saved.extend(rows)
+        return len(rows)
+
+
+def test_writer_flushes_in_batches():
+    db = FakeDatabase()
+    writer = ScrapedDataWriter(db, 1, batch_size=2)
+    writer.add('https://e.com/a', 'a')
+    assert db.saved == [] and writer.pending == 1
+    writer.add('https://e.com/b', 'b')
+    assert [row[0] for row in db.saved] == ['https://e.com/a', 'https://e.com/b']
+    assert writer.pending == 0 and writer.written == 2
+
+
+def test_failed_flush_keeps_the_rows():
+    db = FakeDatabase()
+    writer = ScrapedDataWriter(db, 1, batch_size=10, auto_flush=False)
+    writer.add('https://e.com/a', 'a')
+    db.fail = True
+    with pytest.raises(RuntimeError):
+        writer.flush()
+    assert writer.pending == 1 and writer.written == 0
+
+    writer.add('https://e.com/b', 'b')
+    db.fail = False
+    assert writer.flush() == 2
+    assert [row[0] for row in db.saved] == ['https://e.com/a', 'https://e.com/b']
+
+
+def test_exit_flushes_partial_results():
+    db = FakeDatabase()
+    with pytest.raises(ValueError):
+        with ScrapedDataWriter(db, 1, batch_size=10) as writer:
+            writer.add('https://e.com/a', 'a')
+            raise ValueError("caller failed")
+    assert [row[0] for row in db.saved] == ['https://e.com/a']
@@ -0,0 +1,115 @@
+import csv
+import gzip
+import io
+from datetime import datetime
+
+import pytest
+from openpyxl import load_workbook
+
+import exports
+from exports import EXCEL_MAX_CELL_CHARS, iter_csv, iter_file, parse_columns, write_xlsx
+
+COLUMNS = ['url', 'title', 'word_count', 'scraped_at']
+ROWS = [
+    ('https://example.com/a', 'Plain', 3, datetime(2026, 1, 2, 3, 4, 5)),
+    ('https://example.com/b', 'Comma, "quotes"\nand a newline', 0, None),
+    ('https://example.com/c', 'Ünïcödé ✓ 日本語', None, datetime(2026, 5, 6)),
+]
+EXPECTED = [
+    ['URL', 'Title', 'Word Count', 'Scraped At'],
+    ['https://example.com/a', 'Plain', '3', '2026-01-02 03:04:05'],
+    ['https://example.com/b', 'Comma, "quotes"\nand a newline', '0', ''],
+    ['https://example.com/c', 'Ünïcödé ✓ 日本語', '', '2026-05-06 00:00:00'],
+]
+
+
+def read_csv(data: bytes):
+    return list(csv.reader(io.StringIO(data.decode('utf-8'), newline='')))
+
+
+def test_csv():
+    assert read_csv(b''.join(iter_csv(iter(ROWS), COLUMNS))) == EXPECTED
+
+
+def test_gzip_csv_round_trip():
+    data = b''.join(iter_csv(iter(ROWS), COLUMNS, gzip=True))
+    assert data[:2] == b'\x1f\x8b'
+    assert read_csv(gzip.decompress(data)) == EXPECTED
+
+
+@pytest.mark.parametrize('compress', [False, True])
+def test_large_csv_is_streamed(monkeypatch, compress):
+    monkeypatch.setattr(exports, 'CSV_CHUNK_CHARS', 1024)
+    consumed = []
+
+    def rows():
+        for n in range(5000):
+            consumed.append(n)
+            yield (f'https://example.com/{n}', f'Page {n} ' + 'x' * (n % 50), n, None)
+
+    chunks = iter_csv(rows(), COLUMNS, gzip=compress)
+    first = next(chunks)
+    # Output starts long before the rows run out
+    assert first and len(consumed) < 5000
+    data = first + b''.join(chunks)
+    lines = read_csv(gzip.decompress(data) if compress else data)
+    assert len(lines) == 5001
+    assert lines[-1] == ['https://example.com/4999', 'Page 4999 ' + 'x' * 49, '4999', '']
+
+
+def test_gzip_csv_of_no_rows_is_still_a_valid_file():
+    data = b''.join(iter_csv(iter([]), COLUMNS, gzip=True))
+    assert read_csv(gzip.decompress(data)) == [EXPECTED[0]]
+
+
+def test_parse_columns():
+    assert parse_columns(None, COLUMNS) == COLUMNS
+    assert parse_columns(' url, content ,', COLUMNS) == ['url', 'content']
+    with pytest.raises(ValueError, match='nope'):
+        parse_columns('url,nope', COLUMNS)
+
+
+HEADERS = ['URL', 'Title', 'Word Count', 'Scraped At']
+
+
+def read_xlsx(output):
+    workbook = load_workbook(io.BytesIO(b''.join(iter_file(output))))
+    return {sheet.title: [list(row) for row in sheet.iter_rows(values_only=True)] for sheet in workbook}
+
+
+def test_xlsx_rolls_over_to_new_sheets_with_headers():
+    rows = [(f'https://example.com/{n}', f'Page {n}', n, None) for n in range(10)]
+    # Four rows per sheet: the header plus three data rows
+    sheets = read_xlsx(write_xlsx(iter(rows), HEADERS, max_rows=4))
+    assert list(sheets) == ['Scraped Data', 'Scraped Data (2)', 'Scraped Data (3)', 'Scraped Data (4)']
+    for sheet in sheets.values():
+        assert sheet[0] == HEADERS
+        assert 2 <= len(sheet) <= 4
+    data = [row for sheet in sheets.values() for row in sheet[1:]]
+    assert [row[0] for row in data] == [row[0] for row in rows]
+    assert sheets['Scraped Data (4)'] == [HEADERS, ['https://example.com/9', 'Page 9', 9, None]]
+
+
+def test_xlsx_exactly_full_sheet_does_not_add_an_empty_one():
+    rows = [(f'https://example.com/{n}', 'T', n, None) for n in range(6)]
+    assert list(read_xlsx(write_xlsx(iter(rows), HEADERS, max_rows=4))) == ['Scraped Data', 'Scraped Data (2)']
+
+
+def test_xlsx_long_sheet_titles_stay_within_excel_limits():
+    title = 'A very long export sheet title'
+    rows = [(str(n), '', 0, None) for n in range(3)]
+    titles = list(read_xlsx(write_xlsx(iter(rows), HEADERS, sheet_title=title[:31], max_rows=2)))
+    assert titles[1:] == [f'{title[:24]} (2)', f'{title[:24]} (3)']
+    assert all(len(title) <= 31 for title in titles)
+
+
+def test_empty_xlsx_has_the_headers():
+    assert read_xlsx(write_xlsx(iter([]), HEADERS)) == {'Scraped Data': [HEADERS]}
+
+
+def test_xlsx_cells_are_made_safe():
+    rows = [('https://example.com/a', 'bell\x07 and tab\t', 1, datetime(2026, 1, 2)),
+            ('https://example.com/b', 'x' * (EXCEL_MAX_CELL_CHARS + 10), None, None)]
+    sheet = read_xlsx(write_xlsx(iter(rows), HEADERS))['Scraped Data']
+    assert sheet[1] == ['https://example.com/a', 'bell and tab\t', 1, datetime(2026, 1, 2)]
+    assert len(sheet[2][1]) == EXCEL_MAX_CELL_CHARS
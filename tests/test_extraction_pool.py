@@ -0,0 +1,114 @@
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from extraction import extract_html_content
+from extraction_pool import ExtractionPool, ExtractionTimeout
+
+
+@pytest.fixture
+def pool():
+    # Real worker processes: results must survive pickling back to the caller
+    pool = ExtractionPool(workers=2, task_timeout=5)
+    yield pool
+    pool.shutdown()
+
+
+def wait_for(condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_tasks_run_in_worker_processes(pool):
+    assert pool.run(len, 'xyz') == 3
+    assert pool.run(os.getpid) != os.getpid()
+
+
+def test_large_page_title_comes_back_as_plain_str(pool):
+    html = '<html><head><title>Big page</title></head><body>%s</body></html>' % (
+        '<p>paragraph</p>' * 3000)
+    result = pool.run(extract_html_content, html.encode())
+    assert result['title'] == 'Big page'
+    assert type(result['title']) is str
+
+
+def test_uncontended_calls_never_wait(pool):
+    for n in range(3):
+        assert pool.run(len, 'x' * n) == n
+    stats = pool.stats()
+    assert stats['tasks'] == 3
+    assert stats['waiting'] == 0 and stats['peak_waiting'] == 0
+
+
+def test_callers_blocked_on_a_worker_count_as_waiting():
+    pool = ExtractionPool(workers=1, task_timeout=5)
+    try:
+        first = threading.Thread(target=pool.run, args=(time.sleep, 1))
+        first.start()
+        assert wait_for(lambda: pool.stats()['running'] == 1)
+        second = threading.Thread(target=pool.run, args=(len, 'xy'))
+        second.start()
+        assert wait_for(lambda: pool.stats()['waiting'] == 1)
+
+        first.join(10)
+        second.join(10)
+        stats = pool.stats()
+        assert stats['tasks'] == 2
+        assert stats['waiting'] == 0 and stats['peak_waiting'] == 1
+    finally:
+        pool.shutdown()
+
+
+def test_timeout_restarts_only_the_hung_worker():
+    pool = ExtractionPool(workers=2, task_timeout=1)
+    try:
+        # Pin a healthy worker with a task that outlives the other one's timeout
+        healthy = []
+        thread = threading.Thread(target=lambda: healthy.append(pool.run(time.sleep, 0.5) or 'done'))
+        thread.start()
+        assert wait_for(lambda: pool.stats()['running'] == 1)
+        with pytest.raises(ExtractionTimeout):
+            pool.run(time.sleep, 30)
+        thread.join(10)
+        assert healthy == ['done']
+
+        stats = pool.stats()
+        assert stats['timeouts'] == 1 and stats['restarts'] == 1
+        # Both workers are usable again
+        assert pool.run(len, 'ab') == 2
+        assert pool.run(len, 'abc') == 3
+    finally:
+        pool.shutdown()
+
+
+def test_arun_keeps_the_default_executor_free(pool):
+    async def main():
+        loop = asyncio.get_running_loop()
+        default_threads = []
+        loop.set_default_executor(_RecordingExecutor(default_threads))
+        results = await asyncio.gather(*(pool.arun(len, 'x' * n) for n in range(4)))
+        return results, default_threads
+
+    results, default_threads = asyncio.run(main())
+    assert results == [0, 1, 2, 3]
+    assert default_threads == []
+
+
+class _RecordingExecutor(ThreadPoolExecutor):
+    def __init__(self, calls):
+        super().__init__(max_workers=1)
+        self.calls = calls
+
+    def submit(self, fn, *args, **kwargs):
+        self.calls.append(fn)
+        return super().submit(fn, *args, **kwargs)
+
+
+def test_inline_mode_runs_in_the_caller():
+    assert ExtractionPool(workers=0).run(threading.get_ident) == threading.get_ident()
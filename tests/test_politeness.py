@@ -0,0 +1,202 @@
+import asyncio
+import threading
+import time
+from email.utils import formatdate
+
+import pytest
+
+from politeness import MAX_PENALTY, PolitenessScheduler, retry_after_seconds
+
+ORIGIN = 'https://example.com'
+URL = ORIGIN + '/page'
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+def scheduler(clock, crawl_delay=None, **kwargs):
+    kwargs.setdefault('rate', 1.0)
+    kwargs.setdefault('burst', 3)
+    kwargs.setdefault('max_in_flight', 2)
+    return PolitenessScheduler(crawl_delay_provider=lambda origin: crawl_delay, clock=clock, **kwargs)
+
+
+def test_burst_then_spacing(clock):
+    polite = scheduler(clock)
+    # `burst` requests go at once, then one per 1/rate seconds
+    assert [polite.reserve(ORIGIN) for _ in range(5)] == [0.0, 0.0, 0.0, 1.0, 2.0]
+
+
+def test_idle_time_refills_the_burst(clock):
+    polite = scheduler(clock)
+    for _ in range(3):
+        polite.reserve(ORIGIN)
+    clock.advance(10)
+    assert [polite.reserve(ORIGIN) for _ in range(4)] == [0.0, 0.0, 0.0, 1.0]
+
+
+def test_spacing_follows_rate(clock):
+    polite = scheduler(clock, rate=4.0, burst=1)
+    assert [polite.reserve(ORIGIN) for _ in range(4)] == [0.0, 0.25, 0.5, 0.75]
+    clock.advance(0.5)
+    assert polite.reserve(ORIGIN) == pytest.approx(0.5)
+
+
+def test_origins_are_paced_independently(clock):
+    polite = scheduler(clock, burst=1)
+    assert polite.reserve(ORIGIN) == 0.0
+    assert polite.reserve('https://other.example') == 0.0
+    assert polite.reserve(ORIGIN) == 1.0
+
+
+def test_crawl_delay_means_strict_spacing(clock):
+    polite = scheduler(clock, crawl_delay=3.0)
+    assert polite.crawl_delay(ORIGIN) == 3.0
+    assert [polite.reserve(ORIGIN) for _ in range(3)] == [0.0, 3.0, 6.0]
+
+
+def test_crawl_delay_is_capped(clock):
+    polite = scheduler(clock, crawl_delay=600.0, max_crawl_delay=5.0)
+    assert polite.crawl_delay(ORIGIN) == 5.0
+
+
+def test_throttling_blocks_and_doubles_the_penalty(clock):
+    polite = scheduler(clock, burst=1)
+    polite.reserve(ORIGIN)
+    clock.advance(1)
+    polite.record(URL, 429)
+    # Without Retry-After the origin pauses for penalty / rate
+    assert polite.reserve(ORIGIN) == 2.0
+    # and is then paced at interval * penalty
+    assert polite.reserve(ORIGIN) == 4.0
+    assert polite.stats()[ORIGIN]['penalty'] == 2.0
+
+
+def test_penalty_is_capped_and_recovers(clock):
+    polite = scheduler(clock)
+    for _ in range(10):
+        polite.record(URL, 503)
+    assert polite.stats()[ORIGIN]['penalty'] == MAX_PENALTY
+    for _ in range(200):
+        polite.record(URL, 200)
+    assert polite.stats()[ORIGIN]['penalty'] == 1.0
+
+
+def test_client_errors_leave_the_penalty_alone(clock):
+    polite = scheduler(clock)
+    polite.record(URL, 429)
+    polite.record(URL, 404)
+    assert polite.stats()[ORIGIN]['penalty'] == 2.0
+
+
+def test_retry_after_seconds_blocks_the_origin(clock):
+    polite = scheduler(clock)
+    polite.record(URL, 429, {'retry-after': '30'})
+    assert polite.reserve(ORIGIN) == 30.0
+    clock.advance(30)
+    assert polite.stats()[ORIGIN]['blocked_for'] == 0.0
+
+
+def test_retry_after_http_date(clock):
+    polite = scheduler(clock)
+    polite.record(URL, 503, {'retry-after': formatdate(time.time() + 20, usegmt=True)})
+    assert polite.reserve(ORIGIN) == pytest.approx(20, abs=1.5)
+
+
+@pytest.mark.parametrize('value, expected', [
+    ('120', 120.0),
+    ('0', 0.0),
+    ('-5', 0.0),
+    ('soon', None),
+    ('', None),
+])
+def test_retry_after_values(value, expected):
+    assert retry_after_seconds({'retry-after': value}) == expected
+
+
+def test_retry_after_date_in_the_past():
+    assert retry_after_seconds({'retry-after': formatdate(time.time() - 60, usegmt=True)}) == 0.0
+
+
+def test_retry_after_missing():
+    assert retry_after_seconds(None) is None
+    assert retry_after_seconds({}) is None
+
+
+def test_should_retry(clock):
+    polite = scheduler(clock, max_retries=2)
+    assert polite.should_retry(0, 429)
+    assert polite.should_retry(1, 503, {'retry-after': '10'})
+    assert not polite.should_retry(2, 429)
+    assert not polite.should_retry(0, 500)
+    # Pauses longer than max_retry_wait are not waited out
+    assert not polite.should_retry(0, 429, {'retry-after': str(polite.max_retry_wait + 1)})
+
+
+def test_in_flight_cap_is_shared_by_threads_and_coroutines():
+    polite = PolitenessScheduler(rate=1000.0, burst=1000, max_in_flight=1, crawl_delay_provider=None)
+    holding, release = threading.Event(), threading.Event()
+
+    def hold_sync_slot():
+        with polite.slot_sync(URL):
+            holding.set()
+            release.wait(5)
+
+    thread = threading.Thread(target=hold_sync_slot)
+    thread.start()
+    assert holding.wait(5)
+
+    async def take_async_slot():
+        async with polite.slot(URL):
+            return time.monotonic()
+
+    async def main():
+        task = asyncio.create_task(take_async_slot())
+        await asyncio.sleep(0.2)
+        # The thread's slot is the only one
+        assert not task.done()
+        assert polite.stats()[ORIGIN]['in_flight'] == 1
+        released = time.monotonic()
+        release.set()
+        assert await asyncio.wait_for(task, 5) >= released
+
+    asyncio.run(main())
+    thread.join(5)
+    assert polite.stats()[ORIGIN]['in_flight'] == 0
+
+
+def test_cancelled_waiter_passes_its_slot_on():
+    polite = PolitenessScheduler(rate=1000.0, burst=1000, max_in_flight=1, crawl_delay_provider=None)
+
+    async def main():
+        entered = []
+
+        async def worker(name, hold):
+            async with polite.slot(URL):
+                entered.append(name)
+                await asyncio.sleep(hold)
+
+        first = asyncio.create_task(worker('first', 0.1))
+        await asyncio.sleep(0.01)
+        cancelled = asyncio.create_task(worker('cancelled', 0))
+        last = asyncio.create_task(worker('last', 0))
+        await asyncio.sleep(0.01)
+        cancelled.cancel()
+        await asyncio.wait_for(asyncio.gather(first, last), 5)
+        assert entered == ['first', 'last']
+
+    asyncio.run(main())
+    assert polite.stats()[ORIGIN]['in_flight'] == 0
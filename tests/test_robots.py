@@ -0,0 +1,188 @@
+import asyncio
+import threading
+import time
+
+import httpx
+import pytest
+
+import robots
+from robots import RobotsService
+
+ORIGIN = 'https://example.com'
+ROBOTS_TXT = 'User-agent: *\nDisallow: /private/\nCrawl-delay: 2\nSitemap: https://example.com/sitemap.xml\n'
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+class Upstream:
+    """Stands in for httpx.get: counts robots.txt downloads, optionally holding them until released"""
+
+    def __init__(self, status=200, body=ROBOTS_TXT, error=None):
+        self.status = status
+        self.body = body
+        self.error = error
+        self.calls = 0
+        self.lock = threading.Lock()
+        self.release = threading.Event()
+        self.release.set()
+
+    def __call__(self, url, **kwargs):
+        with self.lock:
+            self.calls += 1
+        self.release.wait(5)
+        if self.error:
+            raise self.error
+        return httpx.Response(self.status, text=self.body, request=httpx.Request('GET', url))
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(robots.time, 'time', clock)
+    return clock
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    upstream = Upstream()
+    monkeypatch.setattr(robots.httpx, 'get', upstream)
+    return upstream
+
+
+@pytest.fixture
+def service(tmp_path):
+    def make(**kwargs):
+        kwargs.setdefault('ttl', 3600)
+        kwargs.setdefault('missing_ttl', 600)
+        kwargs.setdefault('error_ttl', 60)
+        return RobotsService(str(tmp_path / 'robots.sqlite'), **kwargs)
+    return make
+
+
+def test_rules_are_downloaded_once_per_ttl(service, upstream, clock):
+    robots_service = service()
+    assert robots_service.can_fetch(f'{ORIGIN}/page')
+    assert not robots_service.can_fetch(f'{ORIGIN}/private/x')
+    assert robots_service.crawl_delay(ORIGIN) == 2.0
+    assert robots_service.sitemaps(ORIGIN) == ['https://example.com/sitemap.xml']
+    assert upstream.calls == 1
+
+    clock.now += 3599
+    robots_service.can_fetch(f'{ORIGIN}/page')
+    assert upstream.calls == 1
+    clock.now += 2
+    robots_service.can_fetch(f'{ORIGIN}/page')
+    assert upstream.calls == 2
+
+
+@pytest.mark.parametrize('status', [404, 410, 403])
+def test_missing_robots_txt_is_cached_as_allow_all(service, upstream, clock, status):
+    upstream.status = status
+    robots_service = service()
+    assert robots_service.check(f'{ORIGIN}/private/x') == (True, 'missing')
+    assert robots_service.crawl_delay(ORIGIN) is None
+    assert upstream.calls == 1
+
+    # Cached for missing_ttl, not the full TTL
+    clock.now += 599
+    assert robots_service.check(f'{ORIGIN}/a') == (True, 'missing')
+    assert upstream.calls == 1
+    clock.now += 2
+    upstream.status = 200
+    assert robots_service.check(f'{ORIGIN}/private/x') == (False, 'ok')
+    assert upstream.calls == 2
+
+
+@pytest.mark.parametrize('failure', [
+    {'status': 503},
+    {'error': httpx.ConnectTimeout('timed out')},
+    {'error': httpx.ConnectError('refused')},
+])
+def test_unreachable_robots_txt_allows_and_is_retried_sooner(service, upstream, clock, failure):
+    for key, value in failure.items():
+        setattr(upstream, key, value)
+    robots_service = service()
+    assert robots_service.check(f'{ORIGIN}/private/x') == (True, 'unreachable')
+    clock.now += 59
+    robots_service.check(f'{ORIGIN}/a')
+    assert upstream.calls == 1
+    clock.now += 2
+    robots_service.check(f'{ORIGIN}/a')
+    assert upstream.calls == 2
+
+
+def test_missing_ttl_defaults_to_the_ttl(tmp_path, monkeypatch):
+    monkeypatch.delenv('ROBOTS_MISSING_TTL', raising=False)
+    assert RobotsService(str(tmp_path / 'robots.sqlite'), ttl=1234).missing_ttl == 1234
+
+
+def test_negative_entries_are_shared_through_the_persistent_cache(service, upstream, clock):
+    upstream.status = 404
+    service().can_fetch(f'{ORIGIN}/a')
+    # Another process (a fresh service on the same file) trusts it too
+    other = service()
+    assert other.check(f'{ORIGIN}/a') == (True, 'missing')
+    assert upstream.calls == 1
+    clock.now += 601
+    other.check(f'{ORIGIN}/a')
+    assert upstream.calls == 2
+
+
+def test_concurrent_threads_share_one_download(service, upstream, clock):
+    robots_service = service()
+    upstream.release.clear()
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(robots_service.can_fetch(f'{ORIGIN}/page')))
+               for _ in range(10)]
+    for thread in threads:
+        thread.start()
+    deadline = time.monotonic() + 5
+    while robots_service.stats()['misses'] < 10 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    upstream.release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert results == [True] * 10
+    assert upstream.calls == 1
+    assert robots_service.stats()['downloads'] == 1
+
+
+def test_concurrent_coroutines_share_one_download(service, upstream, clock):
+    robots_service = service()
+    upstream.release.clear()
+
+    async def main():
+        checks = [asyncio.create_task(robots_service.acan_fetch(f'{ORIGIN}/private/{n}')) for n in range(20)]
+        checks.append(asyncio.create_task(robots_service.acan_fetch(f'{ORIGIN}/public')))
+        await asyncio.sleep(0.2)
+        upstream.release.set()
+        return await asyncio.gather(*checks)
+
+    assert asyncio.run(main()) == [False] * 20 + [True]
+    assert upstream.calls == 1
+
+
+def test_origins_are_fetched_separately(service, upstream, clock):
+    robots_service = service()
+    robots_service.can_fetch('https://example.com/a')
+    robots_service.can_fetch('https://EXAMPLE.com/b')
+    robots_service.can_fetch('http://example.com/a')
+    robots_service.can_fetch('https://example.com:8443/a')
+    assert upstream.calls == 3
+
+
+def test_memory_cache_is_bounded(service, upstream, clock):
+    robots_service = service(memory_entries=2)
+    for n in range(5):
+        robots_service.can_fetch(f'https://site{n}.example/')
+    assert robots_service.stats()['cached_origins'] == 2
+    # Evicted origins come back from the persistent tier, not the network
+    robots_service.can_fetch('https://site0.example/')
+    assert upstream.calls == 5
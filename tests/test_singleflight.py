@@ -0,0 +1,136 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from singleflight import SingleFlight, SyncSingleFlight, flight_key
+
+KEY = flight_key('https://example.com/page', 'default')
+
+
+class Upstream:
+    """Counts fetches; each one waits until released so callers overlap"""
+
+    def __init__(self, error=None):
+        self.fetches = 0
+        self.error = error
+        self.release = asyncio.Event()
+
+    async def fetch(self):
+        self.fetches += 1
+        await self.release.wait()
+        if self.error:
+            raise self.error
+        return f'body {self.fetches}'
+
+
+async def gather_callers(flight, upstream, callers=5, key=KEY):
+    tasks = [asyncio.ensure_future(flight.do(key, upstream.fetch)) for _ in range(callers)]
+    await asyncio.sleep(0)
+    assert flight.stats()['in_flight'] == 1
+    upstream.release.set()
+    return await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def test_concurrent_callers_share_one_fetch():
+    async def main():
+        flight, upstream = SingleFlight(), Upstream()
+        results = await gather_callers(flight, upstream)
+        assert results == ['body 1'] * 5
+        assert upstream.fetches == 1
+        assert flight.stats() == {'in_flight': 0, 'calls': 5, 'shared': 4}
+
+    asyncio.run(main())
+
+
+def test_exception_reaches_every_waiter_and_clears_the_key():
+    async def main():
+        flight, upstream = SingleFlight(), Upstream(error=ValueError('upstream down'))
+        results = await gather_callers(flight, upstream)
+        assert len(results) == 5
+        assert all(isinstance(result, ValueError) and str(result) == 'upstream down' for result in results)
+        assert upstream.fetches == 1
+        assert flight.stats()['in_flight'] == 0
+
+        # The failure is not remembered: the next call fetches again
+        upstream.error = None
+        assert await flight.do(KEY, upstream.fetch) == 'body 2'
+        assert upstream.fetches == 2
+
+    asyncio.run(main())
+
+
+def test_finished_flights_are_not_cached():
+    async def main():
+        flight, upstream = SingleFlight(), Upstream()
+        upstream.release.set()
+        assert await flight.do(KEY, upstream.fetch) == 'body 1'
+        assert await flight.do(KEY, upstream.fetch) == 'body 2'
+        assert flight.stats()['shared'] == 0
+
+    asyncio.run(main())
+
+
+def test_different_keys_do_not_share():
+    async def main():
+        flight, upstream = SingleFlight(), Upstream()
+        upstream.release.set()
+        results = await asyncio.gather(*(flight.do(flight_key(f'https://example.com/{n}'), upstream.fetch)
+                                         for n in range(3)))
+        assert sorted(results) == ['body 1', 'body 2', 'body 3']
+
+    asyncio.run(main())
+
+
+def test_equivalent_urls_share_a_key():
+    assert flight_key('HTTPS://Example.com:443/page#top', 'default') == KEY
+    assert flight_key('https://example.com/page', 'bypass') != KEY
+
+
+def test_cancelled_caller_does_not_cancel_the_others():
+    async def main():
+        flight, upstream = SingleFlight(), Upstream()
+        first = asyncio.ensure_future(flight.do(KEY, upstream.fetch))
+        second = asyncio.ensure_future(flight.do(KEY, upstream.fetch))
+        await asyncio.sleep(0)
+        first.cancel()
+        upstream.release.set()
+        assert await second == 'body 1'
+        with pytest.raises(asyncio.CancelledError):
+            await first
+
+    asyncio.run(main())
+
+
+def test_sync_callers_share_one_call_and_its_exception():
+    flight = SyncSingleFlight()
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        raise ValueError('upstream down')
+
+    def call():
+        try:
+            return flight.do(KEY, fetch)
+        except ValueError as e:
+            return e
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        leader = executor.submit(call)
+        assert started.wait(5)
+        followers = [executor.submit(call) for _ in range(3)]
+        while flight.stats()['calls'] < 4:
+            time.sleep(0.01)
+        release.set()
+        results = [future.result(5) for future in [leader] + followers]
+
+    assert len(calls) == 1
+    assert all(isinstance(result, ValueError) for result in results)
+    assert flight.stats() == {'in_flight': 0, 'calls': 4, 'shared': 3}
+    assert flight.do(KEY, lambda: 'fresh') == 'fresh'
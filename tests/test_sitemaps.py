@@ -0,0 +1,199 @@
+import asyncio
+import gzip
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+
+import httpx
+import pytest
+from lxml import etree
+
+from sitemaps import SitemapFilter, SitemapReader, parse_lastmod
+
+SITE = 'https://example.com'
+NS = 'xmlns="http://www.sitemaps.org/schemas/sitemap/0.9"'
+
+
+def urlset(*entries) -> bytes:
+    body = ''.join(f'<url><loc>{loc}</loc>' + (f'<lastmod>{lastmod}</lastmod>' if lastmod else '') + '</url>'
+                   for loc, lastmod in entries)
+    return f'<?xml version="1.0" encoding="UTF-8"?>\n<urlset {NS}>{body}</urlset>'.encode()
+
+
+def index(*entries) -> bytes:
+    body = ''.join(f'<sitemap><loc>{loc}</loc>' + (f'<lastmod>{lastmod}</lastmod>' if lastmod else '') + '</sitemap>'
+                   for loc, lastmod in entries)
+    return f'<?xml version="1.0" encoding="UTF-8"?>\n<sitemapindex {NS}>{body}</sitemapindex>'.encode()
+
+
+class FakeEngine:
+    """Serves canned bodies in small chunks, like a slow download"""
+
+    def __init__(self, files, chunk_size=16):
+        self.files = files
+        self.chunk_size = chunk_size
+        self.fetched = []
+
+    @asynccontextmanager
+    async def stream(self, url):
+        self.fetched.append(url)
+        body = self.files.get(url)
+        request = httpx.Request('GET', url)
+        response = httpx.Response(404 if body is None else 200, request=request)
+
+        async def aiter_bytes():
+            for start in range(0, len(body), self.chunk_size):
+                yield body[start:start + self.chunk_size]
+
+        response.aiter_bytes = aiter_bytes
+        yield response
+
+
+def read(files, source, filter=None, **kwargs):
+    reader = SitemapReader(FakeEngine(files), respect_robots=False, **kwargs)
+
+    async def collect():
+        return [entry async for entry in reader.urls(source, filter)]
+
+    return asyncio.run(collect()), reader
+
+
+def test_gzipped_sitemap_index():
+    files = {
+        f'{SITE}/sitemap_index.xml.gz': gzip.compress(index(
+            (f'{SITE}/posts.xml.gz', None),
+            (f'{SITE}/pages.xml', None),
+        )),
+        f'{SITE}/posts.xml.gz': gzip.compress(urlset(*((f'{SITE}/post/{n}', None) for n in range(500)))),
+        f'{SITE}/pages.xml': urlset((f'{SITE}/about', None)),
+    }
+    entries, reader = read(files, f'{SITE}/sitemap_index.xml.gz')
+    # Children are read in document order
+    assert [entry['url'] for entry in entries] == [f'{SITE}/post/{n}' for n in range(500)] + [f'{SITE}/about']
+    assert reader.sitemaps_read == 3 and reader.errors == []
+
+
+def test_large_gzip_is_inflated_piece_by_piece(monkeypatch):
+    monkeypatch.setattr('sitemaps.MAX_FEED', 1024)
+    files = {f'{SITE}/big.xml.gz': gzip.compress(urlset(*((f'{SITE}/p/{n}', None) for n in range(5000))))}
+    entries, _ = read(files, f'{SITE}/big.xml.gz')
+    assert len(entries) == 5000 and entries[-1]['url'] == f'{SITE}/p/4999'
+
+
+def test_lastmod_filtering():
+    files = {f'{SITE}/sitemap.xml': urlset(
+        (f'{SITE}/old', '2025-12-31'),
+        (f'{SITE}/new', '2026-03-01T10:00:00+02:00'),
+        (f'{SITE}/cutoff', '2026-01-01T00:00:00Z'),
+        (f'{SITE}/undated', None),
+        (f'{SITE}/month', '2026-02'),
+        (f'{SITE}/unparseable', 'yesterday'),
+    )}
+    entries, _ = read(files, f'{SITE}/sitemap.xml', SitemapFilter(since=datetime(2026, 1, 1)))
+    assert [entry['url'] for entry in entries] == [
+        f'{SITE}/new', f'{SITE}/cutoff', f'{SITE}/undated', f'{SITE}/month', f'{SITE}/unparseable']
+    assert entries[0]['lastmod'] == datetime(2026, 3, 1, 8, tzinfo=timezone.utc)
+    assert entries[2]['lastmod'] is None
+
+
+def test_stale_child_sitemaps_are_not_fetched():
+    files = {
+        f'{SITE}/index.xml': index((f'{SITE}/2019.xml', '2019-06-01'), (f'{SITE}/2026.xml', '2026-06-01')),
+        f'{SITE}/2019.xml': urlset((f'{SITE}/ancient', None)),
+        f'{SITE}/2026.xml': urlset((f'{SITE}/recent', '2026-06-01')),
+    }
+    entries, reader = read(files, f'{SITE}/index.xml', SitemapFilter(since=datetime(2026, 1, 1)))
+    assert [entry['url'] for entry in entries] == [f'{SITE}/recent']
+    assert reader.engine.fetched == [f'{SITE}/index.xml', f'{SITE}/2026.xml']
+
+
+def test_path_patterns_and_canonical_urls():
+    files = {f'{SITE}/sitemap.xml': urlset(
+        ('HTTPS://Example.com:443/blog/a#top', None),
+        (f'{SITE}/blog/drafts/b', None),
+        (f'{SITE}/shop/c', None),
+    )}
+    entries, _ = read(files, f'{SITE}/sitemap.xml', SitemapFilter(include=['/blog/*'], exclude=['/blog/drafts/*']))
+    assert [entry['url'] for entry in entries] == [f'{SITE}/blog/a']
+
+
+@pytest.mark.parametrize('cut, complete', [
+    (b'/p/8', 8),
+    (b'/p/80', 80),
+    (b'/p/80</loc>', 80),
+    (b'/p/80</loc></url', 80),
+    (b'/p/80</loc></url>', 81),
+])
+def test_truncated_sitemap_keeps_only_complete_entries(cut, complete):
+    body = urlset(*((f'{SITE}/p/{n}', None) for n in range(100)))
+    files = {f'{SITE}/cut.xml': body[:body.index(cut) + len(cut)]}
+    entries, reader = read(files, f'{SITE}/cut.xml')
+    # The entry the file was cut off in never comes out, not even with a shortened <loc>
+    assert [entry['url'] for entry in entries] == [f'{SITE}/p/{n}' for n in range(complete)]
+    assert reader.sitemaps_read == 1
+
+
+def test_truncated_gzip_keeps_what_was_inflated():
+    data = gzip.compress(urlset(*((f'{SITE}/p/{n}', None) for n in range(200))))
+    files = {f'{SITE}/cut.xml.gz': data[:len(data) // 2]}
+    entries, _ = read(files, f'{SITE}/cut.xml.gz')
+    urls = [entry['url'] for entry in entries]
+    assert 0 < len(urls) < 200
+    assert urls == [f'{SITE}/p/{n}' for n in range(len(urls))]
+
+
+def test_empty_sitemap_is_an_error():
+    with pytest.raises(etree.XMLSyntaxError):
+        read({f'{SITE}/sitemap.xml': b''}, f'{SITE}/sitemap.xml')
+
+
+@pytest.mark.parametrize('body', [
+    b'<html><body>Not found</body></html>',
+    b'not xml at all \x00\xff',
+    urlset((f'{SITE}/a', None)).replace(b'<loc>', b'<loc><!-- unclosed'),
+])
+def test_malformed_sitemaps_yield_nothing(body):
+    entries, reader = read({f'{SITE}/sitemap.xml': body}, f'{SITE}/sitemap.xml')
+    assert entries == []
+
+
+def test_entries_without_a_loc_are_skipped():
+    files = {f'{SITE}/sitemap.xml': urlset(('', '2026-01-01'), (f'{SITE}/ok', None))}
+    entries, _ = read(files, f'{SITE}/sitemap.xml')
+    assert [entry['url'] for entry in entries] == [f'{SITE}/ok']
+
+
+def test_unreadable_child_is_recorded_and_skipped():
+    files = {
+        f'{SITE}/index.xml': index((f'{SITE}/missing.xml', None), (f'{SITE}/ok.xml', None)),
+        f'{SITE}/ok.xml': urlset((f'{SITE}/ok', None)),
+    }
+    entries, reader = read(files, f'{SITE}/index.xml')
+    assert [entry['url'] for entry in entries] == [f'{SITE}/ok']
+    assert [url for url, _ in reader.errors] == [f'{SITE}/missing.xml']
+
+
+def test_unreadable_source_raises():
+    with pytest.raises(httpx.HTTPStatusError):
+        read({}, f'{SITE}/sitemap.xml')
+
+
+def test_index_nesting_is_limited():
+    files = {f'{SITE}/0.xml': index((f'{SITE}/1.xml', None))}
+    for n in range(1, 5):
+        files[f'{SITE}/{n}.xml'] = index((f'{SITE}/{n + 1}.xml', None))
+    _, reader = read(files, f'{SITE}/0.xml', max_depth=2)
+    assert reader.engine.fetched == [f'{SITE}/0.xml', f'{SITE}/1.xml', f'{SITE}/2.xml']
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('2026', datetime(2026, 1, 1, tzinfo=timezone.utc)),
+    ('2026-05', datetime(2026, 5, 1, tzinfo=timezone.utc)),
+    ('2026-05-17', datetime(2026, 5, 17, tzinfo=timezone.utc)),
+    ('2026-05-17T12:30:00-01:00', datetime(2026, 5, 17, 13, 30, tzinfo=timezone.utc)),
+    (' 2026-05-17T12:30Z ', datetime(2026, 5, 17, 12, 30, tzinfo=timezone.utc)),
+    ('17/05/2026', None),
+    ('', None),
+    (None, None),
+])
+def test_parse_lastmod(text, expected):
+    assert parse_lastmod(text) == expected
@@ -0,0 +1,129 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+import token_store
+from token_store import SQLiteTokenStore, TokenStore, hash_token
+
+SESSION = {'username': 'admin', 'login_time': datetime(2026, 1, 2, 3, 4, 5)}
+
+
+class FakeMonotonic:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeMonotonic()
+    monkeypatch.setattr(token_store.time, 'monotonic', clock)
+    return clock
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / 'tokens.sqlite')
+
+
+def test_issue_and_get(path):
+    store = SQLiteTokenStore(path, cache_ttl=0)
+    token = store.issue(SESSION, timedelta(hours=1))
+    data = store.get(token)
+    assert data['username'] == 'admin'
+    assert data['login_time'] == SESSION['login_time']
+    assert data['expires_at'] > datetime.now()
+    assert store.get('not-a-token') is None
+
+
+def test_only_the_hash_is_stored(path):
+    store = SQLiteTokenStore(path, cache_ttl=0)
+    token = store.issue(SESSION, timedelta(hours=1))
+    rows = store._conn.execute('SELECT token_hash FROM auth_tokens').fetchall()
+    assert rows == [(hash_token(token),)]
+
+
+def test_tokens_are_shared_between_stores(path):
+    # Two API workers on one host
+    first, second = SQLiteTokenStore(path, cache_ttl=0), SQLiteTokenStore(path, cache_ttl=0)
+    token = first.issue(SESSION, timedelta(hours=1))
+    assert second.get(token)['username'] == 'admin'
+    second.revoke(token)
+    assert first.get(token) is None
+
+
+def test_revoke_is_immediate_on_the_revoking_store(path):
+    store = SQLiteTokenStore(path, cache_ttl=60)
+    token = store.issue(SESSION, timedelta(hours=1))
+    assert store.get(token) is not None
+    store.revoke(token)
+    assert store.get(token) is None
+
+
+def test_other_stores_drop_a_revoked_token_when_their_cache_expires(path, clock):
+    first, second = SQLiteTokenStore(path, cache_ttl=30), SQLiteTokenStore(path, cache_ttl=30)
+    token = first.issue(SESSION, timedelta(hours=1))
+    assert second.get(token) is not None
+    first.revoke(token)
+    # Still served from the second store's cache
+    assert second.get(token) is not None
+    clock.now += 31
+    assert second.get(token) is None
+
+
+def test_cache_serves_lookups_without_storage(path, clock, monkeypatch):
+    store = SQLiteTokenStore(path, cache_ttl=30)
+    token = store.issue(SESSION, timedelta(hours=1))
+    loads = []
+    original = store._load
+    monkeypatch.setattr(store, '_load', lambda token_hash: loads.append(token_hash) or original(token_hash))
+    store.get(token)
+    store.get(token)
+    assert loads == []
+    clock.now += 31
+    store.get(token)
+    assert loads == [hash_token(token)]
+
+
+def test_cache_is_bounded(path):
+    store = SQLiteTokenStore(path, cache_ttl=30, cache_size=2)
+    for _ in range(5):
+        store.issue(SESSION, timedelta(hours=1))
+    assert len(store._cache) == 2
+
+
+def test_expired_tokens_are_rejected_and_swept(path):
+    store = SQLiteTokenStore(path, cache_ttl=30)
+    expired = store.issue(SESSION, timedelta(seconds=-1))
+    valid = store.issue(SESSION, timedelta(hours=1))
+    # Rejected both from the cache and from storage
+    assert store.get(expired) is None
+    assert SQLiteTokenStore(path, cache_ttl=0).get(expired) is None
+    assert store.sweep() == 1
+    assert store.sweep() == 0
+    assert store.get(valid) is not None
+
+
+def test_aget(path):
+    store = SQLiteTokenStore(path, cache_ttl=0)
+    token = store.issue(SESSION, timedelta(hours=1))
+    assert asyncio.run(store.aget(token))['username'] == 'admin'
+    assert asyncio.run(store.aget('nope')) is None
+
+
+def test_incomplete_backend_fails_at_construction():
+    class NoSweep(TokenStore):
+        def _save(self, token_hash, data, expires_at):
+            pass
+
+        def _load(self, token_hash):
+            return None
+
+        def _delete(self, token_hash):
+            pass
+
+    with pytest.raises(TypeError):
+        NoSweep(cache_ttl=0)
@@ -0,0 +1,132 @@
+import pytest
+
+from url_canonical import DEFAULT_STRIP_PARAMS, URLCanonicalizer
+
+
+@pytest.fixture
+def canonicalizer():
+    # Explicit defaults, so URL_* variables in the environment don't change the rules
+    return URLCanonicalizer(strip_params=DEFAULT_STRIP_PARAMS.split(','), sort_query=True, drop_fragment=True,
+                            strip_trailing_slash=True, strip_www=False)
+
+
+@pytest.mark.parametrize('url, expected', [
+    # Scheme and host case, default ports
+    ('HTTP://Example.COM:80/a', 'http://example.com/a'),
+    ('https://example.com:443/', 'https://example.com/'),
+    ('https://example.com:8443/x', 'https://example.com:8443/x'),
+    ('http://example.com:443/', 'http://example.com:443/'),
+    ('https://example.com./x', 'https://example.com/x'),
+    # IPv6 hosts keep their brackets
+    ('http://[2001:DB8::1]:80/p', 'http://[2001:db8::1]/p'),
+    ('http://[2001:db8::1]:8080/', 'http://[2001:db8::1]:8080/'),
+    # Userinfo is kept, the host after it is still normalized
+    ('http://user:pw@Example.com:80/x', 'http://user:pw@example.com/x'),
+    ('https://user@[::1]:443/', 'https://user@[::1]/'),
+])
+def test_scheme_host_and_port(canonicalizer, url, expected):
+    assert canonicalizer.canonicalize(url) == expected
+
+
+@pytest.mark.parametrize('url, expected', [
+    ('https://e.com/p?utm_source=a&b=2&utm_campaign=c', 'https://e.com/p?b=2'),
+    ('https://e.com/p?fbclid=z&gclid=y', 'https://e.com/p'),
+    # Parameter names match case-insensitively, and after decoding
+    ('https://e.com/p?UTM_Medium=x&q=1', 'https://e.com/p?q=1'),
+    ('https://e.com/p?utm%5Fsource=1&q=a+b', 'https://e.com/p?q=a+b'),
+    # Lookalikes are kept
+    ('https://e.com/p?utmost=1', 'https://e.com/p?utmost=1'),
+])
+def test_tracking_params_stripped(canonicalizer, url, expected):
+    assert canonicalizer.canonicalize(url) == expected
+
+
+def test_query_sorted_and_empty_params_dropped(canonicalizer):
+    assert canonicalizer.canonicalize('https://e.com/p?b=2&a=1&&c') == 'https://e.com/p?a=1&b=2&c'
+
+
+def test_query_order_kept_when_sorting_is_off():
+    assert URLCanonicalizer(strip_params=[], sort_query=False).canonicalize('https://e.com/?b=1&a=2') == \
+        'https://e.com/?b=1&a=2'
+
+
+@pytest.mark.parametrize('url, expected', [
+    ('https://e.com/a/./b/../c', 'https://e.com/a/c'),
+    ('https://e.com/../../x', 'https://e.com/x'),
+    ('https://e.com/..', 'https://e.com/'),
+    ('https://e.com/a/.hidden', 'https://e.com/a/.hidden'),
+])
+def test_dot_segments(canonicalizer, url, expected):
+    assert canonicalizer.canonicalize(url) == expected
+
+
+@pytest.mark.parametrize('url, expected', [
+    ('https://e.com/a/', 'https://e.com/a'),
+    ('https://e.com/a//', 'https://e.com/a'),
+    ('https://e.com/', 'https://e.com/'),
+    ('https://e.com', 'https://e.com/'),
+    ('https://e.com//', 'https://e.com/'),
+])
+def test_trailing_slashes(canonicalizer, url, expected):
+    assert canonicalizer.canonicalize(url) == expected
+
+
+def test_trailing_slash_kept_when_disabled():
+    assert URLCanonicalizer(strip_params=[], strip_trailing_slash=False).canonicalize('https://e.com/a/') == \
+        'https://e.com/a/'
+
+
+@pytest.mark.parametrize('url, expected', [
+    # Unreserved characters are decoded, other escapes uppercased
+    ('https://e.com/%7euser', 'https://e.com/~user'),
+    ('https://e.com/%41%2d%5F', 'https://e.com/A-_'),
+    ('https://e.com/a%2fb', 'https://e.com/a%2Fb'),
+    ('https://e.com/caf%c3%a9', 'https://e.com/caf%C3%A9'),
+])
+def test_percent_escapes(canonicalizer, url, expected):
+    assert canonicalizer.canonicalize(url) == expected
+
+
+def test_fragment(canonicalizer):
+    assert canonicalizer.canonicalize('https://e.com/p#top') == 'https://e.com/p'
+    assert URLCanonicalizer(strip_params=[], drop_fragment=False).canonicalize('https://e.com/p#top') == \
+        'https://e.com/p#top'
+
+
+def test_strip_www():
+    assert URLCanonicalizer(strip_params=[], strip_www=True).canonicalize('https://WWW.e.com/') == 'https://e.com/'
+
+
+@pytest.mark.parametrize('url, expected', [
+    ('mailto:someone@e.com', 'mailto:someone@e.com'),
+    ('not a url', 'not a url'),
+    ('/relative/path', '/relative/path'),
+    ('  e.com/page  ', 'e.com/page'),
+    ('https://e.com:abc/', 'https://e.com:abc/'),
+    ('http://[::1/', 'http://[::1/'),
+])
+def test_non_http_input_only_stripped(canonicalizer, url, expected):
+    assert canonicalizer.canonicalize(url) == expected
+
+
+def test_dedupe_keeps_first_seen_order_and_maps_rewritten_urls(canonicalizer):
+    unique, aliases = canonicalizer.dedupe([
+        'https://e.com/a/',
+        'https://e.com/b',
+        '',
+        '   ',
+        'https://e.com/a?utm_source=x',
+        'https://e.com/a',
+        ' https://e.com/b ',
+    ])
+    assert unique == ['https://e.com/a', 'https://e.com/b']
+    # Only originals that were rewritten are mapped; surrounding spaces alone don't count
+    assert aliases == {
+        'https://e.com/a/': 'https://e.com/a',
+        'https://e.com/a?utm_source=x': 'https://e.com/a',
+    }
+
+
+def test_dedupe_of_canonical_urls_has_no_aliases(canonicalizer):
+    urls = ['https://e.com/a', 'https://e.com/b?x=1']
+    assert canonicalizer.dedupe(urls) == (urls, {})
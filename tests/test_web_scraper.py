@@ -0,0 +1,65 @@
+import os
+
+import httpx
+import pytest
+
+import web_scraper
+from http_cache import HttpCache
+from politeness import PolitenessScheduler
+from web_scraper import cached_text
+
+URL = 'https://example.com/page'
+HEADERS = {'etag': '"v1"', 'cache-control': 'max-age=0'}
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return HttpCache(str(tmp_path / 'http'))
+
+
+def test_304_reuses_the_stored_text(cache):
+    entry = cache.store(URL, HEADERS, b'<p>body</p>')
+    cache.set_text(URL, 'stored text')
+    entry = cache.get(URL)
+    assert cached_text(cache, URL, entry, 304, {}, b'') == 'stored text'
+
+
+def test_304_after_the_entry_was_evicted(cache):
+    entry = cache.store(URL, HEADERS, b'<p>body</p>')
+    cache.delete(URL)
+    assert cached_text(cache, URL, entry, 304, {}, b'') is None
+
+
+def test_304_after_the_body_file_went_missing(cache):
+    entry = cache.store(URL, HEADERS, b'<p>body</p>')
+    # The text was never extracted, so the body would be needed
+    os.remove(cache._body_path(entry['key']))
+    assert cached_text(cache, URL, entry, 304, {}, b'') is None
+
+
+def test_304_without_a_cached_entry(cache):
+    assert cached_text(cache, URL, None, 304, {}, b'') is None
+
+
+def test_fetch_refetches_when_the_entry_vanishes_after_a_304(cache, monkeypatch):
+    cache.store(URL, HEADERS, b'<p>old</p>')
+    cache.set_text(URL, 'old text')
+    requests = []
+
+    def fake_get(url, headers, **kwargs):
+        requests.append(headers)
+        if 'If-None-Match' in headers:
+            # Evicted while the conditional request was in flight
+            cache.delete(url)
+            return httpx.Response(304, request=httpx.Request('GET', url))
+        return httpx.Response(200, headers=HEADERS, content=b'<p>new</p>', request=httpx.Request('GET', url))
+
+    monkeypatch.setattr(web_scraper, 'get_http_cache', lambda: cache)
+    polite = PolitenessScheduler(rate=1000.0, burst=10, crawl_delay_provider=None)
+    monkeypatch.setattr(web_scraper, 'get_politeness', lambda: polite)
+    monkeypatch.setattr(web_scraper.httpx, 'get', fake_get)
+    monkeypatch.setattr(web_scraper, 'extract_text', lambda body: body.decode())
+
+    assert web_scraper._fetch_text(URL, 'revalidate') == '<p>new</p>'
+    assert [('If-None-Match' in headers) for headers in requests] == [True, False]
+    assert cache.get(URL)['text'] == '<p>new</p>'
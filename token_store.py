@@ -0,0 +1,216 @@
+"""
+Auth token store
+Keeps API login tokens in a store every API worker shares (Postgres, or an
+SQLite file for single-host development) instead of a per-process dict, so
+the API can run several workers behind a load balancer. Only a SHA-256 of
+each token is stored. Lookups go through a small in-process TTL cache; a
+token revoked on one worker stops working on the others once their cached
+copy expires (TOKEN_CACHE_TTL seconds). Expired tokens are deleted by
+sweep(), which the API runs periodically.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+# TOKEN_STORE values
+TOKEN_STORES = ('postgres', 'sqlite')
+
+
+def hash_token(token: str) -> str:
+    return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+
+def _encode(data: Dict) -> str:
+    return json.dumps(data, default=lambda value: value.isoformat())
+
+
+def _decode(text: str, expires_at: datetime) -> Dict:
+    data = json.loads(text)
+    if data.get('login_time'):
+        data['login_time'] = datetime.fromisoformat(data['login_time'])
+    data['expires_at'] = expires_at
+    return data
+
+
+class TokenStore(ABC):
+    """Token issue/lookup/revoke with a read-through cache; subclasses provide storage"""
+
+    def __init__(self, cache_ttl: float = None, cache_size: int = None):
+        self.cache_ttl = cache_ttl if cache_ttl is not None else float(os.environ.get('TOKEN_CACHE_TTL', 30))
+        self.cache_size = cache_size or int(os.environ.get('TOKEN_CACHE_SIZE', 1024))
+        # token hash -> (data, cached until)
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    # Storage, implemented by subclasses
+    @abstractmethod
+    def _save(self, token_hash: str, data: Dict, expires_at: datetime):
+        ...
+
+    @abstractmethod
+    def _load(self, token_hash: str) -> Optional[Dict]:
+        """Data of an unexpired token, or None"""
+
+    @abstractmethod
+    def _delete(self, token_hash: str):
+        ...
+
+    @abstractmethod
+    def sweep(self) -> int:
+        """Delete expired tokens; returns how many"""
+
+    def _cached(self, token_hash: str) -> Optional[Dict]:
+        with self._lock:
+            entry = self._cache.get(token_hash)
+            if entry is None:
+                return None
+            data, cached_until = entry
+            if cached_until <= time.monotonic() or data['expires_at'] <= datetime.now():
+                del self._cache[token_hash]
+                return None
+            self._cache.move_to_end(token_hash)
+            return data
+
+    def _remember(self, token_hash: str, data: Dict):
+        if self.cache_ttl <= 0:
+            return
+        with self._lock:
+            self._cache[token_hash] = (data, time.monotonic() + self.cache_ttl)
+            self._cache.move_to_end(token_hash)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def issue(self, data: Dict, ttl: timedelta) -> str:
+        """Create a token for `data` (the session dict) valid for `ttl`"""
+        token = secrets.token_urlsafe(32)
+        data = dict(data, expires_at=datetime.now() + ttl)
+        self._save(hash_token(token), data, data['expires_at'])
+        self._remember(hash_token(token), data)
+        return token
+
+    def get(self, token: str) -> Optional[Dict]:
+        """Session data of a valid token, or None (blocking on a cache miss)"""
+        token_hash = hash_token(token)
+        data = self._cached(token_hash)
+        if data is None:
+            data = self._load(token_hash)
+            if data is not None:
+                self._remember(token_hash, data)
+        return data
+
+    async def aget(self, token: str) -> Optional[Dict]:
+        """Async variant of get(); cache hits stay on the event loop"""
+        data = self._cached(hash_token(token))
+        if data is not None:
+            return data
+        return await asyncio.to_thread(self.get, token)
+
+    def revoke(self, token: str):
+        """Invalidate a token (other workers drop it when their cache entry expires)"""
+        token_hash = hash_token(token)
+        with self._lock:
+            self._cache.pop(token_hash, None)
+        self._delete(token_hash)
+
+
+class PostgresTokenStore(TokenStore):
+    """Tokens in the auth_tokens table of the application database"""
+
+    def __init__(self, db=None, **kwargs):
+        super().__init__(**kwargs)
+        if db is None:
+            from database import get_database
+            db = get_database()
+        self.db = db
+
+    def _save(self, token_hash: str, data: Dict, expires_at: datetime):
+        with self.db.connection() as conn:
+            conn.cursor().execute('''
+                INSERT INTO auth_tokens (token_hash, username, data, expires_at)
+                VALUES (%s, %s, %s, %s)
+            ''', (token_hash, data.get('username'), _encode(data), expires_at))
+
+    def _load(self, token_hash: str) -> Optional[Dict]:
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT data::text, expires_at FROM auth_tokens
+                WHERE token_hash = %s AND expires_at > %s
+            ''', (token_hash, datetime.now()))
+            row = cursor.fetchone()
+        return _decode(row[0], row[1]) if row else None
+
+    def _delete(self, token_hash: str):
+        with self.db.connection() as conn:
+            conn.cursor().execute('DELETE FROM auth_tokens WHERE token_hash = %s', (token_hash,))
+
+    def sweep(self) -> int:
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('DELETE FROM auth_tokens WHERE expires_at <= %s', (datetime.now(),))
+            return cursor.rowcount
+
+
+class SQLiteTokenStore(TokenStore):
+    """Tokens in a local SQLite file (development; shared by workers on one host)"""
+
+    def __init__(self, path: str = None, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path or os.environ.get('TOKEN_STORE_PATH', '.auth_tokens.sqlite')
+        self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self._db_lock = threading.Lock()
+        with self._db_lock, self._conn:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS auth_tokens (
+                    token_hash TEXT PRIMARY KEY,
+                    username TEXT,
+                    data TEXT NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+            ''')
+
+    def _save(self, token_hash: str, data: Dict, expires_at: datetime):
+        with self._db_lock, self._conn:
+            self._conn.execute('INSERT INTO auth_tokens (token_hash, username, data, expires_at) VALUES (?, ?, ?, ?)',
+                               (token_hash, data.get('username'), _encode(data), expires_at.timestamp()))
+
+    def _load(self, token_hash: str) -> Optional[Dict]:
+        with self._db_lock:
+            row = self._conn.execute('SELECT data, expires_at FROM auth_tokens WHERE token_hash = ? AND expires_at > ?',
+                                     (token_hash, time.time())).fetchone()
+        return _decode(row[0], datetime.fromtimestamp(row[1])) if row else None
+
+    def _delete(self, token_hash: str):
+        with self._db_lock, self._conn:
+            self._conn.execute('DELETE FROM auth_tokens WHERE token_hash = ?', (token_hash,))
+
+    def sweep(self) -> int:
+        with self._db_lock, self._conn:
+            return self._conn.execute('DELETE FROM auth_tokens WHERE expires_at <= ?', (time.time(),)).rowcount
+
+
+_store_instance = None
+_store_lock = threading.Lock()
+
+
+def get_token_store() -> TokenStore:
+    """Get or create the shared token store selected by TOKEN_STORE"""
+    global _store_instance
+    with _store_lock:
+        if _store_instance is None:
+            kind = os.environ.get('TOKEN_STORE', 'postgres').lower()
+            if kind not in TOKEN_STORES:
+                raise ValueError(f"TOKEN_STORE must be one of {', '.join(TOKEN_STORES)}")
+            _store_instance = SQLiteTokenStore() if kind == 'sqlite' else PostgresTokenStore()
+    return _store_instance
@@ -0,0 +1,154 @@
+"""
+Canonical URLs
+Rewrites trivially different forms of one page to a single URL so batches
+can be deduplicated before anything is fetched: scheme and host are
+lowercased, default ports, fragments and tracking parameters are dropped,
+query parameters are sorted and trailing slashes are stripped. Each rule can
+be switched off through the environment (URL_* variables, see .env.example).
+"""
+
+import fnmatch
+import os
+import re
+import threading
+from typing import Dict, Iterable, List, Tuple
+from urllib.parse import unquote_plus, urlsplit, urlunsplit
+
+# Query parameters dropped by default: analytics and ad click identifiers
+DEFAULT_STRIP_PARAMS = 'utm_*,fbclid,gclid,dclid,msclkid,mc_cid,mc_eid,_ga,_hsenc,_hsmi,yclid,igshid'
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+_PERCENT_ESCAPE = re.compile(r'%([0-9a-fA-F]{2})')
+_UNRESERVED = frozenset('ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-._~')
+
+
+def _normalize_escapes(text: str) -> str:
+    """Decode escaped unreserved characters and uppercase the remaining escapes (%7e -> ~, %2f -> %2F)"""
+    def fix(match):
+        char = chr(int(match.group(1), 16))
+        return char if char in _UNRESERVED else '%' + match.group(1).upper()
+    return _PERCENT_ESCAPE.sub(fix, text)
+
+
+def _env_flag(name: str, default: bool) -> bool:
+    return os.environ.get(name, '1' if default else '0').lower() in ('1', 'true', 'yes')
+
+
+class URLCanonicalizer:
+    """Configurable URL normalization rules"""
+
+    def __init__(self, strip_params: Iterable[str] = None, sort_query: bool = None,
+                 drop_fragment: bool = None, strip_trailing_slash: bool = None, strip_www: bool = None):
+        if strip_params is None:
+            strip_params = os.environ.get('URL_STRIP_PARAMS', DEFAULT_STRIP_PARAMS).split(',')
+        # Patterns are shell-style and case-insensitive, e.g. utm_*
+        self.strip_params = [p.strip().lower() for p in strip_params if p.strip()]
+        self._strip_re = re.compile('|'.join(fnmatch.translate(p) for p in self.strip_params) or r'(?!)')
+        self.sort_query = sort_query if sort_query is not None else _env_flag('URL_SORT_QUERY', True)
+        self.drop_fragment = drop_fragment if drop_fragment is not None else _env_flag('URL_DROP_FRAGMENT', True)
+        self.strip_trailing_slash = (strip_trailing_slash if strip_trailing_slash is not None
+                                     else _env_flag('URL_STRIP_TRAILING_SLASH', True))
+        self.strip_www = strip_www if strip_www is not None else _env_flag('URL_STRIP_WWW', False)
+
+    def _keep_param(self, param: str) -> bool:
+        name = param.split('=', 1)[0]
+        if '%' in name or '+' in name:
+            name = unquote_plus(name)
+        return not self._strip_re.match(name.lower())
+
+    def _path(self, path: str) -> str:
+        if '%' in path:
+            path = _normalize_escapes(path)
+        if not path:
+            return '/'
+        if not path.startswith('/'):
+            path = '/' + path
+        if '/.' in path:
+            # Resolve . and .. segments
+            segments = []
+            for segment in path.split('/')[1:]:
+                if segment == '..':
+                    if segments:
+                        segments.pop()
+                elif segment != '.':
+                    segments.append(segment)
+            path = '/' + '/'.join(segments)
+        if self.strip_trailing_slash and len(path) > 1:
+            path = path.rstrip('/') or '/'
+        return path
+
+    def canonicalize(self, url: str) -> str:
+        """Canonical form of `url`; strings that are not absolute URLs come back stripped only"""
+        url = url.strip()
+        try:
+            parts = urlsplit(url)
+        except ValueError:
+            return url
+        # The netloc is taken apart once here (urlsplit's properties re-parse it on every access)
+        userinfo, at, hostport = parts.netloc.rpartition('@')
+        if hostport.startswith('['):
+            host, _, port = hostport[1:].partition(']')
+            port = port[1:]
+        else:
+            host, _, port = hostport.partition(':')
+        if not parts.scheme or not host or (port and not port.isdigit()):
+            return url
+
+        scheme = parts.scheme.lower()
+        host = host.lower().rstrip('.')
+        if self.strip_www and host.startswith('www.'):
+            host = host[4:]
+        if ':' in host:
+            host = f'[{host}]'
+        if port and int(port) != DEFAULT_PORTS.get(scheme):
+            host = f'{host}:{int(port)}'
+        if at:
+            host = f'{userinfo}@{host}'
+
+        query = parts.query
+        if query:
+            # Parameters are compared and sorted as written, so their encoding is left alone
+            params = [param for param in query.split('&') if param and self._keep_param(param)]
+            if self.sort_query:
+                params.sort()
+            query = '&'.join(params)
+
+        fragment = '' if self.drop_fragment else parts.fragment
+        return urlunsplit((scheme, host, self._path(parts.path), query, fragment))
+
+    def dedupe(self, urls: Iterable[str]) -> Tuple[List[str], Dict[str, str]]:
+        """Unique canonical URLs in first-seen order, and the original -> canonical mapping.
+
+        The mapping only holds originals that were rewritten; blank lines are skipped.
+        """
+        unique, seen, aliases = [], set(), {}
+        for url in urls:
+            original = url.strip()
+            if not original:
+                continue
+            canonical = self.canonicalize(original)
+            if canonical != original:
+                aliases[original] = canonical
+            if canonical not in seen:
+                seen.add(canonical)
+                unique.append(canonical)
+        return unique, aliases
+
+
+_canonicalizer_instance = None
+_canonicalizer_lock = threading.Lock()
+
+
+def get_canonicalizer() -> URLCanonicalizer:
+    """Get or create the shared canonicalizer configured from the environment"""
+    global _canonicalizer_instance
+    with _canonicalizer_lock:
+        if _canonicalizer_instance is None:
+            _canonicalizer_instance = URLCanonicalizer()
+    return _canonicalizer_instance
+
+
+def canonicalize(url: str) -> str:
+    """Canonical form of `url` under the shared rules"""
+    return get_canonicalizer().canonicalize(url)
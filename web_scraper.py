@@ -1,17 +1,110 @@
+import httpx
 import trafilatura
 
+from extraction_cache import get_extraction_cache
+from extraction_pool import get_extraction_pool
+from http_cache import get_http_cache
+from politeness import get_politeness
+from singleflight import SyncSingleFlight, flight_key
 
-def get_website_text_content(url: str) -> str:
+DEFAULT_USER_AGENT = "Mozilla/5.0 (compatible; SmartWebScraper/2.0)"
+
+# Threads asking for the same page at the same time share one fetch + extract
+_flights = SyncSingleFlight()
+
+
+def get_website_text_content(url: str, cache_policy: str = 'default') -> str:
     """
     This function takes a url and returns the main text content of the website.
     The text content is extracted using trafilatura and easier to understand.
     The results is not directly readable, better to be summarized by LLM before consume
     by the user.
 
+    Pages go through the on-disk HTTP cache (see http_cache.py): unchanged
+    pages are revalidated with a conditional request and not re-extracted.
+
+    Concurrent calls for the same URL and cache policy share one download.
+
     Some common website to crawl information from:
     MLB scores: https://www.mlb.com/scores/YYYY-MM-DD
     """
-    # Send a request to the website
-    downloaded = trafilatura.fetch_url(url)
-    text = trafilatura.extract(downloaded)
+    return _flights.do(flight_key(url, cache_policy), lambda: _fetch_text(url, cache_policy))
+
+
+def _fetch_text(url: str, cache_policy: str) -> str:
+    if cache_policy == 'bypass':
+        # Send a request to the website, paced like every other request to its host
+        with get_politeness().slot_sync(url):
+            downloaded = trafilatura.fetch_url(url)
+        return extract_text(downloaded)
+
+    cache = get_http_cache()
+    entry, conditional_headers = cache.lookup(url, cache_policy)
+    if conditional_headers is None:
+        return entry['text']
+
+    def get(headers):
+        return get_politeness().request_sync(url, lambda: httpx.get(
+            url, headers={"User-Agent": DEFAULT_USER_AGENT, **headers}, timeout=30, follow_redirects=True))
+
+    try:
+        response = get(conditional_headers)
+        text = cached_text(cache, url, entry, response.status_code, response.headers, response.content)
+        if text is None:
+            # The cached copy went away after the 304: fetch the page in full
+            response = get({})
+            text = cached_text(cache, url, None, response.status_code, response.headers, response.content)
+    except httpx.HTTPError:
+        return ""
+    return text or ""
+
+
+def cached_text(cache, url: str, entry: dict, status_code: int, headers, body: bytes) -> str:
+    """
+    Turn a (possibly conditional) response into page text via the cache.
+    A 304 or a byte-identical body reuses the stored text; anything new is
+    extracted once and the text saved alongside the cached body. Returns
+    None if a 304 cannot be served because the cached entry or its body is
+    gone (evicted or deleted meanwhile); the page must then be fetched again
+    without conditional headers.
+    """
+    if status_code == 304:
+        entry = cache.revalidated(url, headers) if entry is not None else None
+        if entry is None:
+            return None
+        if entry['text'] is not None:
+            return entry['text']
+        body = cache.read_body(entry)
+        if body is None:
+            return None
+    elif status_code >= 400:
+        return ""
+    else:
+        entry = cache.store(url, headers, body, entry)
+        if entry is not None and entry['text'] is not None:
+            return entry['text']
+
+    text = extract_text(body)
+    if entry is not None:
+        cache.set_text(url, text)
+    return text
+
+
+def extract_text(html) -> str:
+    """
+    Extract the main text content from an already downloaded page.
+    Accepts the raw body as bytes or str, so callers that fetch pages
+    themselves (e.g. the async batch engine) can reuse the same extraction.
+    Results are memoized by body hash, identical pages are extracted once;
+    the extraction itself runs in the process pool (see extraction_pool.py).
+    """
+    if not html:
+        return ""
+    return get_extraction_cache().memoize(
+        'trafilatura_text', html, lambda body: get_extraction_pool().run(extract_text_uncached, body))
+
+
+def extract_text_uncached(html) -> str:
+    """Run trafilatura in the current process (what the pool workers execute)"""
+    text = trafilatura.extract(html)
     return text if text is not None else ""